@@ -10,6 +10,9 @@ from .config import (
     PDSSP_REGISTRY_ENDPOINT,
     LOCAL_REGISTRY_DIRECTORY,
     STAC_CATALOG_PARENT_ENDPOINT,
+    EXTRACT_JOBS,
+    TRANSFORM_JOBS,
+    DATASTORE_BACKEND,
 )
 from crawler.crawler import Crawler
 from crawler.extractor import Extractor
@@ -35,13 +38,26 @@ def config():
     click.echo(f'(External) services registry directory   : {LOCAL_REGISTRY_DIRECTORY}')
     click.echo(f'Source collections data directory        : {SOURCE_DATA_DIR}')
     click.echo(f'STAC collections data directory          : {STAC_DATA_DIR}')
+    click.echo(f'Data store backend                       : {DATASTORE_BACKEND}')
     click.echo(f'Destination (PDSSP) STAC API Catalog URL : {STAC_CATALOG_PARENT_ENDPOINT}')
     click.echo()
 
 @cli.command()
-def initds():
-    """Initialise data store."""
-    Crawler().reset_datastore()
+@click.option('--refresh/--no-refresh', help='Bypass cached service responses.', default=False)
+@click.option('--reset/--no-reset', help='Reset data store collections, discarding their processing state.', default=False)
+def initds(refresh, reset):
+    """Initialise data store.
+
+    Collections retrieved from registered services are synchronised with the data store collections, keeping their
+    processing state. Extracted collections which number of products changed are marked as dirty, and can be processed
+    again incrementally, for example::
+
+        crawler process --dirty --incremental
+    """
+    if reset:
+        Crawler().reset_datastore(refresh=refresh)
+    else:
+        Crawler().sync_datastore(refresh=refresh)
 
 @cli.command()
 @click.option('--id', type=click.STRING, help='Collection ID filter.', default='')
@@ -53,7 +69,8 @@ def initds():
 @click.option('--not-transformed', 'transformed', flag_value=False, help='Filter to return collections not yet transformed.', default=None)
 @click.option('--ingested', 'ingested', flag_value=True, help='Filter to return only ingested collections.', default=None)
 @click.option('--not-ingested', 'ingested', flag_value=False, help='Filter to return collections not yet ingested.', default=None)
-def collections(id, service_type, target, extracted, transformed, ingested):
+@click.option('--dirty', 'dirty', flag_value=True, help='Filter to return only collections which number of products changed since extraction.', default=None)
+def collections(id, service_type, target, extracted, transformed, ingested, dirty):
     """Show source collections available in the data store.
 
     Returned source collections can optionally be filtered by identifier, service type, target, and whether or it has been
@@ -67,7 +84,8 @@ def collections(id, service_type, target, extracted, transformed, ingested):
         target=target,
         extracted=extracted,
         transformed=transformed,
-        ingested=ingested
+        ingested=ingested,
+        dirty=dirty
     )
 
 @cli.command()
@@ -80,8 +98,12 @@ def collections(id, service_type, target, extracted, transformed, ingested):
 @click.option('--not-transformed', 'transformed', flag_value=False, help='Filter to return collections not yet transformed.', default=None)
 @click.option('--ingested', 'ingested', flag_value=True, help='Filter to return only ingested collections.', default=None)
 @click.option('--not-ingested', 'ingested', flag_value=False, help='Filter to return collections not yet ingested.', default=None)
+@click.option('--dirty', 'dirty', flag_value=True, help='Filter to return only collections which number of products changed since extraction.', default=None)
 @click.option('--overwrite/--no-overwrite', help='Overwrite existing source collection files.', default=False)
-def process(id, service_type, target, extracted, transformed, ingested, overwrite):
+@click.option('-j', '--jobs', type=click.INT, help='Number of concurrent extraction workers.', default=EXTRACT_JOBS)
+@click.option('--refresh/--no-refresh', help='Bypass cached service responses.', default=False)
+@click.option('--incremental/--no-incremental', help='Only extract products added or modified since the previous extraction.', default=False)
+def process(id, service_type, target, extracted, transformed, ingested, dirty, overwrite, jobs, refresh, incremental):
     """Process all or a filtered selection of source collections.
 
     Use options to filter source collections from the data store. If you're unsure about the filtering result, first use
@@ -94,7 +116,7 @@ def process(id, service_type, target, extracted, transformed, ingested, overwrit
     d1=datetime.utcnow()
     print(f'start time : {d1}')
     Crawler().process_collections(collection_id=id, service_type=service_type, target=target, extracted=extracted,
-                                  transformed=transformed, ingested=ingested, overwrite=overwrite)
+                                  transformed=transformed, ingested=ingested, dirty=dirty, overwrite=overwrite, n_jobs=jobs, refresh=refresh, incremental=incremental)
     d2=datetime.utcnow()
     print(f'stop time  : {d2}')
     print(f'delta time : {d2-d1}')
@@ -102,19 +124,27 @@ def process(id, service_type, target, extracted, transformed, ingested, overwrit
 @cli.command()
 @click.option('--id', type=click.STRING, help='Collection ID.', default='')
 @click.option('--overwrite/--no-overwrite', help='Overwrite existing source collection files.', default=False)
-def extract(id, overwrite):
+@click.option('-j', '--jobs', type=click.INT, help='Number of concurrent extraction workers.', default=EXTRACT_JOBS)
+@click.option('--refresh/--no-refresh', help='Bypass cached service responses.', default=False)
+@click.option('--incremental/--no-incremental', help='Only extract products added or modified since the previous extraction.', default=False)
+def extract(id, overwrite, jobs, refresh, incremental):
     """Extract source collection metadata files from source data catalog service.
+
+    Products metadata pages can be retrieved concurrently, for example::
+
+        crawler extract --id=MRO_HIRISE_RDRV11 --jobs=8
     """
-    Crawler().extract_collection(id, overwrite=overwrite)
+    Crawler().extract_collection(id, overwrite=overwrite, n_jobs=jobs, refresh=refresh, incremental=incremental)
 
 
 @cli.command()
 @click.option('--id', type=click.STRING, help='Collection ID.', default='')
 @click.option('-o', '--overwrite/--no-overwrite', help='Overwrite existing STAC catalog files.', default=False)
-def transform(id, overwrite):
+@click.option('-j', '--jobs', type=click.INT, help='Number of transform worker processes.', default=TRANSFORM_JOBS)
+def transform(id, overwrite, jobs):
     """Transform extracted source collection files to STAC catalog files.
     """
-    Crawler().transform_collection(id, overwrite=overwrite)
+    Crawler().transform_collection(id, overwrite=overwrite, n_jobs=jobs)
 
 
 @cli.command()
@@ -126,9 +156,25 @@ def ingest(id, update):
     Crawler().ingest_collection(id, update=update)
 
 
+@cli.command()
+@click.option('--id', type=click.STRING, help='Collection ID.', default='')
+@click.option('--transform-status', type=click.Choice(['transformed', 'failed']), help='Transform status filter.', default=None)
+@click.option('--ingest-status', type=click.Choice(['ingested', 'failed']), help='Ingest status filter.', default=None)
+def products(id, transform_status, ingest_status):
+    """Show processing state of the products of a collection, from the products ledger.
+    """
+    products = Crawler().get_products(id, transform_status=transform_status, ingest_status=ingest_status)
+    for product in products:
+        error = product['transform_error'] or product['ingest_error'] or ''
+        click.echo(f'{product["product_id"]} | {product["transform_status"]} | {product["ingest_status"]} | {error}')
+    click.echo()
+    click.echo(f'{len(products)} products.')
+
+
 @cli.command()
 @click.option('-s', '--service-title', type=click.STRING, help='Show service information/collections for a given service title.', default='')
-def registry(service_title):
+@click.option('--refresh/--no-refresh', help='Bypass cached service responses.', default=False)
+def registry(service_title, refresh):
     """Show internal and external registered services.
 
     Optionally display service information and collections using the `service` option.
@@ -143,7 +189,7 @@ def registry(service_title):
     if service_title:
         for registered_service in registered_services:
             if registered_service.title == service_title:
-                collections = Extractor(service=registered_service).get_service_collections()
+                collections = Extractor(service=registered_service, http_client=crawler.http_client).get_service_collections(refresh=refresh)
                 print()
                 print(f'{len(collections)} collections found in {service_title}:')
                 for collection in collections:
@@ -0,0 +1,319 @@
+"""PDSSP Crawler HTTP client module.
+
+A single :class:`HttpClient` object is meant to be shared by the registries, extractors and ingestor used by a
+:class:`crawler.crawler.Crawler` object, so that connections to a given host are pooled and kept alive across
+requests instead of being re-established for each request.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from contextlib import closing
+from urllib.parse import urlencode
+from pathlib import Path
+from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from .config import (
+    HTTP_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_BACKOFF_MAX,
+    HTTP_RATE_LIMIT,
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_TTL,
+)
+
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'User-Agent': 'pdssp-crawler'
+}
+"""Default headers sent with every request."""
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+"""Status codes of responses to be retried."""
+
+RETRY_POST_STATUS_CODES = {429, 503}
+"""Status codes of POST responses to be retried, for which the request is known not to have been processed."""
+
+
+def is_connect_error(error: requests.RequestException) -> bool:
+    """Returns True if a request error was raised while connecting to the server, i.e. before the request was sent.
+
+    Connection failures (eg: refused connection, name resolution failure) are raised by urllib3 as
+    `NewConnectionError`, subclassing `ConnectTimeoutError`, and wrapped by Requests into a `ConnectionError`.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        reason = getattr(error.args[0], 'reason', error.args[0])  # urllib3 `MaxRetryError` reason
+        return isinstance(reason, ConnectTimeoutError)
+    return False
+
+
+class TokenBucket:
+    """Token bucket rate limiter, allowing `rate` requests per second on average, and bursts of `burst` requests.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst else max(1.0, rate)
+        self.tokens = self.capacity
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a token is available, and consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+                self.timestamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class HttpClient:
+    """HTTP client class, holding per-host keep-alive connection pools.
+
+    Requests sent to a given host are rate-limited (see :meth:`set_rate_limit`), and requests failing with a transient
+    error (429/5xx status codes, or timeouts) are retried with exponential backoff and jitter, honouring the
+    `Retry-After` response header. POST requests are only retried if known not to have been processed by the server.
+    """
+    def __init__(self, timeout=HTTP_TIMEOUT, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 max_retries=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR, backoff_max=HTTP_BACKOFF_MAX,
+                 rate_limit=HTTP_RATE_LIMIT):
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.rate_limit = rate_limit
+
+        # per-host rate limiters, and time before which no request should be sent to a host (`Retry-After`)
+        self.rate_limiters = {}
+        self.not_before = {}
+        self.lock = threading.Lock()
+
+        # set session, with one connection pool per host (up to `pool_connections` hosts), each holding up to
+        # `pool_maxsize` connections that can be used concurrently.
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__}> "
+            f"timeout: {self.timeout} | "
+            f"pool_connections: {self.pool_connections} | "
+            f"pool_maxsize: {self.pool_maxsize} | "
+            f"max_retries: {self.max_retries} | "
+            f"rate_limit: {self.rate_limit}"
+        )
+
+    def set_rate_limit(self, url, rate, burst=None):
+        """Set the maximum number of requests per second sent to the host of a given URL."""
+        host = urlparse(url).netloc
+        with self.lock:
+            if rate:
+                self.rate_limiters[host] = TokenBucket(rate, burst=burst)
+            elif host in self.rate_limiters.keys():
+                self.rate_limiters.pop(host)
+
+    def wait(self, host):
+        """Wait until a request can be sent to a given host."""
+        with self.lock:
+            if host not in self.rate_limiters.keys() and self.rate_limit:
+                self.rate_limiters[host] = TokenBucket(self.rate_limit)
+            rate_limiter = self.rate_limiters.get(host)
+            delay = self.not_before.get(host, 0) - time.monotonic()
+
+        if delay > 0:
+            time.sleep(delay)
+        if rate_limiter:
+            rate_limiter.acquire()
+
+    def get_retry_delay(self, attempt, response=None) -> float:
+        """Returns the delay before retrying a request, from the `Retry-After` response header if any, or from an
+        exponential backoff with (full) jitter.
+        """
+        if response is not None and 'Retry-After' in response.headers:
+            retry_after = response.headers['Retry-After']
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    retry_time = parsedate_to_datetime(retry_after)
+                    return min(self.backoff_max, max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds()))
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        """Send a request using pooled connections, and the client default timeout unless specified.
+
+        Requests failing with a transient error are retried up to `max_retries` times. POST requests are not
+        idempotent: they are only retried on connection errors raised before the request was sent (see
+        `is_connect_error`), or on `RETRY_POST_STATUS_CODES` responses.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlparse(url).netloc
+        is_post = method.upper() == 'POST'
+        retry_status_codes = RETRY_POST_STATUS_CODES if is_post else RETRY_STATUS_CODES
+
+        attempt = 0
+        while True:
+            self.wait(host)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if attempt >= self.max_retries or (is_post and not is_connect_error(e)):
+                    raise
+                delay = self.get_retry_delay(attempt)
+                print(f'[WARNING] {method} {url} request failed ({e.__class__.__name__}): retrying in {delay:.1f}s...')
+            else:
+                if response.status_code not in retry_status_codes or attempt >= self.max_retries:
+                    return response
+                delay = self.get_retry_delay(attempt, response=response)
+                if 'Retry-After' in response.headers:
+                    # delay all requests to this host
+                    with self.lock:
+                        self.not_before[host] = max(self.not_before.get(host, 0), time.monotonic() + delay)
+                response.close()
+                print(f'[WARNING] {method} {url} request {response.status_code} error: retrying in {delay:.1f}s...')
+
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_default_http_client = None
+
+
+def get_http_client() -> HttpClient:
+    """Returns the default HTTP client shared within the current process."""
+    global _default_http_client
+    if _default_http_client is None:
+        _default_http_client = HttpClient()
+    return _default_http_client
+
+
+class ResponseCache:
+    """On-disk, TTL-based cache of JSON GET responses, with an in-process memo layer shared by all cache objects.
+
+    Expired responses are revalidated using conditional requests (`ETag` or `Last-Modified` response headers) when
+    provided by the server, so that unchanged responses are not downloaded again.
+    """
+    _memo = {}
+    _lock = threading.Lock()
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, http_client: HttpClient = None):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.http_client = http_client if http_client else get_http_client()
+
+    def get_key(self, url, params=None) -> str:
+        """Returns the cache key of a given request URL and query parameters."""
+        query = urlencode(sorted(params.items())) if params else ''
+        return hashlib.sha1(f'{url}?{query}'.encode('utf-8')).hexdigest()
+
+    def get_file_path(self, key) -> Path:
+        return Path(self.cache_dir, f'{key}.json')
+
+    def read_entry(self, key) -> dict:
+        """Returns cached entry from memo, or from cache file if it exists."""
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+
+        file_path = self.get_file_path(key)
+        if not file_path.is_file():
+            return None
+        try:
+            with open(file_path, 'r') as f:
+                entry = json.load(f)
+        except Exception as e:
+            print(f'[WARNING] Ignoring invalid {file_path} cache file: {e}')
+            return None
+
+        with self._lock:
+            self._memo[key] = entry
+        return entry
+
+    def write_entry(self, key, entry):
+        """Write entry to memo and (atomically) to cache file."""
+        with self._lock:
+            self._memo[key] = entry
+
+        file_path = self.get_file_path(key)
+        Path.mkdir(file_path.parent, parents=True, exist_ok=True)
+        tmp_file_path = file_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_file_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_file_path, file_path)
+
+    def get_json(self, url, params=None, refresh=False) -> dict:
+        """Returns JSON response of a GET request, from cache if not expired, unless `refresh` is True.
+        """
+        key = self.get_key(url, params=params)
+
+        entry = None
+        if not refresh:
+            entry = self.read_entry(key)
+            if entry and time.time() - entry['timestamp'] < self.ttl:
+                return entry['response']
+
+        # set conditional request headers from expired cache entry
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        with closing(self.http_client.get(url, params=params, headers=headers)) as r:
+            if r.status_code == 304 and entry:  # not modified, extend cached entry life
+                entry['timestamp'] = time.time()
+            elif r.ok:
+                entry = {
+                    'url': url,
+                    'params': params,
+                    'etag': r.headers.get('ETag'),
+                    'last_modified': r.headers.get('Last-Modified'),
+                    'timestamp': time.time(),
+                    'response': r.json()
+                }
+            else:
+                raise Exception(f'Query {r.status_code} error: url={url}, query={params}')
+
+        self.write_entry(key, entry)
+        return entry['response']
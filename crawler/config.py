@@ -9,3 +9,73 @@ PDSSP_REGISTRY_ENDPOINT = 'https://pdssp.ias.universite-paris-saclay.fr/registry
 LOCAL_REGISTRY_DIRECTORY = '/Users/nmanaud/workspace/pdssp/pdssp-crawler/data/services'
 STAC_CATALOG_PARENT_ENDPOINT = 'https://pdssp.ias.universite-paris-saclay.fr'
 # STAC_GITHUB_REPOSITORY = 'https://github.com/pdssp/pdssp-stac-repo'
+
+EXTRACT_JOBS = 1
+"""Default number of concurrent workers used to retrieve source products metadata pages."""
+EXTRACT_PAGE_SIZE = 100
+"""Initial number of products retrieved per source query page, when no page size has been recorded for a service."""
+EXTRACT_MIN_PAGE_SIZE = 10
+"""Minimum number of products retrieved per source query page."""
+EXTRACT_MAX_PAGE_SIZE = 1000
+"""Default maximum number of products retrieved per source query page, unless a service `max_page_size` extra
+parameter is defined."""
+EXTRACT_TARGET_LATENCY = 10.0
+"""Target source query page response time, in seconds, from which page size is grown or shrunk."""
+EXTRACT_MAX_PAGE_BYTES = 64 * 1024 * 1024
+"""Maximum source query page payload size, in bytes, above which page size is not grown."""
+EXTRACT_VALIDATE = False
+"""Whether extracted source products metadata pages are checked after being written."""
+EXTRACT_CODEC = ''
+"""Compression codec of extracted source files: '' (no compression), 'gzip' or 'zstd' (requires `zstandard`)."""
+
+EXTRACT_CONSOLIDATE = False
+"""Consolidate extracted products metadata into a columnar (Parquet) products file (requires `pyarrow`)."""
+
+TRANSFORM_JOBS = 1
+"""Default number of worker processes used to transform source products metadata into STAC items."""
+TRANSFORM_BATCH_SIZE = 500
+"""Number of source products metadata sent at once to a transform worker process."""
+
+TRANSFORM_STREAMING = True
+"""Write each STAC item file as soon as created, rather than saving the whole STAC catalog once transformed."""
+
+TRANSFORM_VALIDATION_SAMPLING = 100
+"""Validate one in every N transformed STAC items against the destination STAC item schema (1: all, 0: none)."""
+
+DATASTORE_BACKEND = 'json'
+"""Source collections index backend: 'json' (`collections_index.json` file) or 'sqlite' (`collections_index.db` file)."""
+
+DATASTORE_LAZY = True
+"""Only load source collections records into source collection objects when accessed or matching filters."""
+
+DATASTORE_JOURNAL_MAX_RECORDS = 1000
+"""Number of collections journal records after which the journal is compacted into the JSON collections index file."""
+
+DATASTORE_LOCK_TIMEOUT = 60
+"""Maximum time in seconds to wait for the data store lock held by other processes."""
+
+PRODUCTS_LEDGER = True
+"""Record the processing state of each product in a ledger, to only transform and ingest new, changed or failed products."""
+
+HTTP_TIMEOUT = (10, 300)
+"""Default HTTP (connect, read) timeouts, in seconds."""
+HTTP_POOL_CONNECTIONS = 10
+"""Number of hosts for which a connection pool is kept."""
+HTTP_POOL_MAXSIZE = 16
+"""Maximum number of kept-alive connections per host; should be greater than or equal to `EXTRACT_JOBS`."""
+HTTP_MAX_RETRIES = 5
+"""Maximum number of retries of a request failing with a transient error (429/5xx status codes, or timeouts)."""
+HTTP_BACKOFF_FACTOR = 1.0
+"""Base delay of the exponential backoff between retries, in seconds."""
+HTTP_BACKOFF_MAX = 120.0
+"""Maximum delay between retries, in seconds."""
+HTTP_RATE_LIMIT = None
+"""Default maximum number of requests per second sent to a given host (None for no limit). Can be set per service
+using the `rate_limit` (and `rate_burst`) service extra parameters."""
+STAC_CATALOG_RATE_LIMIT = None
+"""Maximum number of requests per second sent to the destination STAC API Catalog (None for no limit)."""
+
+HTTP_CACHE_DIR = f'{SOURCE_DATA_DIR}/.cache'
+"""Directory of cached service responses (eg: PDS ODE `iipy` query listing)."""
+HTTP_CACHE_TTL = 24 * 3600
+"""Time-to-live of cached service responses, in seconds. Expired responses are revalidated when possible."""
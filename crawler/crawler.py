@@ -5,14 +5,22 @@ from typing import List, Optional
 from .extractor import Extractor
 from .transformer import Transformer
 from .ingestor import Ingestor
+from .client import HttpClient
 from .registry import HealthcheckrRegistry, LocalRegistry, Service, ServiceType, ExternalServiceType
-from .datastore import DataStore, SourceCollectionModel
+from .datastore import create_datastore, SourceCollectionModel
+from .ledger import ProductLedger
 from .config import (
     SOURCE_DATA_DIR,
     STAC_DATA_DIR,
     PDSSP_REGISTRY_ENDPOINT,
     LOCAL_REGISTRY_DIRECTORY,
     STAC_CATALOG_PARENT_ENDPOINT,
+    EXTRACT_JOBS,
+    EXTRACT_VALIDATE,
+    EXTRACT_CODEC,
+    EXTRACT_CONSOLIDATE,
+    TRANSFORM_JOBS,
+    PRODUCTS_LEDGER,
 )
 
 from pathlib import Path
@@ -23,19 +31,33 @@ class Crawler:
     Used by the Crawler CLI and Airflow DAGs.
     """
     def __init__(self):
-        self.registry = HealthcheckrRegistry(url=PDSSP_REGISTRY_ENDPOINT)
-        self.local_registry = LocalRegistry(path=LOCAL_REGISTRY_DIRECTORY)
-        self.datastore = DataStore(source_data_dir=SOURCE_DATA_DIR, stac_data_dir=STAC_DATA_DIR)
+        self.http_client = HttpClient()  # shared by registries, extractors and ingestors
+        self.registry = HealthcheckrRegistry(url=PDSSP_REGISTRY_ENDPOINT, http_client=self.http_client)
+        self.local_registry = LocalRegistry(path=LOCAL_REGISTRY_DIRECTORY, http_client=self.http_client)
+        self.datastore = create_datastore(source_data_dir=SOURCE_DATA_DIR, stac_data_dir=STAC_DATA_DIR)
+        self.ledger = ProductLedger(Path(SOURCE_DATA_DIR, 'products_ledger.db')) if PRODUCTS_LEDGER else None
         self.registered_services = []
         self.registered_collections = []
 
-    def reset_datastore(self):
+    def reset_datastore(self, refresh=False):
         """Reset data store using retrieved collections from internal and external data catalog services.
+
+        Use `refresh=True` to bypass cached service responses.
         """
         self.retrieve_registered_services()
-        self.retrieve_registered_collections()
+        self.retrieve_registered_collections(refresh=refresh)
         self.datastore.reset_source_collections(collections=self.registered_collections)
 
+    def sync_datastore(self, refresh=False):
+        """Synchronise data store with collections retrieved from internal and external data catalog services.
+
+        Unlike `reset_datastore`, the processing state of collections already in the data store is kept, and extracted
+        collections which number of products changed are marked as dirty.
+        """
+        self.retrieve_registered_services()
+        self.retrieve_registered_collections(refresh=refresh)
+        self.datastore.sync_source_collections(collections=self.registered_collections)
+
     def retrieve_registered_services(self) -> None:
         # allowed_types = ['WFS', 'PDSODE', 'EPNTAP'] # only "data service" types allowed
         allowed_types = ExternalServiceType.__members__.keys()
@@ -53,13 +75,13 @@ class Crawler:
             self.retrieve_registered_services()
         return self.registered_services
 
-    def retrieve_registered_collections(self) -> None: # TODO: Add filters (eg: `target`)
+    def retrieve_registered_collections(self, refresh=False) -> None: # TODO: Add filters (eg: `target`)
         if not self.registered_services:
             print('No data catalog services are registered. Use Crawler.retrieve_registered_services() method. ')
 
         for service in self.registered_services:
             # retrieve list of collections provided by each registered service
-            collections = Extractor(service=service).get_service_collections()   # filters to be added, passed to the get_service_collections() method
+            collections = Extractor(service=service, http_client=self.http_client).get_service_collections(refresh=refresh)   # filters to be added, passed to the get_service_collections() method
             print(f'{len(collections)} collections found in {service.title} service.')
             for collection in collections:
                 if collection:
@@ -80,37 +102,73 @@ class Crawler:
         registered_collections = self.get_registered_collections(retrieve=retrieve)
         self.datastore.save_collections(registered_collections, basename='registered_collections')
 
-    def list_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None):
+    def list_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None, dirty=None):
         """Display all, or a filtered list of source collections indexed in the data store.
         """
         self.datastore.list_source_collections(collection_id=collection_id, service_type=service_type,
-                                              target=target, extracted=extracted, transformed=transformed, ingested=ingested)
+                                              target=target, extracted=extracted, transformed=transformed, ingested=ingested,
+                                              dirty=dirty)
 
     def get_source_collection(self, collection_id) -> SourceCollectionModel:
         """Returns the source collection of a given identifier."""
         return self.datastore.get_source_collection(collection_id)
 
-    def get_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None) -> [SourceCollectionModel]:
+    def get_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None, dirty=None) -> [SourceCollectionModel]:
         """Returns the definition of the source collection matching a set of input filters.
         """
         return self.datastore.get_source_collections(collection_id=collection_id, service_type=service_type,
-                                                     target=target, extracted=extracted, transformed=transformed, ingested=ingested)
+                                                     target=target, extracted=extracted, transformed=transformed, ingested=ingested,
+                                                     dirty=dirty)
 
 
-    def process_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None, overwrite=False) -> None:
+    def get_products(self, collection_id, transform_status=None, ingest_status=None) -> List[dict]:
+        """Returns the products ledger records of a given collection, optionally filtered by transform and ingest status.
+        """
+        if not self.ledger:
+            print('Products ledger is disabled (see `PRODUCTS_LEDGER` configuration variable).')
+            return []
+        return self.ledger.get_products(collection_id, transform_status=transform_status, ingest_status=ingest_status)
+
+    def process_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None, dirty=None, overwrite=False, n_jobs=EXTRACT_JOBS, refresh=False, incremental=False) -> None:
         """Process all or a filtered selection of collections.
+
+        Use `refresh=True` to refresh cached service responses once, before processing collections, and
+        `incremental=True` to only extract products added or modified since the previous extraction, in which case
+        collections are re-transformed and re-ingested.
         """
         source_collections = self.get_source_collections(collection_id=collection_id, service_type=service_type,
                                                          target=target, extracted=extracted, transformed=transformed,
-                                                         ingested=ingested)
+                                                         ingested=ingested, dirty=dirty)
+        if refresh:
+            self.refresh_service_responses(source_collections)
+
         for source_collection in source_collections:
             print(f'Processing {source_collection.collection_id} collection...')
-            self.extract_collection(source_collection.collection_id, overwrite=overwrite)
-            self.transform_collection(source_collection.collection_id, overwrite=overwrite)
-            self.ingest_collection(source_collection.collection_id, update=overwrite)
+            self.extract_collection(source_collection.collection_id, overwrite=overwrite, n_jobs=n_jobs, refresh=False,
+                                    incremental=incremental)
+            self.transform_collection(source_collection.collection_id, overwrite=overwrite or incremental)
+            self.ingest_collection(source_collection.collection_id, update=overwrite or incremental)
 
-    def extract_collection(self, collection_id: str, overwrite=False) -> None:
+    def refresh_service_responses(self, collections: List[SourceCollectionModel]) -> None:
+        """Refresh cached service responses of the services of input source collections, once per service.
+        """
+        services = {}
+        for collection in collections:
+            if collection.service:
+                services.setdefault((collection.service.type, collection.service.url), collection.service)
+        for service in services.values():
+            try:
+                Extractor(service=service, http_client=self.http_client).refresh_service_responses()
+            except Exception as e:
+                print(f'[WARNING] Could not refresh cached {service.title} service responses.')
+                print(e)
+
+    def extract_collection(self, collection_id: str, overwrite=False, n_jobs=EXTRACT_JOBS, refresh=False, incremental=False) -> None:
         """Extract source collection file(s) from the "data catalog" service associated to a given collection identifier.
+
+        Source products metadata are retrieved using up to `n_jobs` concurrent workers. Use `refresh=True` to bypass
+        cached service responses, and `incremental=True` to only extract products added or modified since the previous
+        extraction of an already extracted collection.
         """
         # get source collection from data store
         collection = self.get_source_collection(collection_id)
@@ -119,7 +177,7 @@ class Crawler:
             return
 
         if collection.extracted:
-            if not overwrite: # quit unless input overwrite
+            if not overwrite and not incremental: # quit unless input overwrite or incremental
                 print(f'{collection_id} collection already extracted:')
                 print(f'- Source collection file(s): {collection.extracted_files}')  # extracted_data_dir ???
                 print()
@@ -127,17 +185,30 @@ class Crawler:
 
         print(f'Extracting {collection_id} source collection files...')
         try:
-            extractor = Extractor(service=collection.service)
-            extractor.extract(collection_id, output_dir_path=self.datastore.source_data_dir, overwrite=overwrite)  # .get_collection_metadata_files()
+            extractor = Extractor(collection=collection, http_client=self.http_client)
+            extractor.extract(collection_id, output_dir_path=self.datastore.source_data_dir, overwrite=overwrite, n_jobs=n_jobs,
+                              refresh=refresh, incremental=incremental, validate=EXTRACT_VALIDATE,
+                              codec=EXTRACT_CODEC)  # .get_collection_metadata_files()
         except Exception as e:
             print(f'Could not extract {collection_id} source collection.')
             print(e)
             return
 
+        if EXTRACT_CONSOLIDATE and hasattr(extractor, 'consolidate'):
+            try:
+                extractor.consolidate()
+            except Exception as e:
+                print(f'[WARNING] Could not consolidate {collection_id} extracted products metadata.')
+                print(e)
+
         # Update source collection and data store
         collection.extracted = extractor.extracted
         collection.extracted_files = extractor.extracted_files
-        self.datastore.save_source_collections(overwrite=True)
+        collection.extracted_time = extractor.extracted_time
+        collection.extracted_codec = extractor.extracted_codec
+        collection.consolidated_file = extractor.consolidated_file
+        collection.dirty = False
+        self.datastore.update_source_collections([collection])
 
         # report on source collection extraction
         print(f'{collection_id} source collection successfully extracted:')
@@ -145,8 +216,10 @@ class Crawler:
         print()
 
 
-    def transform_collection(self, collection_id, subdir='', overwrite=False):
+    def transform_collection(self, collection_id, subdir='', overwrite=False, n_jobs=TRANSFORM_JOBS):
         """Transform a source collection into a STAC collection file.
+
+        Source products metadata are transformed using up to `n_jobs` worker processes.
         """
         # get source collection from data store
         collection = self.get_source_collection(collection_id)
@@ -170,7 +243,7 @@ class Crawler:
             try:
                 transformer = Transformer(collection)
                 output_dir_path = Path(self.datastore.stac_data_dir, subdir)
-                transformer.transform(output_dir_path=output_dir_path, overwrite=overwrite)
+                transformer.transform(output_dir_path=output_dir_path, overwrite=overwrite, ledger=self.ledger, n_jobs=n_jobs)
             except Exception as e:
                 print(f'Could not transform {collection_id} source collection.')
                 print(e)
@@ -179,7 +252,7 @@ class Crawler:
             # Update source collection and data store
             collection.transformed = transformer.transformed
             collection.stac_dir = transformer.stac_dir
-            self.datastore.save_source_collections(overwrite=True)
+            self.datastore.update_source_collections([collection])
         else:
             print(f'Could not extract {collection_id} source collection.')
 
@@ -217,7 +290,8 @@ class Crawler:
             # stac_collection_file = f'{collection.stac_dir}/collection.json'
             # ingestor.ingest(stac_file=stac_collection_file, update_if_exists=update, ingest_strategy='catalog')
             try:
-                ingestor = Ingestor(stac_api_parent_url=STAC_CATALOG_PARENT_ENDPOINT) # requires RESTO_ADMIN_AUTH_TOKEN env variable
+                ingestor = Ingestor(stac_api_parent_url=STAC_CATALOG_PARENT_ENDPOINT, http_client=self.http_client,
+                                    ledger=self.ledger) # requires RESTO_ADMIN_AUTH_TOKEN env variable
                 stac_collection_file = f'{collection.stac_dir}/collection.json'
                 ingestor.ingest(stac_file=stac_collection_file, update_if_exists=update, ingest_strategy='both')
             except Exception as e:
@@ -228,7 +302,7 @@ class Crawler:
             # Update source collection and data store
             collection.ingested = ingestor.ingested
             collection.stac_url = ingestor.stac_url
-            self.datastore.save_source_collections(overwrite=True)
+            self.datastore.update_source_collections([collection])
         else:
             print(f'Could not transform {collection_id} source collection.')
 
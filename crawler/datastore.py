@@ -1,19 +1,64 @@
 """PDSSP Crawler data store module."""
 
-from pydantic import BaseModel
+from pydantic import BaseModel, parse_obj_as
 from typing import List, Union, Optional
 
 from .registry import Service, ExternalService
+from .config import DATASTORE_BACKEND, DATASTORE_JOURNAL_MAX_RECORDS, DATASTORE_LOCK_TIMEOUT, DATASTORE_LAZY
 
 from pathlib import Path
 from datetime import datetime
+from contextlib import contextmanager
+import hashlib
 import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl  # not available on Windows, where the data store is not locked
+except ImportError:
+    fcntl = None
 
-import copy
 
 COLLECTIONS_JSON_TYPE = 'SourceCollections'
 """JSON Source Collections file type"""
 
+SQLITE_COLLECTIONS_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS collections (
+        collection_id TEXT PRIMARY KEY,
+        service_type TEXT,
+        target TEXT,
+        extracted INTEGER NOT NULL DEFAULT 0,
+        transformed INTEGER NOT NULL DEFAULT 0,
+        ingested INTEGER NOT NULL DEFAULT 0,
+        dirty INTEGER NOT NULL DEFAULT 0,
+        record TEXT NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS collections_service_type ON collections (service_type)',
+    'CREATE INDEX IF NOT EXISTS collections_target ON collections (target)',
+    'CREATE INDEX IF NOT EXISTS collections_extracted ON collections (extracted)',
+    'CREATE INDEX IF NOT EXISTS collections_transformed ON collections (transformed)',
+    'CREATE INDEX IF NOT EXISTS collections_ingested ON collections (ingested)',
+    'CREATE INDEX IF NOT EXISTS collections_dirty ON collections (dirty)',
+    '''CREATE TABLE IF NOT EXISTS services (
+        service_id TEXT PRIMARY KEY,
+        record TEXT NOT NULL
+    )''',
+]
+"""SQLite source collections index table and indexes definition statements."""
+
+SQLITE_USER_VERSION = 1
+"""SQLite collections index database `user_version`, set once the database is initialised from input collections or
+migrated from the JSON collections index."""
+
+SOURCE_COLLECTION_STATE_FIELDS = [
+    'extracted', 'extracted_files', 'extracted_time', 'extracted_codec', 'consolidated_file', 'transformed', 'stac_dir',
+    'ingested', 'stac_url', 'dirty'
+]
+"""Source collection fields holding its processing state, kept when synchronising source collections."""
+
 class SourceCollectionModel(BaseModel):
     collection_id: str
     service: Optional[Union[Service, ExternalService]]
@@ -23,52 +68,145 @@ class SourceCollectionModel(BaseModel):
     n_products: Optional[int]
     extracted: Optional[bool] = False
     extracted_files: Optional[list] = []  # should be changed/renamed to `source_dir`
+    extracted_time: Optional[str] = ''  # UTC time of the last (full or incremental) extraction
+    extracted_codec: Optional[str] = ''  # compression codec of extracted files: '', 'gzip' or 'zstd'
+    consolidated_file: Optional[str] = ''  # columnar (Parquet) products file consolidated from extracted files
     transformed: Optional[bool] = False
     stac_dir: Optional[str] = ''
     ingested: Optional[bool] = False
     stac_url: Optional[str] = ''
+    dirty: Optional[bool] = False  # number of products changed since last extraction
+
+
+class FileLock:
+    """Exclusive inter-process lock on a lock file, re-entrant within a process.
+    """
+    def __init__(self, file_path, timeout=DATASTORE_LOCK_TIMEOUT):
+        self.file_path = Path(file_path)
+        self.timeout = timeout
+        self.file = None
+        self.depth = 0
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        self.lock.acquire()
+        if self.depth == 0 and fcntl:
+            Path.mkdir(self.file_path.parent, parents=True, exist_ok=True)
+            self.file = open(self.file_path, 'a')
+            start_time = time.monotonic()
+            while True:
+                try:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() - start_time > self.timeout:
+                        self.file.close()
+                        self.file = None
+                        self.lock.release()
+                        raise Exception(f'Could not acquire {self.file_path} lock within {self.timeout} seconds.')
+                    time.sleep(0.05)
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.depth -= 1
+        if self.depth == 0 and self.file:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+        self.lock.release()
 
 
 class DataStore:
     """DataStore class.
+
+    Source collections updates are appended to a journal file (`collections_index.journal`), replayed on top of the
+    JSON collections index file when loading, and compacted into it every `DATASTORE_JOURNAL_MAX_RECORDS` records.
+
+    Several processes can share the same data store: index and journal files are written while holding a lock file
+    (`collections_index.lock`), and journal records only hold the fields changed by an update, so that changes made
+    to a given collection by other processes since it was loaded are merged instead of overwritten.
+
+    In lazy mode (`lazy=True`), source collections records are only loaded into `SourceCollectionModel` objects when
+    accessed or matching filters. Collections index files read by the data store are cached within the process, and
+    only read again when modified.
+
+    Services are stored once in the collections index, in a table of services records referenced by collections
+    records (`service_id`), and loaded source collections of a given service share the same service object.
     """
-    def __init__(self, source_data_dir='', stac_data_dir='', collections=None):
+    records_cache = {}  # source collections and services records of read collections index files, with file identification
+
+    def __init__(self, source_data_dir='', stac_data_dir='', collections=None, lazy=DATASTORE_LAZY):
         # TODO: check that source and STAC data directories exist.
         self.source_data_dir = source_data_dir
         self.stac_data_dir = stac_data_dir
+        self.lazy = lazy
 
         self.collections_index_file = Path(source_data_dir, 'collections_index.json')
-
-        # load data store collections if collections index file exists
-        if self.collections_index_file.is_file():
-            print('Loading data store source collections...')
-            collections = self.load_collections(self.collections_index_file)
-            print(f'{len(collections)} source collections loaded in the data store.')
-            self.source_collections = collections
-        else:
-            print('Source collections index file not found.')
-            if collections:
-                print('Creating collections index file from input collections...')
+        self.collections_journal_file = Path(source_data_dir, 'collections_index.journal')
+        self.collections_lock = FileLock(Path(source_data_dir, 'collections_index.lock'))
+
+        self.source_collections_by_id = {}  # loaded source collections, by identifier
+        self.persisted_records = {}  # last known persisted record of each source collection, by identifier
+        self.service_records = {}  # services records, by service identifier
+        self.services = {}  # loaded services, by service identifier
+        self.index_file_stat = None
+        self.journal_offset = 0
+        self.n_journal_records = 0
+
+        with self.collections_lock:
+            # load data store collections if collections index file exists
+            if self.collections_index_file.is_file():
+                print('Loading data store source collections...')
+                self.refresh()
+                if not self.lazy:
+                    self.load_source_collections()
+                print(f'{len(self.persisted_records)} source collections loaded in the data store.')
             else:
-                print('Creating empty collections index file...')
+                print('Source collections index file not found.')
+                if collections:
+                    print('Creating collections index file from input collections...')
+                else:
+                    print('Creating empty collections index file...')
 
-            self.reset_source_collections(collections=collections)
+                self.reset_source_collections(collections=collections)
 
     def reset_source_collections(self, collections=None):
         """Reset source collections index to an empty collections or an input collections list.
         """
-        self.source_collections = []
-        if collections:
-            self.source_collections = collections
-
-        self.save_source_collections(overwrite=True)
+        collections = collections if collections else []
+        with self.collections_lock:
+            self.source_collections_by_id = {}
+            self.persisted_records = {}
+            for collection in collections:
+                self.source_collections_by_id[collection.collection_id] = collection
+                self.persisted_records[collection.collection_id] = self.get_collection_record(collection)
+            self.compact(refresh=False)
+
+    @property
+    def source_collections(self) -> List[SourceCollectionModel]:
+        """All source collections indexed in the data store."""
+        return self.load_source_collections()
+
+    def load_source_collections(self, collection_ids=None) -> List[SourceCollectionModel]:
+        """Returns source collections of input identifiers, or all source collections, loading them if not loaded yet.
+
+        Source collections which records could not be loaded are ignored.
+        """
+        collections = []
+        for collection_id in collection_ids if collection_ids is not None else list(self.persisted_records.keys()):
+            collection = self.get_source_collection(collection_id)
+            if collection:
+                collections.append(collection)
+        return collections
 
-    def list_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None):
+    def list_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None, dirty=None):
         """Display all, or a filtered list of source collections indexed in the data store.
         """
         print('ds list ingested', ingested)
         collections = self.get_source_collections(collection_id=collection_id, service_type=service_type,
-                                                     target=target, extracted=extracted, transformed=transformed, ingested=ingested)
+                                                     target=target, extracted=extracted, transformed=transformed, ingested=ingested,
+                                                     dirty=dirty)
 
         if len(collections) == 0:
             print('No collections matching input filters.')
@@ -91,103 +229,355 @@ class DataStore:
     def get_source_collection(self, collection_id: str) -> SourceCollectionModel:
         """Returns the source collection corresponding to input identifier.
         """
-        collection = None
-        for source_collection in self.source_collections:
-            if source_collection.collection_id == collection_id:
-                return source_collection
+        collection = self.source_collections_by_id.get(collection_id)
+        if collection or collection_id not in self.persisted_records.keys():
+            return collection
+
+        record = self.persisted_records[collection_id]
+        try:
+            collection = self.create_source_collection(record)
+        except Exception as e:
+            print(e)
+            print(f'[WARNING] The following collection dictionary could not be loaded in a SourceCollectionModel object: {record}')
+            print()
+            return None
+        self.source_collections_by_id[collection_id] = collection
         return collection
 
-    def get_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None) -> [SourceCollectionModel]:
+    def get_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None, dirty=None) -> [SourceCollectionModel]:
         """Returns source collections matching input filters.
-        """
-        # set initial list of filtered source collections
-        filtered_collections = copy.copy(self.source_collections)
 
-        if collection_id:
-            source_collections = []
-            for collection in filtered_collections:
-                if collection_id.lower() in collection.collection_id.lower():
-                    source_collections.append(collection)
-            filtered_collections = source_collections
+        Filters are applied to loaded source collections, or to source collections records not loaded yet, so that
+        only matching source collections are loaded.
+        """
+        filtered_collection_ids = []
+        for source_collection_id, record in self.persisted_records.items():
+            collection = self.source_collections_by_id.get(source_collection_id)
+            if collection:
+                values = {
+                    'service_type': collection.service.type.name if collection.service else None,
+                    'target': collection.target,
+                    'extracted': collection.extracted,
+                    'transformed': collection.transformed,
+                    'ingested': collection.ingested,
+                    'dirty': collection.dirty
+                }
+            else:
+                values = {
+                    'service_type': self.service_records.get(record.get('service_id'), {}).get('type'),
+                    'target': record.get('target'),
+                    'extracted': record.get('extracted'),
+                    'transformed': record.get('transformed'),
+                    'ingested': record.get('ingested'),
+                    'dirty': record.get('dirty')
+                }
+
+            if collection_id and collection_id.lower() not in source_collection_id.lower():
+                continue
+            if service_type and service_type != values['service_type']:
+                continue
+            if target and (not values['target'] or target.lower() not in values['target'].lower()):
+                continue
+            if extracted is not None and bool(extracted) != bool(values['extracted']):
+                continue
+            if transformed is not None and bool(transformed) != bool(values['transformed']):
+                continue
+            if ingested is not None and bool(ingested) != bool(values['ingested']):
+                continue
+            if dirty is not None and bool(dirty) != bool(values['dirty']):
+                continue
+            filtered_collection_ids.append(source_collection_id)
+
+        return self.load_source_collections(filtered_collection_ids)
 
-        if service_type:
-            source_collections = []
-            for collection in filtered_collections:
-                if service_type == collection.service.type.name:
-                    source_collections.append(collection)
-            filtered_collections = source_collections
+    def add_source_collections(self, collections: [SourceCollectionModel]):
+        """Add collections to the source collections index table.
 
-        if target:
-            source_collections = []
-            for collection in filtered_collections:
-                if target.lower() in collection.target.lower():
-                    source_collections.append(collection)  # add if extracted
-            filtered_collections = source_collections
-
-        if extracted is not None:
-            if extracted:
-                source_collections = []
-                for collection in filtered_collections:
-                    if collection.extracted:
-                        source_collections.append(collection)  # add if not extracted
-                filtered_collections = source_collections
-            else:
-                source_collections = []
-                for collection in filtered_collections:
-                    if not collection.extracted:
-                        source_collections.append(collection)
-                filtered_collections = source_collections
-
-        if transformed is not None:
-            if transformed:
-                source_collections = []
-                for collection in filtered_collections:
-                    if collection.transformed:
-                        source_collections.append(collection)  # add if transformed
-                filtered_collections = source_collections
-            else:
-                source_collections = []
-                for collection in filtered_collections:
-                    if not collection.transformed:
-                        source_collections.append(collection)  # add if not transformed
-                filtered_collections = source_collections
-
-        if ingested is not None:
-            if ingested:
-                source_collections = []
-                for collection in filtered_collections:
-                    if collection.ingested:
-                        source_collections.append(collection)  # add if ingested
-                filtered_collections = source_collections
+        Collections already found in the index are not added.
+        """
+        new_collections = []
+        for collection in collections:
+            if self.get_source_collection(collection.collection_id):
+                print(f'[WARNING] {collection.collection_id} collection already in the data store: not added.')
             else:
-                source_collections = []
-                for collection in filtered_collections:
-                    if not collection.ingested:
-                        source_collections.append(collection)  # add if not ingested
-                filtered_collections = source_collections
+                new_collections.append(collection)
+        self.update_source_collections(new_collections)
 
-        return filtered_collections
+    def sync_source_collections(self, collections: [SourceCollectionModel]):
+        """Synchronise source collections index with input (retrieved) collections, keeping processing state.
 
-    # TODO: add_source_collections
-    def add_source_collections(self, collections: [SourceCollectionModel]):
-        """Add collections to the source collections index table"""
-        pass
+        New collections are added, and the metadata of collections already in the index are updated, keeping their
+        processing state fields. Extracted collections which number of products changed are marked as dirty, to be
+        processed again, for example incrementally. Collections not found in input collections are deleted, only if
+        their service provided input collections, so that collections of a service temporarily unavailable are kept.
+        """
+        collections_by_id = {collection.collection_id: collection for collection in collections}
+        service_titles = {collection.service.title for collection in collections if collection.service}
+
+        new_collections = []
+        updated_collections = []
+        deleted_collections = []
+        n_dirty = 0
+        for collection_id, collection in collections_by_id.items():
+            source_collection = self.get_source_collection(collection_id)
+            if not source_collection:
+                new_collections.append(collection)
+                continue
+            if source_collection.extracted and source_collection.n_products != collection.n_products:
+                source_collection.dirty = True
+                n_dirty += 1
+            for name in SourceCollectionModel.__fields__.keys():
+                if name not in SOURCE_COLLECTION_STATE_FIELDS:
+                    setattr(source_collection, name, getattr(collection, name))
+            if self.get_changed_fields(source_collection):
+                updated_collections.append(source_collection)
+
+        for source_collection in self.source_collections:
+            if source_collection.collection_id not in collections_by_id.keys():
+                if source_collection.service and source_collection.service.title in service_titles:
+                    deleted_collections.append(source_collection)
+
+        self.add_source_collections(new_collections)
+        self.update_source_collections(updated_collections)
+        self.delete_source_collections(deleted_collections)
+
+        print(f'{len(new_collections)} source collections added, {len(updated_collections)} updated ({n_dirty} marked as '
+              f'dirty), and {len(deleted_collections)} deleted.')
 
-    # TODO: update_source_collections
     def update_source_collections(self, collections: [SourceCollectionModel]):
-        """Update collections in the source collections index table"""
-        pass
+        """Update collections in the source collections index table.
+
+        Fields changed since collections were loaded are appended (and flushed to disk) to the collections journal
+        file, instead of rewriting the whole collections index file. Collections not found in the index are added.
+        """
+        changes = []
+        for collection in collections:
+            fields = self.get_changed_fields(collection)
+            if fields:
+                changes.append((collection.collection_id, fields))
+        if not changes:
+            return
+
+        with self.collections_lock:
+            self.refresh()  # apply changes made by other processes first
+            with open(self.collections_journal_file, 'ab') as f:
+                for collection_id, fields in changes:
+                    record = {'op': 'update', 'collection_id': collection_id, 'fields': fields}
+                    if fields.get('service_id'):
+                        record['services'] = {fields['service_id']: self.service_records[fields['service_id']]}
+                    f.write((json.dumps(record) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                self.journal_offset = f.tell()
+
+            for collection_id, fields in changes:
+                self.apply_record(collection_id, fields)
+            self.n_journal_records += len(changes)
+
+            if self.n_journal_records >= DATASTORE_JOURNAL_MAX_RECORDS:
+                self.compact()
 
-    # TODO: delete_source_collections
     def delete_source_collections(self, collections: [SourceCollectionModel]):
-        """Delete collections to the source collections index table"""
-        pass
+        """Delete collections from the source collections index table.
+
+        Deletions are appended to the collections journal file, like updates.
+        """
+        collection_ids = [collection.collection_id for collection in collections]
+        if not collection_ids:
+            return
+
+        with self.collections_lock:
+            self.refresh()
+            with open(self.collections_journal_file, 'ab') as f:
+                for collection_id in collection_ids:
+                    f.write((json.dumps({'op': 'delete', 'collection_id': collection_id}) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                self.journal_offset = f.tell()
+
+            for collection_id in collection_ids:
+                self.remove_record(collection_id)
+            self.n_journal_records += len(collection_ids)
+
+            if self.n_journal_records >= DATASTORE_JOURNAL_MAX_RECORDS:
+                self.compact()
+
+    def remove_record(self, collection_id):
+        """Remove the persisted record and the loaded source collection of a given identifier."""
+        self.persisted_records.pop(collection_id, None)
+        self.source_collections_by_id.pop(collection_id, None)
+
+    def get_service_record_id(self, service_record: dict) -> str:
+        """Returns the (content-based) identifier of a service record."""
+        return hashlib.sha1(json.dumps(service_record, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def get_collection_record(self, collection: SourceCollectionModel) -> dict:
+        """Returns the record of a source collection, referencing its service record by identifier.
+        """
+        return self.normalise_record(json.loads(collection.json(by_alias=True)))
+
+    def normalise_record(self, record: dict) -> dict:
+        """Returns a source collection record referencing its service record by identifier, registering the service
+        record of a record embedding it.
+        """
+        if 'service' not in record.keys():
+            return record
+        record = dict(record)
+        service_record = record.pop('service')
+        record['service_id'] = None
+        if service_record:
+            service_id = self.get_service_record_id(service_record)
+            self.service_records.setdefault(service_id, service_record)
+            record['service_id'] = service_id
+        return record
+
+    def get_service(self, service_id) -> Union[Service, ExternalService]:
+        """Returns the service of a given service identifier, loaded once per data store."""
+        if service_id in self.services.keys():
+            return self.services[service_id]
+        if service_id not in self.service_records.keys():
+            return None
+        service = parse_obj_as(Union[Service, ExternalService], self.service_records[service_id])
+        self.services[service_id] = service
+        return service
+
+    def create_source_collection(self, record: dict) -> SourceCollectionModel:
+        """Returns the source collection object of a source collection record, sharing loaded service objects.
+        """
+        record = dict(record)
+        service_id = record.pop('service_id', None)
+        collection = SourceCollectionModel(**record)
+        if service_id:
+            collection.service = self.get_service(service_id)  # assigned after validation, not to be copied
+        return collection
+
+    def get_changed_fields(self, collection: SourceCollectionModel) -> dict:
+        """Returns the fields of a source collection that differ from its last known persisted record, or all fields
+        if not persisted yet.
+        """
+        record = self.get_collection_record(collection)
+        persisted_record = self.persisted_records.get(collection.collection_id)
+        if persisted_record is None:
+            return record
+        return {name: value for name, value in record.items() if persisted_record.get(name) != value}
+
+    def apply_record(self, collection_id, fields: dict):
+        """Apply changed fields to the persisted record and the loaded source collection of a given identifier.
+
+        The loaded source collection object, if any, is updated in place.
+        """
+        record = dict(self.persisted_records.get(collection_id, {}), **fields)
+        self.persisted_records[collection_id] = record
+
+        source_collection = self.source_collections_by_id.get(collection_id)
+        if not source_collection:  # loaded on access
+            return
+        try:
+            collection = self.create_source_collection(record)
+        except Exception as e:
+            print(e)
+            print(f'[WARNING] The following collection dictionary could not be loaded in a SourceCollectionModel object: {record}')
+            print()
+            return
+        for name in fields.keys():
+            name = 'service' if name == 'service_id' else name
+            setattr(source_collection, name, getattr(collection, name))
+
+    def get_index_file_stat(self) -> tuple:
+        """Returns collections index file identification, changed whenever the file is replaced."""
+        if not self.collections_index_file.is_file():
+            return None
+        stat = self.collections_index_file.stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """Apply changes made to the collections index and journal files since they were last read, by this or other
+        processes. To be called while holding the collections lock.
+        """
+        index_file_stat = self.get_index_file_stat()
+        if index_file_stat != self.index_file_stat:
+            # collections index file created or compacted: apply changed records
+            records, service_records = self.read_collections_records(self.collections_index_file) if index_file_stat else ([], {})
+            self.service_records.update(service_records)
+            collection_ids = {record.get('collection_id') for record in records}
+            for collection_id in list(self.persisted_records.keys()):
+                if collection_id not in collection_ids:  # deleted by another process
+                    self.remove_record(collection_id)
+            for record in records:
+                record = self.normalise_record(record)
+                collection_id = record.get('collection_id')
+                if not collection_id:
+                    print(f'[WARNING] Ignoring collection dictionary without `collection_id`: {record}')
+                    continue
+                if not self.source_collections_by_id and collection_id not in self.persisted_records.keys():
+                    self.persisted_records[collection_id] = record  # initial load
+                    continue
+                persisted_record = self.persisted_records.get(collection_id, {})
+                fields = {name: value for name, value in record.items() if persisted_record.get(name) != value}
+                if fields:
+                    self.apply_record(collection_id, fields)
+            self.index_file_stat = index_file_stat
+            self.journal_offset = 0
+            self.n_journal_records = 0
+
+        self.replay_journal()
+
+    def replay_journal(self):
+        """Apply collections journal file records appended since the journal was last read.
+
+        A truncated last record, resulting from an interrupted write, is ignored and removed from the journal file.
+        To be called while holding the collections lock.
+        """
+        if not self.collections_journal_file.is_file():
+            return
+
+        with open(self.collections_journal_file, 'rb') as f:
+            f.seek(self.journal_offset)
+            for line in f:
+                if not line.endswith(b'\n'):  # truncated last record
+                    print(f'[WARNING] Ignoring truncated {self.collections_journal_file} last record.')
+                    break
+                self.journal_offset += len(line)
+                try:
+                    record = json.loads(line)
+                    self.service_records.update(record.get('services', {}))
+                    if record['op'] == 'update':
+                        self.apply_record(record['collection_id'], record['fields'])
+                    elif record['op'] == 'delete':
+                        self.remove_record(record['collection_id'])
+                except Exception as e:
+                    print(f'[WARNING] Ignoring invalid {self.collections_journal_file} record: {e}')
+                    continue
+                self.n_journal_records += 1
+
+        if self.journal_offset < self.collections_journal_file.stat().st_size:
+            os.truncate(self.collections_journal_file, self.journal_offset)
+
+    def compact(self, refresh=True):
+        """Write persisted source collections records into the JSON collections index file, and clear the collections
+        journal.
+
+        The collections index file is replaced atomically, before removing the journal file: if interrupted, journal
+        records are replayed again on next load.
+        """
+        with self.collections_lock:
+            if refresh:
+                self.refresh()
+            records = list(self.persisted_records.values())
+            self.write_collections_records(records, self.collections_index_file, service_records=self.service_records)
+            if self.collections_journal_file.is_file():
+                Path.unlink(self.collections_journal_file)
+            self.index_file_stat = self.get_index_file_stat()
+            self.journal_offset = 0
+            self.n_journal_records = 0
 
     def save_source_collections(self, overwrite=False):
         """Save loaded source collections into the JSON collections index file.
         """
         if not Path.is_file(self.collections_index_file) or overwrite:
-            self.save_collections(self.source_collections, filepath=self.collections_index_file)
+            with self.collections_lock:
+                self.update_source_collections(list(self.source_collections_by_id.values()))
+                self.compact()
 
     def save_collections(self, collections, basename='', filepath=None):
         if filepath:
@@ -200,19 +590,46 @@ class DataStore:
             collections_filename = f'{basename}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json' # datetime tag
             collections_filepath = Path(self.source_data_dir, collections_filename)
 
+        records = [self.get_collection_record(collection) for collection in collections]
+        self.write_collections_records(records, collections_filepath, service_records=self.service_records)
+
+        # print(f'{len(collections)} collections saved in {collections_filepath} file.') TODO: To be logged instead.
+
+    def write_collections_records(self, records: List[dict], filepath, service_records=None):
+        """Write source collections dictionaries, and the services records they reference, into a JSON Source
+        Collections file.
+        """
+        service_ids = {record.get('service_id') for record in records}
+        service_records = {service_id: service_record for service_id, service_record in (service_records or {}).items()
+                           if service_id in service_ids}
         json_dict = {
             'type': COLLECTIONS_JSON_TYPE,
-            'collections': []
+            'services': service_records,
+            'collections': records
         }
-        for collection in collections:
-            json_dict['collections'].append(json.loads(collection.json(by_alias=True)))
 
-        with open(collections_filepath, 'w') as f:
+        # write to temporary file first, so that an interrupted write does not corrupt an existing file
+        tmp_filepath = Path(f'{filepath}.{os.getpid()}.tmp')
+        with open(tmp_filepath, 'w') as f:
             f.write(json.dumps(json_dict))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filepath, filepath)
 
-        # print(f'{len(collections)} collections saved in {collections_filepath} file.') TODO: To be logged instead.
+        stat = os.stat(filepath)
+        self.records_cache[str(filepath)] = ((stat.st_ino, stat.st_mtime_ns, stat.st_size), records, service_records)
 
-    def load_collections(self, filepath):
+    def read_collections_records(self, filepath) -> (List[dict], dict):
+        """Returns source collections dictionaries and services records of a JSON Source Collections file, from cache
+        if not modified.
+
+        Source collections dictionaries of files written before services records were introduced embed their service.
+        """
+        stat = os.stat(filepath)
+        file_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self.records_cache.get(str(filepath))
+        if cached and cached[0] == file_stat:
+            return cached[1], cached[2]
 
         with open(filepath, 'r') as f:
             data = json.load(f)
@@ -226,14 +643,21 @@ class DataStore:
         if 'collections' not in data.keys():
             raise Exception(f'Error loading input {filepath} file: missing JSON "collections" attribute.')
 
+        service_records = data.get('services', {})
+        self.records_cache[str(filepath)] = (file_stat, data['collections'], service_records)
+        return data['collections'], service_records
+
+    def load_collections(self, filepath):
+
         # get collections
-        collections_dicts = data['collections']
+        collections_dicts, service_records = self.read_collections_records(filepath)
+        self.service_records.update(service_records)
 
         collections = []
         for collection_dict in collections_dicts:
             try:
                 # attempt to load collection dict to a SourceCollectionModel object
-                collection = SourceCollectionModel(**collection_dict)
+                collection = self.create_source_collection(self.normalise_record(collection_dict))
             except Exception as e:
                 print(e)
                 collection = None
@@ -245,4 +669,255 @@ class DataStore:
                 print(f'[WARNING] The following collection dictionary could not be loaded in a SourceCollectionModel object: {collection_dict}')
                 print()
 
-        return collections
\ No newline at end of file
+        return collections
+
+class SQLiteDataStore(DataStore):
+    """SQLite data store class.
+
+    Source collections are indexed in a SQLite database file, with indexed columns for collection identifier, service
+    type, target, and processing status flags, so that source collections can be retrieved and filtered without loading
+    the whole index. On first use, source collections are migrated from the JSON collections index file if it exists.
+
+    Several processes can share the same database: updates are written in immediate transactions, merging the fields
+    changed since a collection was loaded into its current record.
+    """
+    def __init__(self, source_data_dir='', stac_data_dir='', collections=None):
+        self.source_data_dir = source_data_dir
+        self.stac_data_dir = stac_data_dir
+
+        self.collections_index_file = Path(source_data_dir, 'collections_index.json')
+        self.collections_db_file = Path(source_data_dir, 'collections_index.db')
+
+        # source collections returned by the data store, by identifier, saved by `save_source_collections`
+        self.loaded_collections = {}
+        self.persisted_records = {}  # last known persisted record of each loaded source collection, by identifier
+        self.service_records = {}
+        self.services = {}
+
+        self.connection = sqlite3.connect(self.collections_db_file, timeout=DATASTORE_LOCK_TIMEOUT, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+
+        # create and initialise the database in a single transaction, so that an interrupted initialisation is
+        # entirely rolled back, and started again on next use.
+        with self.transaction():
+            # add `dirty` column to collections table created before it was introduced
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info(collections)')]
+            if columns and 'dirty' not in columns:
+                self.connection.execute('ALTER TABLE collections ADD COLUMN dirty INTEGER NOT NULL DEFAULT 0')
+            for statement in SQLITE_COLLECTIONS_SCHEMA:
+                self.connection.execute(statement)
+
+            user_version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+            if user_version < SQLITE_USER_VERSION:
+                if self.connection.execute('SELECT 1 FROM collections LIMIT 1').fetchone():
+                    pass  # database initialised before `user_version` was introduced
+                elif self.collections_index_file.is_file():
+                    self.migrate_from_json()
+                else:
+                    print('Source collections index database not found.')
+                    if collections:
+                        print('Creating collections index database from input collections...')
+                    else:
+                        print('Creating empty collections index database...')
+                    self.reset_source_collections(collections=collections)
+                self.connection.execute(f'PRAGMA user_version = {SQLITE_USER_VERSION}')
+
+    @property
+    def source_collections(self) -> List[SourceCollectionModel]:
+        """All source collections indexed in the data store."""
+        return self.get_source_collections()
+
+    def migrate_from_json(self):
+        """Import source collections from the JSON collections index (and journal) files into the collections index
+        database.
+        """
+        print(f'Migrating source collections from {self.collections_index_file} to {self.collections_db_file}...')
+        collections = DataStore(source_data_dir=self.source_data_dir, stac_data_dir=self.stac_data_dir).source_collections
+        self.reset_source_collections(collections=collections)
+        print(f'{len(collections)} source collections migrated.')
+
+    @contextmanager
+    def transaction(self):
+        """Context manager running statements in an immediate transaction, holding the database write lock.
+
+        Statements of a transaction started within another transaction are part of the enclosing transaction.
+        """
+        if self.connection.in_transaction:
+            yield self.connection
+            return
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def reset_source_collections(self, collections=None):
+        """Reset source collections index to an empty collections or an input collections list.
+        """
+        self.loaded_collections = {}
+        self.persisted_records = {}
+        with self.transaction():
+            self.connection.execute('DELETE FROM collections')
+            if collections:
+                self.write_collections(collections)
+        for collection in collections or []:
+            self.loaded_collections[collection.collection_id] = collection
+
+    def get_service(self, service_id) -> Union[Service, ExternalService]:
+        """Returns the service of a given service identifier, loaded once per data store."""
+        if service_id and service_id not in self.service_records.keys():
+            row = self.connection.execute('SELECT record FROM services WHERE service_id = ?', (service_id,)).fetchone()
+            if row:
+                self.service_records[service_id] = json.loads(row[0])
+        return super().get_service(service_id)
+
+    def get_collection_row(self, collection: SourceCollectionModel) -> tuple:
+        """Returns the collections table row of a given source collection."""
+        service_type = collection.service.type.name if collection.service else None
+        target = collection.target.lower() if collection.target else None
+        return (collection.collection_id, service_type, target, int(bool(collection.extracted)),
+                int(bool(collection.transformed)), int(bool(collection.ingested)), int(bool(collection.dirty)),
+                json.dumps(self.get_collection_record(collection)))
+
+    def write_collections(self, collections: List[SourceCollectionModel]):
+        """Insert, or replace if existing, source collections rows, and referenced services rows. To be called within a
+        transaction."""
+        rows = [self.get_collection_row(collection) for collection in collections]
+        self.connection.executemany(
+            'INSERT INTO collections (collection_id, service_type, target, extracted, transformed, ingested, dirty, record) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (collection_id) DO UPDATE SET service_type=excluded.service_type, target=excluded.target, '
+            'extracted=excluded.extracted, transformed=excluded.transformed, ingested=excluded.ingested, '
+            'dirty=excluded.dirty, record=excluded.record',
+            rows
+        )
+
+        service_ids = set()
+        for row in rows:
+            record = json.loads(row[-1])
+            self.persisted_records[record['collection_id']] = record
+            if record['service_id']:
+                service_ids.add(record['service_id'])
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO services (service_id, record) VALUES (?, ?)',
+            [(service_id, json.dumps(self.service_records[service_id])) for service_id in service_ids]
+        )
+
+    def read_collection(self, collection_id, record) -> SourceCollectionModel:
+        """Returns the source collection object of a collections table record, loaded once per data store."""
+        if collection_id in self.loaded_collections.keys():
+            return self.loaded_collections[collection_id]
+        try:
+            persisted_record = self.normalise_record(json.loads(record))
+            collection = self.create_source_collection(persisted_record)
+        except Exception as e:
+            print(e)
+            print(f'[WARNING] The following collection record could not be loaded in a SourceCollectionModel object: {record}')
+            return None
+        self.loaded_collections[collection_id] = collection
+        self.persisted_records[collection_id] = persisted_record
+        return collection
+
+    def get_source_collection(self, collection_id: str) -> SourceCollectionModel:
+        """Returns the source collection corresponding to input identifier.
+        """
+        row = self.connection.execute('SELECT collection_id, record FROM collections WHERE collection_id = ?',
+                                      (collection_id,)).fetchone()
+        return self.read_collection(*row) if row else None
+
+    def get_source_collections(self, collection_id='', service_type=None, target=None, extracted=None, transformed=None, ingested=None, dirty=None) -> [SourceCollectionModel]:
+        """Returns source collections matching input filters.
+        """
+        conditions = []
+        params = []
+        if collection_id:
+            conditions.append("collection_id LIKE ? ESCAPE '\\'")
+            params.append(f'%{escape_like(collection_id)}%')
+        if service_type:
+            conditions.append('service_type = ?')
+            params.append(service_type)
+        if target:
+            conditions.append("target LIKE ? ESCAPE '\\'")
+            params.append(f'%{escape_like(target.lower())}%')
+        for name, value in [('extracted', extracted), ('transformed', transformed), ('ingested', ingested), ('dirty', dirty)]:
+            if value is not None:
+                conditions.append(f'{name} = ?')
+                params.append(int(bool(value)))
+
+        query = 'SELECT collection_id, record FROM collections'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY rowid'
+
+        collections = []
+        for row in self.connection.execute(query, params):
+            collection = self.read_collection(*row)
+            if collection:
+                collections.append(collection)
+        return collections
+
+    def update_source_collections(self, collections: [SourceCollectionModel]):
+        """Update collections in the source collections index table, within a single transaction.
+
+        Only fields changed since collections were loaded are merged into current collections records, so that changes
+        made by other processes to other fields are preserved.
+        """
+        changes = []
+        for collection in collections:
+            fields = self.get_changed_fields(collection)
+            if fields:
+                changes.append((collection, fields))
+        if not changes:
+            return
+
+        with self.transaction():
+            merged_collections = []
+            for collection, fields in changes:
+                row = self.connection.execute('SELECT record FROM collections WHERE collection_id = ?',
+                                              (collection.collection_id,)).fetchone()
+                record = dict(self.normalise_record(json.loads(row[0])), **fields) if row else fields
+                merged_collection = self.create_source_collection(record)
+                for name in SourceCollectionModel.__fields__.keys():
+                    setattr(collection, name, getattr(merged_collection, name))
+                merged_collections.append(collection)
+            self.write_collections(merged_collections)
+
+        for collection in merged_collections:
+            self.loaded_collections[collection.collection_id] = collection
+
+    def delete_source_collections(self, collections: [SourceCollectionModel]):
+        """Delete collections from the source collections index table, within a single transaction.
+        """
+        collection_ids = [collection.collection_id for collection in collections]
+        if not collection_ids:
+            return
+        with self.transaction():
+            self.connection.executemany('DELETE FROM collections WHERE collection_id = ?',
+                                        [(collection_id,) for collection_id in collection_ids])
+        for collection_id in collection_ids:
+            self.loaded_collections.pop(collection_id, None)
+            self.persisted_records.pop(collection_id, None)
+
+    def save_source_collections(self, overwrite=False):
+        """Save source collections returned by the data store into the collections index database.
+        """
+        if overwrite:
+            self.update_source_collections(list(self.loaded_collections.values()))
+
+
+def escape_like(value: str) -> str:
+    """Escape SQL LIKE pattern special characters of a given string, using `\\` as escape character."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def create_datastore(source_data_dir='', stac_data_dir='', collections=None, backend=DATASTORE_BACKEND) -> DataStore:
+    """Returns a data store object of a given backend: 'json' (default) or 'sqlite'.
+    """
+    if backend == 'json':
+        return DataStore(source_data_dir=source_data_dir, stac_data_dir=stac_data_dir, collections=collections)
+    elif backend == 'sqlite':
+        return SQLiteDataStore(source_data_dir=source_data_dir, stac_data_dir=stac_data_dir, collections=collections)
+    else:
+        raise Exception(f'Unknown `{backend}` data store backend: \'json\' or \'sqlite\' expected.')
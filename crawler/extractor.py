@@ -3,8 +3,8 @@
 To add an Extractor handling a new service type::
 
     class NEW_Extractor(AbstractExtractor):
-        def __init__(self, service=None):
-            super().__init__(service=service)
+        def __init__(self, collection=None, service=None, http_client=None):
+            super().__init__(collection=collection, service=service, http_client=http_client)
             pass
 
 
@@ -18,17 +18,222 @@ To add an Extractor handling a new service type::
 """
 
 # from .collection import SourceProduct
-import requests
 from contextlib import closing
+import gzip
 import json
+import os
+import queue
+import re
+import threading
+import time
+import bisect
 from pathlib import Path
-
-from .datastore import DataStore, SourceCollectionModel
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import ijson  # optional, enables products metadata to be parsed incrementally
+except ImportError:
+    ijson = None
+
+try:
+    import zstandard  # optional, enables zstd-compressed extracted files
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa  # optional, enables columnar products store
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from .client import HttpClient, ResponseCache, get_http_client
+from .config import (
+    EXTRACT_PAGE_SIZE,
+    EXTRACT_MIN_PAGE_SIZE,
+    EXTRACT_MAX_PAGE_SIZE,
+    EXTRACT_TARGET_LATENCY,
+    EXTRACT_MAX_PAGE_BYTES,
+)
+from .datastore import DataStore, FileLock, SourceCollectionModel
 from .registry import ExternalServiceType, Service
-from .schemas import create_schema_object, PDSODE_Product, PDSODE_IIPTSet, PDSODE_Collection
+from .schemas import create_schema_object, PDSODE_Product, PDSODE_Product_file, PDSODE_IIPTSet, PDSODE_Collection
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+"""Size of the response chunks written to extracted files, in bytes."""
+
+CONSOLIDATE_BATCH_SIZE = 10000
+"""Number of products metadata per row group of consolidated (Parquet) products files."""
+
+RESPONSE_TAIL_SIZE = 4096
+"""Size of the end of page responses kept to check the PDS ODE query status, in bytes."""
+
+PREFETCH_PRODUCTS = 1000
+"""Maximum number of products metadata read ahead by :meth:`PDSODE_Extractor.iter_products` background reader."""
+
+PDSODE_DELTA_TIME_PARAMS = ['minobtime', 'mincreationtime']
+"""PDS ODE product query time filters used for incremental extraction, respectively selecting products observed,
+and products created (or re-created), since the previous extraction."""
+
+
+CODECS = {
+    '': '',
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+"""Compression codecs of extracted files, and their corresponding file name suffixes."""
+
+
+def get_codec_suffix(codec: str) -> str:
+    """Returns extracted file name suffix of a given compression codec."""
+    if codec not in CODECS.keys():
+        raise ValueError(f'Invalid `{codec}` compression codec. Allowed codecs are: {list(CODECS.keys())}')
+    if codec == 'zstd' and not zstandard:
+        raise Exception('The `zstandard` package is required to use the `zstd` compression codec.')
+    return CODECS[codec]
+
+
+def get_file_codec(file_path) -> str:
+    """Returns compression codec of an extracted file, derived from its file name suffix."""
+    for codec, suffix in CODECS.items():
+        if suffix and str(file_path).endswith(suffix):
+            return codec
+    return ''
+
+
+def find_extracted_file(file_path) -> Path:
+    """Returns the path of an existing extracted file, whatever its compression codec, or None if not found."""
+    for suffix in CODECS.values():
+        codec_file_path = Path(f'{file_path}{suffix}')
+        if Path.is_file(codec_file_path):
+            return codec_file_path
+    return None
+
+
+def open_extracted_file(file_path, mode='rb', codec=None):
+    """Open an extracted file, transparently (de)compressing it according to its compression codec.
+
+    The codec is derived from the file name suffix, unless given as input.
+    """
+    if codec is None:
+        codec = get_file_codec(file_path)
+    if codec == 'gzip':
+        return gzip.open(file_path, mode)
+    elif codec == 'zstd':
+        get_codec_suffix(codec)  # check that zstd codec is available
+        return zstandard.open(file_path, mode)
+    return open(file_path, mode)
+
+
+def get_pdsode_products(data: dict) -> list[dict]:
+    """Returns the list of product dictionaries of a PDS ODE product query response.
+
+    PDS ODE returns a single product as a dictionary rather than a list, and no `Product` at all for an empty page.
+    """
+    products = data['ODEResults'].get('Products')
+    if not isinstance(products, dict) or 'Product' not in products.keys():
+        return []
+    if isinstance(products['Product'], dict):
+        return [products['Product']]
+    return products['Product']
 
 
-def Extractor(collection=None, service_type='', service=None):  # -> AbstractExtractor
+def check_pdsode_status(response_tail: bytes):
+    """Raise an exception if the end of a PDS ODE query response holds an `ERROR` query status.
+
+    The `Status` attribute closes the `ODEResults` object of PDS ODE responses, and error responses are small enough
+    to be held in their entirety in the response tail.
+    """
+    statuses = re.findall(rb'"Status"\s*:\s*"([^"]*)"', response_tail)
+    if statuses and statuses[-1].upper() == b'ERROR':
+        errors = re.findall(rb'"Error"\s*:\s*"([^"]*)"', response_tail)
+        error = errors[-1].decode('utf-8', errors='replace') if errors else 'ERROR'
+        raise Exception(f'PDSODE_Extractor query error: {error}')
+
+
+class AdaptivePager:
+    """Thread-safe dispenser of the (offset, limit) query windows covering a collection of `n_products` products.
+
+    The page size (`limit`) of dispensed windows adapts to observed response latencies and payload sizes, and to
+    server errors, within the [`min_page_size`, `max_page_size`] range. Windows already extracted, given as a
+    {offset: limit} dictionary, are skipped.
+
+    Extracted files are named after the offset of their window (see :meth:`PDSODE_Extractor.get_page_file_path`), so
+    that they are ordered by offset whatever the order in which windows are dispensed, retrieved or split.
+    """
+    def __init__(self, n_products, page_size=EXTRACT_PAGE_SIZE, min_page_size=EXTRACT_MIN_PAGE_SIZE,
+                 max_page_size=EXTRACT_MAX_PAGE_SIZE, target_latency=EXTRACT_TARGET_LATENCY,
+                 max_page_bytes=EXTRACT_MAX_PAGE_BYTES, extracted_windows=None):
+        self.n_products = n_products
+        self.min_page_size = min(min_page_size, max_page_size)
+        self.max_page_size = max_page_size
+        self.page_size = max(self.min_page_size, min(page_size, max_page_size))
+        self.target_latency = target_latency
+        self.max_page_bytes = max_page_bytes
+        self.extracted_windows = extracted_windows if extracted_windows else {}
+        self.extracted_offsets = sorted(self.extracted_windows.keys())
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def next_window(self):
+        """Returns the next (offset, limit) window to be extracted, or None if all windows have been dispensed."""
+        with self.lock:
+            # skip already extracted windows
+            while self.offset in self.extracted_windows:
+                self.offset += self.extracted_windows[self.offset]
+            if self.offset >= self.n_products:
+                return None
+
+            # set window limit, not overlapping the next already extracted window
+            limit = min(self.page_size, self.n_products - self.offset)
+            next_idx = bisect.bisect_right(self.extracted_offsets, self.offset)
+            if next_idx < len(self.extracted_offsets):
+                limit = min(limit, self.extracted_offsets[next_idx] - self.offset)
+
+            window = (self.offset, limit)
+            self.offset += limit
+            return window
+
+    def report_success(self, limit, latency, n_bytes):
+        """Adapt page size to the latency and payload size of a successfully extracted window."""
+        with self.lock:
+            if limit < self.page_size:  # window truncated, or dispensed before last page size change
+                return
+            if latency > 2 * self.target_latency:
+                self.page_size = max(self.min_page_size, self.page_size // 2)
+            elif latency < self.target_latency / 2 and n_bytes * 2 <= self.max_page_bytes:
+                self.page_size = min(self.max_page_size, self.page_size * 2)
+
+    def report_error(self):
+        """Shrink page size after a failed window extraction."""
+        with self.lock:
+            self.page_size = max(self.min_page_size, self.page_size // 2)
+
+
+def get_pdsode_products_schema():  # -> pyarrow.Schema
+    """Returns the Arrow schema of consolidated PDS ODE products metadata.
+
+    Scalar `PDSODE_Product` fields are mapped to typed columns, and `Product_files` to a list of structs column.
+    """
+    if not pa:
+        raise Exception('The `pyarrow` package is required to consolidate extracted products metadata.')
+
+    fields = []
+    for name, field in PDSODE_Product.__fields__.items():
+        if name == 'Product_files':
+            product_file_type = pa.struct([(file_field, pa.string()) for file_field in PDSODE_Product_file.__fields__.keys()])
+            fields.append(pa.field(name, pa.list_(product_file_type)))
+        elif field.type_ is float:
+            fields.append(pa.field(name, pa.float64()))
+        elif field.type_ is int:
+            fields.append(pa.field(name, pa.int64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def Extractor(collection=None, service_type='', service=None, http_client: HttpClient = None):  # -> AbstractExtractor
     """Extractor function serving as Extractor objects factory.
     """
 
@@ -45,7 +250,7 @@ def Extractor(collection=None, service_type='', service=None):  # -> AbstractExt
     # check that service_type_enum is valid and create corresponding Extractor object.
     if service_type_enum in EXTRACTORS.keys():
         ExtractorClass = EXTRACTORS[service_type_enum]
-        extractor = ExtractorClass(collection=collection, service=service)
+        extractor = ExtractorClass(collection=collection, service=service, http_client=http_client)
         return extractor
     else:
         raise Exception(f'Invalid catalog service type: {service_type_enum}. Allowed types are: {EXTRACTORS.keys()}')
@@ -54,7 +259,7 @@ def Extractor(collection=None, service_type='', service=None):  # -> AbstractExt
 class AbstractExtractor:
     """Abstract Extractor class.
     """
-    def __init__(self, collection=None, service=None):
+    def __init__(self, collection=None, service=None, http_client: HttpClient = None):
         # automatically set extractor service type from inheriting Extractor class.
         self.service_type = ''
         class_name = self.__class__.__name__
@@ -70,7 +275,11 @@ class AbstractExtractor:
         self.extracted = False
         self.n_extracted_files = 0
         self.extracted_files = []
+        self.extracted_time = ''
+        self.extracted_codec = ''
+        self.consolidated_file = ''
         # self.extracted_data_dir = ''
+        self.http_client = http_client if http_client else get_http_client()
 
         # set service and collection properties
         if service and not collection:
@@ -97,6 +306,12 @@ class AbstractExtractor:
         if service.type == self.service_type:
             self.service = service
             self.service_collections = []  # reset list of service collections
+
+            # set service rate limit, if defined as service extra parameter
+            extra_params = getattr(service, 'extra_params', None)
+            if extra_params and extra_params.get('rate_limit'):
+                self.http_client.set_rate_limit(service.url, float(extra_params['rate_limit']),
+                                                burst=extra_params.get('rate_burst'))
         else:
             raise ValueError(f'`{service.type}` type from input `service` object does not match '
                              f'Extractor `{self.service_type}` service type ')
@@ -113,26 +328,39 @@ class AbstractExtractor:
         # set extracted files
         self.extracted = collection.extracted
         self.n_extracted_files = len(collection.extracted_files)
-        self.extracted_files = collection.extracted_files
+        self.extracted_files = list(collection.extracted_files)
+        self.extracted_time = collection.extracted_time
+        self.extracted_codec = collection.extracted_codec
+        self.consolidated_file = collection.consolidated_file
 
     def get_service_collections(self):
         return []
 
+    def refresh_service_responses(self):
+        """Refresh cached responses of the extractor service, if any."""
+        pass
+
     def extract(self):
         pass
 
 class PDSODE_Extractor(AbstractExtractor):
     """PDSODE_Extractor class.
     """
-    def __init__(self, collection=None, service=None):
-        super().__init__(collection=collection, service=service)
+    def __init__(self, collection=None, service=None, http_client: HttpClient = None):
+        super().__init__(collection=collection, service=service, http_client=http_client)
+        self.response_cache = ResponseCache(http_client=self.http_client)
+
+        self.checkpoint = {}
+        self.checkpoint_lock = threading.Lock()
 
         # self.retrieve_service_collections(service=service)
 
-    def retrieve_service_collections(self, service=None):
-        if service:  # set extractor service to input optional service keyword argument
-            self.set_service(service)
+    def retrieve_iiptsets(self, refresh=False) -> list[dict]:
+        """Returns the list of IIPTSet dictionaries retrieved from the PDS ODE REST API `iipy` query.
 
+        The `iipy` query response is cached (see :class:`crawler.client.ResponseCache`), use `refresh=True` to bypass
+        the cache.
+        """
         # form query to retrieve all
         query = dict(
             query='iipy',
@@ -140,16 +368,24 @@ class PDSODE_Extractor(AbstractExtractor):
             # odemetadb='mars'
         )
 
+        # execute query, or get cached response
+        response = self.response_cache.get_json(self.service.url, params=query, refresh=refresh)
+
+        return response['ODEResults']['IIPTSets']['IIPTSet']
+
+    def refresh_service_responses(self):
+        """Refresh the cached `iipy` query response (see :meth:`retrieve_iiptsets`)."""
+        self.retrieve_iiptsets(refresh=True)
+
+    def retrieve_service_collections(self, service=None, refresh=False):
+        if service:  # set extractor service to input optional service keyword argument
+            self.set_service(service)
+
         # execute query
         print('Querying PDS ODE REST API service...')
-        with closing(requests.get(self.service.url, params=query)) as r:
-            if r.ok:
-                response = r.json()
-            else:
-                raise Exception(f'PDS ODE REST API query {r.status_code} error: url={self.service.url}, query={query}')
+        iiptset_dicts = self.retrieve_iiptsets(refresh=refresh)
 
         # parse response into the list of SourceCollectionModel objects, `self.service_collections`.
-        iiptset_dicts = response['ODEResults']['IIPTSets']['IIPTSet']
         for iiptset_dict in iiptset_dicts:
             # do not add collection if products have no valid footprints
             if 'ValidFootprints' in iiptset_dict.keys():
@@ -203,33 +439,20 @@ class PDSODE_Extractor(AbstractExtractor):
             if source_collection:
                 self.service_collections.append(source_collection)
 
-    def get_service_collections(self, service=None, targets=None, valid_footprint=True):
+    def get_service_collections(self, service=None, targets=None, valid_footprint=True, refresh=False):
     # TODO: Implement fitering, possibly based on generic keywords: targets, valid_footprint, instrument_host_ids, instrument_ids, product_types.
-        if not self.service_collections:
-            self.retrieve_service_collections(service=None)
+        if not self.service_collections or refresh:
+            self.service_collections = []
+            self.retrieve_service_collections(service=None, refresh=refresh)
         return self.service_collections
 
-    def retrieve_collection_metadata(self, collection_id):
+    def retrieve_collection_metadata(self, collection_id, refresh=False):
         # if service:  # set extractor service to input optional service keyword argument
         #     self.set_service(service)
 
-        # form query to retrieve all
-        query = dict(
-            query='iipy',
-            output='JSON',
-            # odemetadb='mars'
-        )
-
         # execute query
         print(f'Retrieving `{collection_id}` collection metadata from PDS ODE REST API service...')
-        with closing(requests.get(self.service.url, params=query)) as r:
-            if r.ok:
-                response = r.json()
-            else:
-                raise Exception(f'PDS ODE REST API query {r.status_code} error: url={self.service.url}, query={query}')
-
-        # parse response into the list of SourceCollectionModel objects, `self.service_collections`.
-        iiptset_dicts = response['ODEResults']['IIPTSets']['IIPTSet']
+        iiptset_dicts = self.retrieve_iiptsets(refresh=refresh)
 
         for iiptset_dict in iiptset_dicts:
             this_collection_id = f'{iiptset_dict["IHID"]}_{iiptset_dict["IID"]}_{iiptset_dict["PT"]}'
@@ -260,7 +483,7 @@ class PDSODE_Extractor(AbstractExtractor):
             else:
                 raise Exception('Could not derive `collection_metadata_file_path`.')
 
-        with open(collection_metadata_file_path, 'r') as f:
+        with open_extracted_file(collection_metadata_file_path, 'rt') as f:
             metadata_dict = json.load(f)
 
         try:
@@ -282,14 +505,19 @@ class PDSODE_Extractor(AbstractExtractor):
 
         Use ``self.reset_reader_iterator()`` to reset reader iterator.
         """
-        if not self.products:
+        while not self.products:
             if self.file_idx < self.n_extracted_files:
                 file_path = self.extracted_files[self.file_idx]
-                with open(file_path, 'r') as f:
+                with open_extracted_file(file_path, 'rt') as f:
                     data = json.load(f)
 
+                # skip empty page
+                if not get_pdsode_products(data):
+                    self.file_idx += 1
+                    continue
+
                 # store source products metadata in the list of SourceProduct.
-                for metadata_dict in data['ODEResults']['Products']['Product']:
+                for metadata_dict in get_pdsode_products(data):
                     try:
                         product_metadata = PDSODE_Product(**metadata_dict)
                         self.products.append(product_metadata)
@@ -311,44 +539,365 @@ class PDSODE_Extractor(AbstractExtractor):
 
         return next_product
 
+    def iter_product_dicts(self, file_path):
+        """Generator yielding product dictionaries of an extracted products metadata file.
 
-    def extract(self, collection_id, output_dir_path='', service=None, overwrite=False):
-        """Extract source collection files required to retrieve collection and product metadata.
+        The `ODEResults.Products.Product` array is parsed incrementally if the optional `ijson` package is installed.
         """
-        if service:  # set extractor service to input optional service keyword argument
-            self.set_service(service)
+        if ijson:
+            n_products = 0
+            with open_extracted_file(file_path, 'rb') as f:
+                for metadata_dict in ijson.items(f, 'ODEResults.Products.Product.item', use_float=True):
+                    n_products += 1
+                    yield metadata_dict
+            if n_products > 0:
+                return
 
-        # set `query_limit` parameters
-        query_limit = 10  # 100
-        extract_limit = 10 # 300  # temporary for testing purpose
+        # single product, empty page, or `ijson` not installed
+        with open_extracted_file(file_path, 'rt') as f:
+            data = json.load(f)
+        for metadata_dict in get_pdsode_products(data):
+            yield metadata_dict
 
-        # Extract and save collection meta.
-        #
-        collection_metadata = self.retrieve_collection_metadata(collection_id)
-        # collection_metadata = extractor.retrieve_collection_metadata('MRO_HIRISE_RDRV11')
+    def iter_source_product_dicts(self):
+        """Generator yielding product dictionaries from the consolidated products file if any, or from extracted files.
+        """
+        if self.consolidated_file and Path.is_file(Path(self.consolidated_file)) and pq:
+            for batch in pq.ParquetFile(self.consolidated_file).iter_batches(batch_size=PREFETCH_PRODUCTS):
+                for metadata_dict in batch.to_pylist():
+                    metadata_dict['Product_files'] = {'Product_file': metadata_dict['Product_files'] or []}
+                    yield metadata_dict
+        else:
+            for file_path in self.extracted_files[1:]:
+                for metadata_dict in self.iter_product_dicts(file_path):
+                    yield metadata_dict
 
-        collection_file_path = Path(output_dir_path, collection_id, collection_id+'.json')
-        if Path.is_file(collection_file_path):
-            if not overwrite:
-                print(f'Source collection {collection_file_path} file already exists. Use `overwrite=True` to overwrite existing files.')
-                return
+    def read_products_table(self, columns=None):  # -> pyarrow.Table
+        """Returns the consolidated products metadata as an Arrow table, optionally restricted to a list of columns.
+        """
+        if not (self.consolidated_file and Path.is_file(Path(self.consolidated_file))):
+            raise Exception('Extracted products metadata not consolidated. Use `consolidate()` first.')
+        if not pq:
+            raise Exception('The `pyarrow` package is required to read consolidated products metadata.')
+        return pq.read_table(self.consolidated_file, columns=columns)
 
-        Path.mkdir(collection_file_path.parent, parents=True, exist_ok=overwrite)
-        with open(collection_file_path, 'w') as file:
-            file.write(collection_metadata.json(indent=3))
+    def consolidate(self, batch_size=CONSOLIDATE_BATCH_SIZE):
+        """Consolidate extracted products metadata files into a single columnar (Parquet) products file.
 
-        # report written collection metadata file
-        print(collection_file_path)
+        Products metadata are validated against the `PDSODE_Product` schema, invalid ones are not consolidated. The
+        products file is written next to the extracted files, as `<collection_id>.parquet`.
+        """
+        if not self.extracted_files:
+            raise Exception('No extracted files to consolidate.')
+
+        schema = get_pdsode_products_schema()
+        collection_file_path = Path(self.extracted_files[0])
+        collection_id = collection_file_path.name.split('.')[0]
+        consolidated_file_path = Path(collection_file_path.parent, collection_id+'.parquet')
+        tmp_file_path = Path(f'{consolidated_file_path}.tmp')
+
+        print(f'Consolidating extracted products metadata into {consolidated_file_path}...')
+        n_products = 0
+        rows = []
+        with pq.ParquetWriter(tmp_file_path, schema) as writer:
+            for metadata_dict in self.iter_source_product_dicts():
+                try:
+                    product_metadata = PDSODE_Product(**metadata_dict)
+                except Exception as e:
+                    print(e)
+                    continue
+                row = product_metadata.dict()
+                row['Product_files'] = row['Product_files']['Product_file']
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                    n_products += len(rows)
+                    rows = []
+            if rows:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                n_products += len(rows)
+        os.replace(tmp_file_path, consolidated_file_path)
+
+        self.consolidated_file = str(consolidated_file_path)
+        print(f'{n_products} products metadata consolidated.')
+
+    def iter_products(self, prefetch=PREFETCH_PRODUCTS):
+        """Generator yielding products metadata from extracted collection files, one by one.
+
+        Products metadata are read and validated ahead by a background thread, holding up to `prefetch` products.
+        Yielded product metadata are None for invalid products metadata.
+        """
+        products_queue = queue.Queue(maxsize=prefetch)
+        stop_event = threading.Event()
 
-        self.n_extracted_files = 1
-        self.extracted_files = [str(collection_file_path)]
+        def put(item):
+            while not stop_event.is_set():
+                try:
+                    products_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
 
-        # # more sophisticated, but useful?...
-        # self.extracted_files = {'collection_metadata_file': collection_file_path,
-        #                         'products_metadata_files': [str(collection_file_path)]}
+        def read_products():
+            try:
+                for metadata_dict in self.iter_source_product_dicts():
+                    try:
+                        product_metadata = PDSODE_Product(**metadata_dict)
+                    except Exception as e:
+                        print(e)
+                        product_metadata = None
+                    if not put(('product', product_metadata)):
+                        return
+                put(('end', None))
+            except Exception as e:
+                put(('error', e))
+
+        reader_thread = threading.Thread(target=read_products, daemon=True)
+        reader_thread.start()
+        try:
+            while True:
+                kind, value = products_queue.get()
+                if kind == 'product':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    break
+        finally:
+            stop_event.set()
+            reader_thread.join()
 
-        # Extract and save collection products metadata.
-        #
+    def extract_page(self, query, offset, extracted_file_path, validate=False, codec='', limit=None):
+        """Retrieve one page of products metadata starting at a given offset, and write it to an extracted file.
+
+        The response content is written as is, chunk by chunk, compressed using the input `codec` if any (in which case
+        the codec suffix is added to the extracted file name, see `CODECS`). Use `validate=True` to check the written
+        file is a valid PDS ODE product query response, and count its products. Error responses are rejected in any
+        case (see `check_pdsode_status`).
+
+        Returns the extracted file path and its number of products (None if not validated).
+        """
+        # set page query, leaving the input query untouched as it can be shared by concurrent workers
+        page_query = dict(query, offset=offset)
+        if limit:
+            page_query['limit'] = limit
+
+        extracted_file_path = Path(f'{extracted_file_path}{get_codec_suffix(codec)}')
+
+        # execute query, and write response content to output file, through a temporary file so that an interrupted
+        # write never leaves a truncated file.
+        tmp_file_path = Path(f'{extracted_file_path}.tmp')
+        try:
+            response_tail = b''
+            with closing(self.http_client.get(self.service.url, params=page_query, stream=True)) as r:
+                if not r.ok:
+                    raise Exception(f'PDSODE_Extractor query error: {r.status_code}')
+                with open_extracted_file(tmp_file_path, 'wb', codec=codec) as file:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                        response_tail = (response_tail + chunk)[-RESPONSE_TAIL_SIZE:]
+
+            # check query status, and validate output file
+            check_pdsode_status(response_tail)
+            n_products = None
+            if validate:
+                n_products = self.validate_page(tmp_file_path, codec=codec)
+
+            os.replace(tmp_file_path, extracted_file_path)
+        except BaseException:
+            if Path.is_file(tmp_file_path):
+                Path.unlink(tmp_file_path)
+            raise
+
+        print(extracted_file_path)
+        return str(extracted_file_path), n_products
+
+    def validate_page(self, file_path, codec=None) -> int:
+        """Check that an extracted file holds a valid PDS ODE product query response, and returns its number of products.
+        """
+        try:
+            with open_extracted_file(file_path, 'rt', codec=codec) as f:
+                data = json.load(f)
+        except Exception as e:
+            raise Exception(f'Invalid {file_path} extracted file: {e}')
+
+        if 'ODEResults' not in data.keys():
+            raise Exception(f'Invalid {file_path} extracted file: missing `ODEResults` attribute.')
+        if data['ODEResults'].get('Status', 'Success') != 'Success':
+            raise Exception(f'PDSODE_Extractor query error: {data["ODEResults"].get("Error", data["ODEResults"]["Status"])}')
+
+        return len(get_pdsode_products(data))
+
+    def get_checkpoint_file_path(self, collection_id, output_dir_path='') -> Path:
+        return Path(output_dir_path, collection_id, collection_id+'_checkpoint.json')
+
+    def read_checkpoint(self, checkpoint_file_path, n_products) -> dict:
+        """Returns extraction checkpoint read from file, or a new checkpoint if missing or not matching input parameters.
+
+        Only offset windows whose extracted file is still on disk with the recorded size are kept.
+        """
+        new_checkpoint = {'n_products': n_products, 'windows': {}}
+        checkpoint = self.load_checkpoint(checkpoint_file_path)
+        if not checkpoint:
+            return new_checkpoint
+
+        if checkpoint.get('n_products') != n_products:
+            print(f'Extraction parameters changed since {checkpoint_file_path} checkpoint: restarting extraction.')
+            return new_checkpoint
+
+        verified_windows = {}
+        for offset, window in checkpoint['windows'].items():
+            file_path = Path(window['file'])
+            if Path.is_file(file_path) and file_path.stat().st_size == window['size']:
+                verified_windows[offset] = window
+        checkpoint['windows'] = verified_windows
+
+        return checkpoint
+
+    def load_checkpoint(self, checkpoint_file_path) -> dict:
+        """Returns checkpoint read from file, or an empty dictionary if missing or invalid."""
+        if not Path.is_file(checkpoint_file_path):
+            return {}
+        try:
+            with open(checkpoint_file_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f'[WARNING] Ignoring invalid {checkpoint_file_path} checkpoint file: {e}')
+            return {}
+
+    def save_checkpoint(self, checkpoint_file_path):
+        """(Atomically) write extraction checkpoint file."""
+        tmp_file_path = Path(f'{checkpoint_file_path}.tmp')
+        with open(tmp_file_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_file_path, checkpoint_file_path)
+
+    def update_checkpoint(self, checkpoint_file_path, offset, limit, extracted_file):
+        """Record an extracted offset window in the extraction checkpoint, and (atomically) write checkpoint file.
+        """
+        with self.checkpoint_lock:
+            self.checkpoint['windows'][str(offset)] = {
+                'offset': offset,
+                'limit': limit,
+                'file': extracted_file,
+                'size': Path(extracted_file).stat().st_size
+            }
+            self.save_checkpoint(checkpoint_file_path)
+
+    def read_delta_checkpoint(self, checkpoint_file_path, delta_index, since, limit, extracted_time) -> dict:
+        """Returns incremental extraction checkpoint read from file, or a new checkpoint if missing or not matching
+        input parameters.
+
+        Only pages whose extracted file is still on disk with the recorded size are kept (empty pages have no file).
+        """
+        new_checkpoint = {'delta': {'index': delta_index, 'since': since, 'limit': limit, 'extracted_time': extracted_time,
+                                    'pages': {}}}
+        checkpoint = self.load_checkpoint(checkpoint_file_path)
+        delta = checkpoint.get('delta')
+        if not delta or delta.get('index') != delta_index or delta.get('since') != since:
+            return new_checkpoint
+
+        verified_pages = {}
+        for key, page in delta['pages'].items():
+            if page['file'] is None or (Path.is_file(Path(page['file'])) and Path(page['file']).stat().st_size == page['size']):
+                verified_pages[key] = page
+        delta['pages'] = verified_pages
+
+        return checkpoint
+
+    def update_delta_checkpoint(self, checkpoint_file_path, time_param, offset, extracted_file, n_products):
+        """Record an extracted page in the incremental extraction checkpoint, and (atomically) write checkpoint file.
+        """
+        with self.checkpoint_lock:
+            self.checkpoint['delta']['pages'][f'{time_param}:{offset}'] = {
+                'file': extracted_file,
+                'size': Path(extracted_file).stat().st_size if extracted_file else 0,
+                'n_products': n_products
+            }
+            self.save_checkpoint(checkpoint_file_path)
+
+    def write_collection_metadata(self, collection_metadata, collection_file_path, codec=None):
+        """(Atomically) write collection metadata file, compressed using the codec derived from its file name suffix
+        unless given as input."""
+        if codec is None:
+            codec = get_file_codec(collection_file_path)
+        tmp_file_path = Path(f'{collection_file_path}.tmp')
+        with open_extracted_file(tmp_file_path, 'wt', codec=codec) as file:
+            file.write(collection_metadata.json(indent=3))
+        os.replace(tmp_file_path, collection_file_path)
+
+    def get_page_file_path(self, collection_id, offset, output_dir_path='') -> Path:
+        """Returns the path of the extracted file of the products metadata page starting at a given offset."""
+        return Path(output_dir_path, collection_id, f'{collection_id}_{offset:09}.json')
+
+    def get_delta_page_file_path(self, collection_id, delta_index, time_param, offset, output_dir_path='') -> Path:
+        """Returns the path of the extracted file of a products metadata page of a given incremental extraction."""
+        return Path(output_dir_path, collection_id, f'{collection_id}_delta{delta_index:03}_{time_param}_{offset:09}.json')
+
+    def get_next_delta_index(self, collection_id) -> int:
+        """Returns the index of the next incremental extraction of a collection, following the incremental
+        extractions of which files are listed in the extracted files."""
+        delta_file_pattern = re.compile(rf'{re.escape(collection_id)}_delta(\d+)_')
+        delta_index = 0
+        for extracted_file in self.extracted_files:
+            match = delta_file_pattern.match(Path(extracted_file).name)
+            if match:
+                delta_index = max(delta_index, int(match.group(1)))
+        return delta_index + 1
+
+    def remove_extracted_pages(self, collection_id, output_dir_path=''):
+        """Remove the extracted products metadata page files of a collection, whatever their compression codec, from
+        full or incremental extractions, and its consolidated products file."""
+        collection_dir_path = Path(output_dir_path, collection_id)
+        if not collection_dir_path.is_dir():
+            return
+        codec_suffixes = '|'.join(re.escape(suffix) for suffix in CODECS.values() if suffix)
+        page_file_pattern = re.compile(
+            rf'{re.escape(collection_id)}_(\d{{9}}|delta\d+_\w+_\d{{9}})\.json({codec_suffixes})?(\.tmp)?|'
+            rf'{re.escape(collection_id)}\.parquet(\.tmp)?'
+        )
+        for file_path in collection_dir_path.iterdir():
+            if page_file_pattern.fullmatch(file_path.name):
+                Path.unlink(file_path)
+
+    def get_page_sizes_file_path(self, output_dir_path='') -> Path:
+        return Path(output_dir_path, 'page_sizes.json')
+
+    def read_page_size(self, output_dir_path='') -> int:
+        """Returns the page size recorded for the extractor service, or the default initial page size."""
+        page_sizes_file_path = self.get_page_sizes_file_path(output_dir_path=output_dir_path)
+        if Path.is_file(page_sizes_file_path):
+            with open(page_sizes_file_path, 'r') as f:
+                page_sizes = json.load(f)
+            if self.service.url in page_sizes.keys():
+                return page_sizes[self.service.url]
+        return EXTRACT_PAGE_SIZE
+
+    def write_page_size(self, page_size, output_dir_path=''):
+        """Record the page size to start from for the next extraction from the extractor service."""
+        page_sizes_file_path = self.get_page_sizes_file_path(output_dir_path=output_dir_path)
+        with FileLock(Path(f'{page_sizes_file_path}.lock')):
+            page_sizes = {}
+            if Path.is_file(page_sizes_file_path):
+                with open(page_sizes_file_path, 'r') as f:
+                    page_sizes = json.load(f)
+            page_sizes[self.service.url] = page_size
+
+            tmp_file_path = Path(f'{page_sizes_file_path}.tmp')
+            with open(tmp_file_path, 'w') as f:
+                json.dump(page_sizes, f)
+            os.replace(tmp_file_path, page_sizes_file_path)
+
+    def get_max_page_size(self) -> int:
+        """Returns the maximum page size allowed by the extractor service."""
+        if self.service.extra_params and 'max_page_size' in self.service.extra_params.keys():
+            return int(self.service.extra_params['max_page_size'])
+        return EXTRACT_MAX_PAGE_SIZE
+
+    def get_products_query(self, collection_id, collection_metadata, limit=EXTRACT_PAGE_SIZE) -> dict:
+        """Returns the PDS ODE API product query of a given collection.
+        """
         # derive (ihid, iid, pt) IIPTSet query parameters from collection ID
         iiptset = collection_id.split('_')
 
@@ -369,43 +918,242 @@ class PDSODE_Extractor(AbstractExtractor):
             results='copmf',  # warning: this impacts the results metadata
             output='JSON',
             offset=0,
-            limit=query_limit,
+            limit=limit,
             ihid=iiptset[0],
             iid=iiptset[1],
             pt=iiptset[2]
         )
 
-        offset = 0
-        n_products = min(collection_metadata.iiptset.NumberProducts, extract_limit)  # temporary for testing purpose
+        return query
+
+    def extract(self, collection_id, output_dir_path='', service=None, overwrite=False, n_jobs=1, refresh=False, incremental=False,
+                validate=False, codec=''):
+        """Extract source collection files required to retrieve collection and product metadata.
+
+        Products metadata pages are retrieved concurrently by a pool of `n_jobs` workers, and listed in offset order
+        in the extracted files, whatever the order in which pages are retrieved. Page sizes adapt to the service
+        response (see :class:`AdaptivePager`), starting from the page size recorded at the end of the previous
+        extraction from the same service. Use `refresh=True` to bypass the cached collection metadata.
+
+        Extracted offset windows are recorded in a checkpoint file, so that an interrupted extraction is resumed by
+        only retrieving missing windows, unless `overwrite=True`. The checkpoint file is removed once all windows
+        have been extracted.
+
+        Use `incremental=True` to only retrieve products observed or created since the previous extraction (see
+        :meth:`extract_delta`), if the collection has already been extracted.
+
+        Page responses are written to disk as is, without being decoded. Use `validate=True` to check each extracted
+        page, and `codec` to write compressed extracted files (see :meth:`extract_page`).
+        """
+        if service:  # set extractor service to input optional service keyword argument
+            self.set_service(service)
+
+        # set initial page size
+        page_size = self.read_page_size(output_dir_path=output_dir_path)
+
+        # Extract and save collection meta.
+        #
+        collection_metadata = self.retrieve_collection_metadata(collection_id, refresh=refresh)
+        # collection_metadata = extractor.retrieve_collection_metadata('MRO_HIRISE_RDRV11')
+
+        collection_file_path = Path(output_dir_path, collection_id, collection_id+'.json'+get_codec_suffix(codec))
+        checkpoint_file_path = self.get_checkpoint_file_path(collection_id, output_dir_path=output_dir_path)
+        if overwrite:
+            # remove previously extracted files, possibly of other windows or codecs than those to be extracted
+            if Path.is_file(checkpoint_file_path):
+                Path.unlink(checkpoint_file_path)
+            self.remove_extracted_pages(collection_id, output_dir_path=output_dir_path)
+        existing_collection_file_path = find_extracted_file(Path(output_dir_path, collection_id, collection_id+'.json'))
+        if existing_collection_file_path:
+            if incremental and not overwrite and self.extracted:
+                self.extract_delta(collection_id, collection_metadata, output_dir_path=output_dir_path, query_limit=page_size)
+                return
+            if not overwrite:
+                print(f'Source collection {existing_collection_file_path} file already exists. Use `overwrite=True` to overwrite existing files.')
+                return
+            Path.unlink(existing_collection_file_path)
+
+        Path.mkdir(collection_file_path.parent, parents=True, exist_ok=True)
+
+        self.n_extracted_files = 1
+        self.extracted_files = [str(collection_file_path)]
+
+        # # more sophisticated, but useful?...
+        # self.extracted_files = {'collection_metadata_file': collection_file_path,
+        #                         'products_metadata_files': [str(collection_file_path)]}
+
+        # Extract and save collection products metadata.
+        #
+        query = self.get_products_query(collection_id, collection_metadata, limit=page_size)
+
+        n_products = collection_metadata.iiptset.NumberProducts
         print(f'Extracting metadata of {n_products} products...')
-        while offset < n_products:
-            # update query `offset` parameter
-            query['offset'] = offset
-
-            # execute query
-            with closing(requests.get(self.service.url, params=query)) as r:
-                if r.ok:
-                    response = r.json()
-                else:
-                    raise Exception(f'PDSODE_Extractor query error: {r.status_code}')
 
-            # write output file
-            extracted_file_path = Path(output_dir_path, collection_id, collection_id+f'_{self.n_extracted_files:03}.json')
+        # set extraction time, from which a later incremental extraction will start
+        extracted_time = datetime.utcnow().isoformat(timespec='seconds')
+
+        # read extraction checkpoint, and set pager dispensing offset windows remaining to be extracted
+        self.checkpoint = self.read_checkpoint(checkpoint_file_path, n_products)
+        extracted_windows = {}
+        for window in self.checkpoint['windows'].values():
+            extracted_windows[window['offset']] = window['limit']
+        if extracted_windows:
+            print(f'Resuming extraction: {len(extracted_windows)} pages already extracted.')
+
+        pager = AdaptivePager(n_products, page_size=page_size, max_page_size=self.get_max_page_size(),
+                              extracted_windows=extracted_windows)
+        stop_event = threading.Event()  # set on first failure, so that workers stop before their next page
+
+        def extract_window(offset, limit):
+            if stop_event.is_set():
+                return
+            extracted_file_path = self.get_page_file_path(collection_id, offset, output_dir_path=output_dir_path)
+            start_time = time.monotonic()
+            try:
+                extracted_file, _ = self.extract_page(query, offset, extracted_file_path, validate=validate,
+                                                      codec=codec, limit=limit)
+            except Exception as e:
+                # shrink page size, and split failed window into two smaller windows unless already at minimum size
+                pager.report_error()
+                if limit <= pager.min_page_size:
+                    stop_event.set()
+                    raise e
+                print(f'Page extraction failed at offset {offset} ({e}): retrying with smaller pages.')
+                half_limit = limit // 2
+                extract_window(offset, half_limit)
+                extract_window(offset + half_limit, limit - half_limit)
+                return
+
+            pager.report_success(limit, time.monotonic() - start_time, Path(extracted_file).stat().st_size)
+            self.update_checkpoint(checkpoint_file_path, offset, limit, extracted_file)
+
+        def extract_windows():
+            try:
+                window = pager.next_window()
+                while window and not stop_event.is_set():
+                    extract_window(*window)
+                    window = pager.next_window()
+            except BaseException:
+                stop_event.set()
+                raise
+
+        # retrieve and write missing products metadata pages, using a bounded pool of workers. On first failure, other
+        # workers stop after their current page, and the error is raised once they are done.
+        with ThreadPoolExecutor(max_workers=max(1, n_jobs)) as executor:
+            futures = [executor.submit(extract_windows) for _ in range(max(1, n_jobs))]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                stop_event.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # record page size to start from for the next extraction
+        self.write_page_size(pager.page_size, output_dir_path=output_dir_path)
+
+        windows = sorted(self.checkpoint['windows'].values(), key=lambda window: window['offset'])
+        extracted_files = [window['file'] for window in windows]
+        self.extracted_files += extracted_files
+        self.n_extracted_files += len(extracted_files)
 
-            with open(extracted_file_path, 'w') as file:
-                json.dump(response, file)
+        # all windows extracted: write collection metadata file, marking a complete extraction, and remove checkpoint
+        self.write_collection_metadata(collection_metadata, collection_file_path, codec=codec)
 
-            print(extracted_file_path)
+        # report written collection metadata file
+        print(collection_file_path)
 
-            offset += query_limit + 1
-            self.extracted_files.append(str(extracted_file_path))
-            self.n_extracted_files += 1
+        if Path.is_file(checkpoint_file_path):
+            Path.unlink(checkpoint_file_path)
 
         self.extracted = True
+        self.extracted_time = extracted_time
+        self.extracted_codec = codec
+        self.consolidated_file = ''  # consolidated products file, if any, is now out of date
         print(f'{self.extracted_files} extracted files in {Path(output_dir_path, collection_id)} directory.')
 
         #self.products = response['ODEResults']['Products']['Product']   Optional, when only one extracted file is required
 
+    def extract_delta(self, collection_id, collection_metadata, output_dir_path='', query_limit=EXTRACT_PAGE_SIZE):
+        """Extract products observed or created since the previous extraction of an already extracted collection.
+
+        Retrieved products metadata pages are appended to the extracted files, using the compression codec of the
+        previous extraction, and named after the index of the incremental extraction (see `get_next_delta_index`).
+        Products re-created since the previous extraction are then found twice in the extracted files, the last record
+        being the up-to-date one.
+
+        Extracted pages are recorded in the extraction checkpoint file, so that an interrupted incremental extraction is
+        resumed by only retrieving missing pages.
+        """
+        collection_file_path = find_extracted_file(Path(output_dir_path, collection_id, collection_id+'.json'))
+        codec = get_file_codec(collection_file_path)
+
+        # set previous extraction time, or derive it from the collection metadata file if not recorded.
+        since = self.extracted_time
+        if not since:
+            since = datetime.utcfromtimestamp(collection_file_path.stat().st_mtime).isoformat(timespec='seconds')
+        extracted_time = datetime.utcnow().isoformat(timespec='seconds')
+
+        # compare current number of products to the previous extraction one
+        previous_collection_metadata = self.read_collection_metadata(str(collection_file_path))
+        n_previous_products = previous_collection_metadata.iiptset.NumberProducts if previous_collection_metadata else 0
+        n_products = collection_metadata.iiptset.NumberProducts
+        print(f'Incremental extraction of products added or modified since {since} '
+              f'({n_previous_products} products previously extracted, {n_products} products currently available)...')
+
+        # read incremental extraction checkpoint, to resume an interrupted incremental extraction.
+        delta_index = self.get_next_delta_index(collection_id)
+        checkpoint_file_path = self.get_checkpoint_file_path(collection_id, output_dir_path=output_dir_path)
+        self.checkpoint = self.read_delta_checkpoint(checkpoint_file_path, delta_index, since, query_limit, extracted_time)
+        query_limit = self.checkpoint['delta']['limit']
+        extracted_time = self.checkpoint['delta']['extracted_time']
+        if self.checkpoint['delta']['pages']:
+            print(f'Resuming incremental extraction: {len(self.checkpoint["delta"]["pages"])} pages already extracted.')
+
+        query = self.get_products_query(collection_id, collection_metadata, limit=query_limit)
+
+        # retrieve delta products metadata pages, for each time filter, until a page is not full.
+        n_delta_products = 0
+        for time_param in PDSODE_DELTA_TIME_PARAMS:
+            delta_query = dict(query, **{time_param: since})
+            offset = 0
+            while True:
+                page = self.checkpoint['delta']['pages'].get(f'{time_param}:{offset}')
+                if page:
+                    extracted_file, n_page_products = page['file'], page['n_products']
+                else:
+                    extracted_file_path = self.get_delta_page_file_path(collection_id, delta_index, time_param, offset,
+                                                                        output_dir_path=output_dir_path)
+                    extracted_file, n_page_products = self.extract_page(delta_query, offset, extracted_file_path,
+                                                                        validate=True, codec=codec)
+                    if n_page_products == 0:
+                        Path.unlink(Path(extracted_file))
+                        extracted_file = None
+                    self.update_delta_checkpoint(checkpoint_file_path, time_param, offset, extracted_file, n_page_products)
+
+                if n_page_products == 0:
+                    break
+
+                self.extracted_files.append(extracted_file)
+                self.n_extracted_files += 1
+                n_delta_products += n_page_products
+
+                if n_page_products < query_limit:
+                    break
+                offset += query_limit
+
+        # update collection metadata file, and remove checkpoint
+        self.write_collection_metadata(collection_metadata, collection_file_path)
+
+        if Path.is_file(checkpoint_file_path):
+            Path.unlink(checkpoint_file_path)
+
+        self.extracted = True
+        self.extracted_time = extracted_time
+        self.consolidated_file = ''
+        print(f'{n_delta_products} added or modified products extracted in {Path(output_dir_path, collection_id)} directory.')
+
 
     # def read_next(self):
     #     file_path = self.extracted_files[self.file_idx]
@@ -421,15 +1169,15 @@ class PDSODE_Extractor(AbstractExtractor):
 class WFS_Extractor(AbstractExtractor):
     """WFS_Extractor class.
     """
-    def __init__(self,  collection=None, service=None):
-        super().__init__( collection=collection, service=service)
+    def __init__(self, collection=None, service=None, http_client: HttpClient = None):
+        super().__init__(collection=collection, service=service, http_client=http_client)
         pass
 
 class EPNTAP_Extractor(AbstractExtractor):
     """EPNTAP_Extractor class.
     """
-    def __init__(self, collection=None, service=None):
-        super().__init__(collection=collection, service=service)
+    def __init__(self, collection=None, service=None, http_client: HttpClient = None):
+        super().__init__(collection=collection, service=service, http_client=http_client)
         pass
 
 
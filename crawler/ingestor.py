@@ -1,8 +1,11 @@
 import pystac
-import requests
 import os
 from pathlib import Path
 
+from .client import HttpClient, get_http_client
+from .config import STAC_CATALOG_RATE_LIMIT
+from .ledger import FAILED, ProductLedger, needs_ingest
+
 
 COLLECTION_DEFAULT_MODEL = 'DefaultModel'
 
@@ -15,10 +18,14 @@ INGEST_STRATEGIES = {
 """Ingest strategies define what is ingested i.e. "collection", "feature", "both" or "none".
 """
 
+LEDGER_RECORDS_BATCH_SIZE = 1000
+"""Number of ingested features recorded at once in the products ledger."""
+
 class Ingestor:
     """Ingestion of STAC catalog or collection into destination STAC API service (eg: PDSSP RESTO).
     """
-    def __init__(self, stac_api_parent_url='', auth_token='', source_collection=None):
+    def __init__(self, stac_api_parent_url='', auth_token='', source_collection=None, http_client: HttpClient = None,
+                 ledger: ProductLedger = None):
         self.stac_api_parent_url = stac_api_parent_url
         self.stac_api_url = ''
         self.ingested = False
@@ -26,6 +33,10 @@ class Ingestor:
         self.do_not_split_geom = True
         self.source_collection = None
         self.processed_features = []  # stac2resto `lookup_table`
+        self.ledger = ledger
+        self.http_client = http_client if http_client else get_http_client()
+        if STAC_CATALOG_RATE_LIMIT and self.stac_api_parent_url:
+            self.http_client.set_rate_limit(self.stac_api_parent_url, STAC_CATALOG_RATE_LIMIT)
 
         # set source_schema and collection properties
         if stac_api_parent_url and not source_collection:
@@ -87,7 +98,7 @@ class Ingestor:
         parent_path = '' if not parent_id else f'/{parent_id}'
         # print(f'Creating {catalog_id} catalog to {url}{parent_path}...')
         ssl_verify = True
-        response = requests.post(url, json=catalog_dict, params={"pid": parent_id}, headers=self.headers, verify=ssl_verify)
+        response = self.http_client.post(url, json=catalog_dict, params={"pid": parent_id}, headers=self.headers, verify=ssl_verify)
 
         # handling response
         if response.status_code == 200:
@@ -132,7 +143,7 @@ class Ingestor:
         url = f'{self.stac_api_url}/collections'
         ssl_verify = True
         # print(f'Creating {collection_id} collection using `{COLLECTION_DEFAULT_MODEL}` model to {self.stac_api_url} ...')
-        response = requests.post(url, json=tmp_collection_dict, headers=self.headers, verify=ssl_verify)
+        response = self.http_client.post(url, json=tmp_collection_dict, headers=self.headers, verify=ssl_verify)
 
         # handling response
         if response.status_code == 200:
@@ -173,7 +184,7 @@ class Ingestor:
         url = f'{self.stac_api_url}/collections/{collection_id}'
         ssl_verify = True
         print(f'Updating existing {collection_id} collection using {COLLECTION_DEFAULT_MODEL} model to {url} ...')
-        response = requests.put(url, json=tmp_collection_dict, headers=self.headers, verify=ssl_verify)
+        response = self.http_client.put(url, json=tmp_collection_dict, headers=self.headers, verify=ssl_verify)
 
         # handle response
         if response.status_code == 200:
@@ -200,7 +211,7 @@ class Ingestor:
 
         # DELETE request
         print(f'Deleting {collection_id} collection ...')
-        response = requests.post(url, headers=self.headers, verify=ssl_verify)
+        response = self.http_client.post(url, headers=self.headers, verify=ssl_verify)
 
         # handle response
         if response.status_code == 200:
@@ -232,7 +243,7 @@ class Ingestor:
         # Post request
         #
         # print(f'Creating {feature_id} feature in {collection_id} collection ...')
-        response = requests.post(url, json=feature_dict, params=params, headers=self.headers, verify=ssl_verify)
+        response = self.http_client.post(url, json=feature_dict, params=params, headers=self.headers, verify=ssl_verify)
 
         # Handle response
         #
@@ -267,7 +278,7 @@ class Ingestor:
 
         # post request
         print(f'Updating {feature_id} feature in {collection_id} collection ...')
-        response = requests.put(url, json=feature_dict, headers=self.headers, verify=ssl_verify)
+        response = self.http_client.put(url, json=feature_dict, headers=self.headers, verify=ssl_verify)
 
         # handle response
         if response.status_code == 200:
@@ -324,6 +335,11 @@ class Ingestor:
         Input STAC file can be a catalog, a collection or an item JSON file. Different ingestion strategies define
         what is ingested i.e. 'catalog', 'feature', 'both' or 'none'.
 
+        If the ingestor has a products ledger, collection items already ingested and unchanged since are skipped, items
+        changed since their last ingestion, or which previous ingestion failed (possibly once posted), are updated, and
+        the ingestion status of processed items is recorded.
+        Returns the POST response of an ingested item, or None.
+
         ~ stac2resto ("process_stuff(url, lookup_table"))
         """
         # read input STAC file
@@ -348,6 +364,7 @@ class Ingestor:
                 response = self.post_feature(stac_object_dict, update_if_exists=update_if_exists)
                 if response:
                     self.processed_features.append(stac_object_dict['id']) # append feature ID
+                return response
             return
 
         if stac_object_dict['type'] == 'Collection':
@@ -369,12 +386,38 @@ class Ingestor:
         size = len(stac_object_dict['links'])
         print("   Found %s links" % str(size))
 
+        # get ingestion state of collection items from products ledger
+        ingest_states = None
+        if self.ledger and ingest_feature and stac_object_dict['type'] == 'Collection':
+            ingest_states = self.ledger.get_ingest_states(stac_object_dict['id'])
+            ledger_records = []
+            n_skipped_items = 0
+
         for link in stac_object_dict['links']:
             # derive the absolute child url
             # child_path = get_absolute_url(stac_file, link['href'])
             child_path = str(Path(Path(stac_file).parent, link['href'])) #
 
-            if link['rel'] in ['item', 'items'] and ingest_feature:
+            if link['rel'] in ['item', 'items'] and ingest_feature and ingest_states is not None:
+                # skip items already ingested and unchanged since, and update changed or previously failed ones. Item
+                # IDs are derived from item directory names (`<item_id>/<item_id>.json`), as item IDs may hold dots.
+                item_id = Path(link['href']).parent.name
+                ingest_state = ingest_states.get(item_id)
+                if not needs_ingest(ingest_state):
+                    n_skipped_items += 1
+                    continue
+                update = ingest_state is not None and (ingest_state[1] is not None or ingest_state[2] == FAILED)
+                try:
+                    response = self.ingest(stac_file=child_path, ingest_strategy=ingest_strategy,
+                                           update_if_exists=update_if_exists or update)
+                    error = None if response else 'Feature POST failed.'
+                except Exception as e:
+                    error = str(e)
+                ledger_records.append((item_id, error))
+                if len(ledger_records) >= LEDGER_RECORDS_BATCH_SIZE:
+                    self.ledger.record_ingestions(stac_object_dict['id'], ledger_records)
+                    ledger_records = []
+            elif link['rel'] in ['item', 'items'] and ingest_feature:
                 # print(child_path)
                 # print(f'before self.ingest(): {self.stac_api_url}')
                 self.ingest(stac_file=child_path, ingest_strategy=ingest_strategy, update_if_exists=update_if_exists)
@@ -387,6 +430,11 @@ class Ingestor:
                 self.ingest(stac_file=child_path, ingest_strategy=ingest_strategy, update_if_exists=update_if_exists)
                 # print(f'after self.ingest(): {self.stac_api_url}')
 
+        if ingest_states is not None:
+            self.ledger.record_ingestions(stac_object_dict['id'], ledger_records)
+            if n_skipped_items:
+                print(f'{n_skipped_items} unchanged features already ingested: skipped.')
+
         if stac_object_dict['type'] == 'Collection':
             self.ingested = True
             self.stac_url = f'{self.stac_api_url}/collections/{stac_object_dict["id"]}'
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""PDSSP Crawler products ledger module.
+
+The products ledger records the processing state of each product of the processed collections: hash of its source
+metadata, hash of its output STAC item, transformation and ingestion statuses, and timestamps. It is used by the
+transform and ingest stages to only process products that are new, changed, or that previously failed.
+
+Products are identified by their STAC collection and item identifiers.
+"""
+
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+import hashlib
+import json
+import sqlite3
+
+from .config import DATASTORE_LOCK_TIMEOUT
+
+TRANSFORMED = 'transformed'
+"""Status of a successfully transformed product."""
+
+INGESTED = 'ingested'
+"""Status of a successfully ingested product."""
+
+FAILED = 'failed'
+"""Status of a product which transformation or ingestion failed."""
+
+LEDGER_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS products (
+        collection_id TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        source_hash TEXT,
+        stac_hash TEXT,
+        transform_status TEXT NOT NULL DEFAULT '',
+        transform_error TEXT,
+        transformed_time TEXT,
+        ingested_hash TEXT,
+        ingest_status TEXT NOT NULL DEFAULT '',
+        ingest_error TEXT,
+        ingested_time TEXT,
+        PRIMARY KEY (collection_id, product_id)
+    )''',
+    'CREATE INDEX IF NOT EXISTS products_transform_status ON products (collection_id, transform_status)',
+    'CREATE INDEX IF NOT EXISTS products_ingest_status ON products (collection_id, ingest_status)',
+]
+"""SQLite products ledger table and indexes definition statements."""
+
+PRODUCT_FIELDS = ['collection_id', 'product_id', 'source_hash', 'stac_hash', 'transform_status', 'transform_error',
+                  'transformed_time', 'ingested_hash', 'ingest_status', 'ingest_error', 'ingested_time']
+"""Products ledger record fields."""
+
+
+def hash_dict(data: dict) -> str:
+    """Returns the hash of a JSON-serialisable dictionary, independent of keys order."""
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ProductLedger:
+    """Products ledger class, stored in a SQLite database file.
+    """
+    def __init__(self, db_file_path):
+        self.db_file_path = Path(db_file_path)
+        Path.mkdir(self.db_file_path.parent, parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.db_file_path, timeout=DATASTORE_LOCK_TIMEOUT, isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.transaction():
+            for statement in LEDGER_SCHEMA:
+                self.connection.execute(statement)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}> db_file_path: {self.db_file_path}'
+
+    @contextmanager
+    def transaction(self):
+        """Context manager running statements in an immediate transaction, holding the database write lock."""
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def get_products(self, collection_id, transform_status=None, ingest_status=None) -> list[dict]:
+        """Returns records of the products of a given collection, optionally filtered by transform and ingest status.
+        """
+        query = f'SELECT {", ".join(PRODUCT_FIELDS)} FROM products WHERE collection_id = ?'
+        params = [collection_id]
+        if transform_status is not None:
+            query += ' AND transform_status = ?'
+            params.append(transform_status)
+        if ingest_status is not None:
+            query += ' AND ingest_status = ?'
+            params.append(ingest_status)
+        query += ' ORDER BY product_id'
+        return [dict(zip(PRODUCT_FIELDS, row)) for row in self.connection.execute(query, params)]
+
+    def get_product(self, collection_id, product_id) -> dict:
+        """Returns the record of a given product, or None if not in the ledger."""
+        row = self.connection.execute(f'SELECT {", ".join(PRODUCT_FIELDS)} FROM products '
+                                      'WHERE collection_id = ? AND product_id = ?', (collection_id, product_id)).fetchone()
+        return dict(zip(PRODUCT_FIELDS, row)) if row else None
+
+    def get_summary(self, collection_id) -> dict:
+        """Returns the number of products of a given collection, by transform and ingest status."""
+        summary = {}
+        rows = self.connection.execute('SELECT transform_status, ingest_status, COUNT(*) FROM products '
+                                       'WHERE collection_id = ? GROUP BY transform_status, ingest_status', (collection_id,))
+        for transform_status, ingest_status, count in rows:
+            summary[(transform_status, ingest_status)] = count
+        return summary
+
+    def get_transform_states(self, collection_id) -> dict:
+        """Returns the source hash and transform status of the products of a given collection, by product identifier.
+        """
+        rows = self.connection.execute('SELECT product_id, source_hash, transform_status FROM products '
+                                       'WHERE collection_id = ?', (collection_id,))
+        return {product_id: (source_hash, transform_status) for product_id, source_hash, transform_status in rows}
+
+    def get_ingest_states(self, collection_id) -> dict:
+        """Returns the STAC hash, ingested STAC hash and ingest status of the products of a given collection, by product
+        identifier.
+        """
+        rows = self.connection.execute('SELECT product_id, stac_hash, ingested_hash, ingest_status FROM products '
+                                       'WHERE collection_id = ?', (collection_id,))
+        return {row[0]: row[1:] for row in rows}
+
+    def record_transforms(self, collection_id, records):
+        """Record products transformations, as a list of (product_id, source_hash, stac_hash, error) tuples.
+
+        Products which transformation failed (`error` is not None) keep the STAC hash of their last successful
+        transformation.
+        """
+        transformed_time = datetime.utcnow().isoformat(timespec='seconds')
+        rows = [(collection_id, product_id, source_hash, stac_hash, FAILED if error else TRANSFORMED, error,
+                 transformed_time) for product_id, source_hash, stac_hash, error in records]
+        with self.transaction():
+            self.connection.executemany(
+                'INSERT INTO products (collection_id, product_id, source_hash, stac_hash, transform_status, '
+                'transform_error, transformed_time) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (collection_id, product_id) DO UPDATE SET source_hash=excluded.source_hash, '
+                'stac_hash=COALESCE(excluded.stac_hash, stac_hash), transform_status=excluded.transform_status, '
+                'transform_error=excluded.transform_error, transformed_time=excluded.transformed_time',
+                rows
+            )
+
+    def record_ingestions(self, collection_id, records):
+        """Record products ingestions, as a list of (product_id, error) tuples.
+
+        The ingested STAC hash of successfully ingested products is set to their current STAC hash.
+        """
+        ingested_time = datetime.utcnow().isoformat(timespec='seconds')
+        with self.transaction():
+            for product_id, error in records:
+                if error:
+                    self.connection.execute(
+                        'INSERT INTO products (collection_id, product_id, ingest_status, ingest_error, ingested_time) '
+                        'VALUES (?, ?, ?, ?, ?) ON CONFLICT (collection_id, product_id) DO UPDATE SET '
+                        'ingest_status=excluded.ingest_status, ingest_error=excluded.ingest_error, '
+                        'ingested_time=excluded.ingested_time',
+                        (collection_id, product_id, FAILED, error, ingested_time)
+                    )
+                else:
+                    self.connection.execute(
+                        'INSERT INTO products (collection_id, product_id, ingest_status, ingested_time) '
+                        'VALUES (?, ?, ?, ?) ON CONFLICT (collection_id, product_id) DO UPDATE SET '
+                        'ingested_hash=stac_hash, ingest_status=excluded.ingest_status, ingest_error=NULL, '
+                        'ingested_time=excluded.ingested_time',
+                        (collection_id, product_id, INGESTED, ingested_time)
+                    )
+
+    def delete_collection(self, collection_id):
+        """Delete the records of the products of a given collection."""
+        with self.transaction():
+            self.connection.execute('DELETE FROM products WHERE collection_id = ?', (collection_id,))
+
+
+def needs_transform(transform_state, source_hash) -> bool:
+    """Returns True if a product of given ledger transform state is to be transformed, i.e. is new, changed, or its
+    transformation previously failed."""
+    return transform_state is None or transform_state[0] != source_hash or transform_state[1] != TRANSFORMED
+
+
+def needs_ingest(ingest_state) -> bool:
+    """Returns True if a product of given ledger ingest state is to be ingested, i.e. is not in the ledger, changed
+    since its last ingestion, or its ingestion previously failed."""
+    if ingest_state is None:
+        return True
+    stac_hash, ingested_hash, ingest_status = ingest_state
+    return ingest_status != INGESTED or stac_hash != ingested_hash
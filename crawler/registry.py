@@ -5,13 +5,14 @@ from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
-import requests
 from contextlib import closing
 
 from pathlib import Path
 import glob
 import json
 
+from .client import HttpClient, get_http_client
+
 class ProviderRole(Enum):
     producer = 'producer'
     licensor = 'licensor'
@@ -57,10 +58,11 @@ class ExternalService(Service):
 
 class RegistryInterface():
     """Abstract registry class that defines a common interface for the children HealthcheckrRegistry and Local RegistryInterface classes."""
-    def __init__(self, url='', path=''):
+    def __init__(self, url='', path='', http_client: HttpClient = None):
         self.url = url
         self.path = path
         self.services = []
+        self.http_client = http_client if http_client else get_http_client()
 
     def get_services(self) -> List[Service]:
         return self.services
@@ -70,11 +72,11 @@ class HealthcheckrRegistry(RegistryInterface):
 
     End-point: https://pdssp.ias.universite-paris-saclay.fr/registry/services
     """
-    def __init__(self, url=''):
-        super().__init__(url=url)
+    def __init__(self, url='', http_client: HttpClient = None):
+        super().__init__(url=url, http_client=http_client)
 
     def get_services(self):
-        with closing(requests.get(self.url)) as r:
+        with closing(self.http_client.get(self.url)) as r:
             if r.ok:
                 response = r.json()
             else:
@@ -96,8 +98,8 @@ class HealthcheckrRegistry(RegistryInterface):
 class LocalRegistry(RegistryInterface):
     """Class that represents a local registry defining external services, not compliant to the PDSSP data model.
     """
-    def __init__(self, path=''):  # path='pdssp-crawler/data/services'
-        super().__init__(path=path)
+    def __init__(self, path='', http_client: HttpClient = None):  # path='pdssp-crawler/data/services'
+        super().__init__(path=path, http_client=http_client)
 
     def get_services(self):
         # check that local registry directory exists
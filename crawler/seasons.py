@@ -0,0 +1,148 @@
+"""PDSSP Crawler Mars seasons module.
+
+Computes Mars solar longitude (Ls) and hemisphere seasons of arrays of UTC times, in one vectorised NumPy pass, using
+the Allison & McEwen (2000) Mars orbital model as used by the NASA GISS Mars24 sunclock (see
+https://www.giss.nasa.gov/tools/mars24/help/algorithm.html).
+"""
+
+from enum import Enum
+import warnings
+
+import numpy as np
+import erfa
+
+J2000_EPOCH = np.datetime64('2000-01-01T12:00:00', 'ms')
+"""J2000 epoch, as a (TT) datetime."""
+
+TT_TAI_SECONDS = 32.184
+"""Difference between Terrestrial Time (TT) and International Atomic Time (TAI), in seconds."""
+
+PBS_TERMS = np.array([
+    # amplitude (deg), period (Julian years), phase (deg)
+    [0.0071, 2.2353, 49.409],
+    [0.0057, 2.7543, 168.173],
+    [0.0039, 1.1177, 191.837],
+    [0.0037, 15.7866, 21.736],
+    [0.0021, 2.1354, 15.704],
+    [0.0020, 2.4694, 95.528],
+    [0.0018, 32.8493, 49.095],
+])
+"""Planetary perturbations terms of the Mars equation of center."""
+
+SEASONS_MEMO_MAX_SIZE = 100000
+"""Maximum number of UTC times which solar longitude and seasons are memoised."""
+
+
+class Hemisphere(Enum):
+    NORTH = 'north'
+    SOUTH = 'south'
+
+
+class Season(Enum):
+    SPRING = 'spring'
+    SUMMER = 'summer'
+    AUTUMN = 'autumn'
+    WINTER = 'winter'
+
+
+NORTH_SEASONS = [Season.SPRING, Season.SUMMER, Season.AUTUMN, Season.WINTER]
+"""Northern hemisphere seasons, by solar longitude quadrant."""
+
+SOUTH_SEASONS = [Season.AUTUMN, Season.WINTER, Season.SPRING, Season.SUMMER]
+"""Southern hemisphere seasons, by solar longitude quadrant."""
+
+
+def to_datetime64(utc_times) -> np.ndarray:
+    """Returns an array of millisecond-precision datetimes from a sequence of ISO UTC time strings (or datetimes)."""
+    utc_times = [utc_time[:-1] if isinstance(utc_time, str) and utc_time.endswith('Z') else utc_time
+                 for utc_time in utc_times]
+    return np.array(utc_times, dtype='datetime64[ms]')
+
+
+def tt_minus_utc(utc_times: np.ndarray) -> np.ndarray:
+    """Returns the TT-UTC differences in seconds of an array of UTC datetimes, accounting for leap seconds."""
+    days = utc_times.astype('datetime64[D]')
+    months = utc_times.astype('datetime64[M]')
+    years = utc_times.astype('datetime64[Y]')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', erfa.ErfaWarning)  # "dubious year" for dates before 1960 or in the far future
+        tai_utc = erfa.dat(
+            years.astype(int) + 1970,
+            months.astype(int) % 12 + 1,
+            (days - months).astype(int) + 1,
+            np.zeros(utc_times.shape)
+        )
+    return tai_utc + TT_TAI_SECONDS
+
+
+def mars_solar_longitude(utc_times) -> np.ndarray:
+    """Returns Mars solar longitudes (Ls), in degrees, of an array of UTC times (datetime64 or ISO time strings).
+    """
+    utc_times = to_datetime64(utc_times) if not isinstance(utc_times, np.ndarray) else utc_times.astype('datetime64[ms]')
+
+    # days since J2000 epoch (TT)
+    dt_j2000 = (utc_times - J2000_EPOCH) / np.timedelta64(1, 'D') + tt_minus_utc(utc_times) / 86400.0
+
+    # Mars mean anomaly, and angle of the fictitious mean sun
+    mean_anomaly = np.radians(19.3871 + 0.52402073 * dt_j2000)
+    alpha_fms = 270.3871 + 0.524038496 * dt_j2000
+
+    # planetary perturbations
+    amplitudes, periods, phases = PBS_TERMS[:, 0:1], PBS_TERMS[:, 1:2], PBS_TERMS[:, 2:3]
+    pbs = np.sum(amplitudes * np.cos(np.radians(0.985626 * dt_j2000 / periods + phases)), axis=0)
+
+    # equation of center
+    equation_of_center = (
+        (10.691 + 3.0e-7 * dt_j2000) * np.sin(mean_anomaly)
+        + 0.623 * np.sin(2 * mean_anomaly)
+        + 0.050 * np.sin(3 * mean_anomaly)
+        + 0.005 * np.sin(4 * mean_anomaly)
+        + 0.0005 * np.sin(5 * mean_anomaly)
+        + pbs
+    )
+
+    return np.mod(alpha_fms + equation_of_center, 360.0)
+
+
+def mars_seasons(solar_longitudes: np.ndarray, hemisphere=Hemisphere.NORTH) -> list:
+    """Returns the Mars seasons of a given hemisphere, for an array of solar longitudes."""
+    seasons = NORTH_SEASONS if hemisphere == Hemisphere.NORTH else SOUTH_SEASONS
+    quadrants = (np.asarray(solar_longitudes) // 90).astype(int) % 4
+    return [seasons[quadrant] for quadrant in quadrants]
+
+
+class MarsSeasons:
+    """Mars solar longitude and seasons calculator, memoising results per UTC time string.
+
+    Results of a whole page or collection of products are computed at once using :meth:`compute`, and then retrieved
+    per product using :meth:`get`.
+    """
+    def __init__(self, memo_max_size=SEASONS_MEMO_MAX_SIZE):
+        self.memo = {}
+        self.memo_max_size = memo_max_size
+
+    def compute(self, utc_times: list) -> list[dict]:
+        """Returns the solar longitude and seasons of a list of ISO UTC time strings, as a list of
+        `{'ls': float, Hemisphere.NORTH: Season, Hemisphere.SOUTH: Season}` dictionaries.
+        """
+        new_utc_times = list(dict.fromkeys(utc_time for utc_time in utc_times if utc_time not in self.memo))
+        if len(self.memo) + len(new_utc_times) > self.memo_max_size:
+            self.memo = {}
+            new_utc_times = list(dict.fromkeys(utc_times))
+        if new_utc_times:
+            solar_longitudes = mars_solar_longitude(new_utc_times)
+            north_seasons = mars_seasons(solar_longitudes, hemisphere=Hemisphere.NORTH)
+            south_seasons = mars_seasons(solar_longitudes, hemisphere=Hemisphere.SOUTH)
+            for utc_time, ls, north_season, south_season in zip(new_utc_times, solar_longitudes.tolist(),
+                                                                north_seasons, south_seasons):
+                self.memo[utc_time] = {'ls': ls, Hemisphere.NORTH: north_season, Hemisphere.SOUTH: south_season}
+        return [self.memo[utc_time] for utc_time in utc_times]
+
+    def get(self, utc_time: str) -> dict:
+        """Returns the solar longitude and seasons of an ISO UTC time string."""
+        if not utc_time:
+            raise Exception(f'Invalid `{utc_time}` UTC time.')
+        season = self.memo.get(utc_time)
+        if season is None:
+            season = self.compute([utc_time])[0]
+        return season
@@ -0,0 +1,225 @@
+"""PDSSP Crawler STAC output module.
+
+Writes self-contained STAC catalogs with the same layout as ``pystac.Catalog.save`` using the ``SELF_CONTAINED``
+catalog type, without holding whole collections in memory::
+
+    <target>/catalog.json
+    <target>/<collection_id>/collection.json
+    <target>/<collection_id>/<item_id>/<item_id>.json
+"""
+
+from pathlib import Path
+from datetime import datetime, timezone
+import pystac
+from pystac.utils import str_to_datetime
+
+STAC_JSON_MEDIA_TYPE = 'application/json'
+STAC_ITEM_MEDIA_TYPE = 'application/geo+json'
+
+
+def parse_datetime(value: str) -> datetime:
+    """Returns the timezone-aware datetime of a STAC datetime string (UTC if not specified)."""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        dt = str_to_datetime(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def get_link(rel, href, media_type=STAC_JSON_MEDIA_TYPE, title=None) -> dict:
+    link = {'rel': rel, 'href': href, 'type': media_type}
+    if title is not None:
+        link['title'] = title
+    return link
+
+
+class STACCollectionWriter:
+    """Streaming writer of a collection of a self-contained STAC catalog.
+
+    STAC items are written as soon as they are added, while the collection extent and item links are accumulated. The
+    collection file is written when closing the writer.
+    """
+    def __init__(self, stac_collection: pystac.Collection, stac_catalog_dirpath, stac_catalog_title=None):
+        self.stac_collection = stac_collection
+        self.stac_catalog_title = stac_catalog_title
+        self.collection_dirpath = Path(stac_catalog_dirpath, stac_collection.id)
+        self.collection_filepath = Path(self.collection_dirpath, 'collection.json')
+        self.stac_io = pystac.StacIO.default()
+        self.item_ids = {}  # ordered set of written item IDs
+        self.item_links = [
+            get_link('root', '../../catalog.json', title=stac_catalog_title),
+            get_link('collection', '../collection.json', title=stac_collection.title),
+            get_link('parent', '../collection.json', title=stac_collection.title)
+        ]
+
+        # collection extent, updated from added items
+        self.bounds = [float('inf'), float('inf'), float('-inf'), float('-inf')]
+        self.start_datetime = None
+        self.end_datetime = None
+        self.extent_outdated = False  # set when an item is replaced
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__}> "
+            f"collection_filepath: {self.collection_filepath} | "
+            f"n_items: {self.n_items}"
+        )
+
+    @property
+    def n_items(self) -> int:
+        return len(self.item_ids)
+
+    def get_item_filepath(self, item_id) -> Path:
+        return Path(self.collection_dirpath, item_id, f'{item_id}.json')
+
+    def add_item(self, stac_item_dict: dict):
+        """Write a STAC item dictionary (without links) to its item file, replacing any previously added item with the
+        same ID.
+        """
+        item_id = stac_item_dict['id']
+        stac_item_dict['links'] = self.item_links
+        item_filepath = self.get_item_filepath(item_id)
+        self.stac_io.save_json(str(item_filepath), stac_item_dict)
+
+        if item_id in self.item_ids:
+            # keep item links in order of last addition, and recompute extent from item files when closing.
+            self.item_ids.pop(item_id)
+            self.extent_outdated = True
+        self.item_ids[item_id] = None
+        self.update_extent(stac_item_dict)
+
+    def update_extent(self, stac_item_dict: dict):
+        """Update collection extent from a STAC item dictionary, the same way as ``pystac.Extent.from_items``."""
+        bbox = stac_item_dict.get('bbox')
+        if bbox is not None:
+            self.bounds = [min(self.bounds[0], bbox[0]), min(self.bounds[1], bbox[1]),
+                           max(self.bounds[2], bbox[2]), max(self.bounds[3], bbox[3])]
+        properties = stac_item_dict['properties']
+        for key in ['datetime', 'start_datetime']:
+            if properties.get(key):
+                dt = parse_datetime(properties[key])
+                if self.start_datetime is None or dt < self.start_datetime:
+                    self.start_datetime = dt
+        for key in ['datetime', 'end_datetime']:
+            if properties.get(key):
+                dt = parse_datetime(properties[key])
+                if self.end_datetime is None or dt > self.end_datetime:
+                    self.end_datetime = dt
+
+    def recompute_extent(self):
+        """Recompute collection extent from written item files."""
+        self.bounds = [float('inf'), float('inf'), float('-inf'), float('-inf')]
+        self.start_datetime = None
+        self.end_datetime = None
+        for item_id in self.item_ids.keys():
+            self.update_extent(self.stac_io.read_json(str(self.get_item_filepath(item_id))))
+        self.extent_outdated = False
+
+    def close(self) -> Path:
+        """Write collection file, and returns its path.
+
+        The spatial and temporal extents of the collection are kept as is if no written item has a bbox, or a datetime.
+        """
+        if self.extent_outdated:
+            self.recompute_extent()
+        spatial_extent = self.stac_collection.extent.spatial
+        if self.bounds[0] <= self.bounds[2]:  # at least one item bbox
+            spatial_extent = pystac.SpatialExtent(bboxes=[self.bounds])
+        temporal_extent = self.stac_collection.extent.temporal
+        if self.start_datetime is not None:
+            temporal_extent = pystac.TemporalExtent(intervals=[[self.start_datetime, self.end_datetime]])
+        self.stac_collection.extent = pystac.Extent(spatial_extent, temporal_extent)
+        stac_collection_dict = self.stac_collection.to_dict(include_self_link=False, transform_hrefs=False)
+        stac_collection_dict['links'] = (
+            [get_link('root', '../catalog.json', title=self.stac_catalog_title)] +
+            [get_link('item', f'./{item_id}/{item_id}.json', media_type=STAC_ITEM_MEDIA_TYPE) for item_id in self.item_ids.keys()] +
+            [get_link('parent', '../catalog.json', title=self.stac_catalog_title)]
+        )
+        self.stac_io.save_json(str(self.collection_filepath), stac_collection_dict)
+        return self.collection_filepath
+
+
+class STACCatalogManager:
+    """Manager of a self-contained STAC catalog, holding one or several collections.
+
+    Only the catalog file is read, collections being indexed by the directory name of their child link. Collections
+    are added, replaced or removed by only writing their own files and the catalog file.
+    """
+    def __init__(self, stac_catalog_dirpath):
+        self.catalog_dirpath = Path(stac_catalog_dirpath)
+        self.catalog_filepath = Path(self.catalog_dirpath, 'catalog.json')
+        self.stac_io = pystac.StacIO.default()
+        self.catalog_dict = None
+        self.links = []  # catalog links, other than child links
+        self.child_links = {}  # child links, by collection ID
+        if self.catalog_filepath.is_file():
+            self.load()
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__}> "
+            f"catalog_filepath: {self.catalog_filepath} | "
+            f"n_collections: {len(self.child_links)}"
+        )
+
+    @property
+    def exists(self) -> bool:
+        return self.catalog_dict is not None
+
+    @property
+    def id(self) -> str:
+        return self.catalog_dict.get('id') if self.catalog_dict else None
+
+    @property
+    def title(self) -> str:
+        return self.catalog_dict.get('title') if self.catalog_dict else None
+
+    def load(self):
+        """Load catalog file, and index its child links."""
+        self.catalog_dict = self.stac_io.read_json(str(self.catalog_filepath))
+        self.links = []
+        self.child_links = {}
+        for link in self.catalog_dict.get('links', []):
+            if link['rel'] == 'child':
+                self.child_links[Path(link['href']).parent.name] = link
+            elif link['rel'] != 'self':
+                self.links.append(link)
+
+    def create(self, stac_catalog: pystac.Catalog):
+        """Set new catalog, from a PySTAC Catalog object without children."""
+        self.catalog_dict = stac_catalog.to_dict(include_self_link=False, transform_hrefs=False)
+        self.links = [get_link('root', './catalog.json', title=stac_catalog.title)]
+        self.child_links = {}
+
+    def get_collection_ids(self) -> list[str]:
+        return list(self.child_links.keys())
+
+    def has_collection(self, collection_id) -> bool:
+        return collection_id in self.child_links
+
+    def get_collection_dirpath(self, collection_id) -> Path:
+        return Path(self.catalog_dirpath, collection_id)
+
+    def add_collection(self, collection_id, title=None):
+        """Add collection child link, replacing any existing one with the same collection ID."""
+        self.child_links.pop(collection_id, None)
+        self.child_links[collection_id] = get_link('child', f'./{collection_id}/collection.json', title=title)
+
+    def remove_collection(self, collection_id):
+        """Remove collection child link. Collection files are kept."""
+        self.child_links.pop(collection_id, None)
+
+    def get_root_catalog(self) -> pystac.Catalog:
+        """Returns a PySTAC Catalog object of the catalog without its children, to be used as the root of a collection
+        saved using PySTAC.
+        """
+        stac_catalog = pystac.Catalog.from_dict(dict(self.catalog_dict, links=[]), migrate=False)
+        stac_catalog.set_self_href(str(self.catalog_filepath))
+        return stac_catalog
+
+    def save(self):
+        """Write catalog file."""
+        self.catalog_dict['links'] = self.links + list(self.child_links.values())
+        self.stac_io.save_json(str(self.catalog_filepath), self.catalog_dict)
@@ -0,0 +1,148 @@
+"""PDSSP Crawler timestamps module.
+
+Normalises source UTC time strings into ISO format strings (STAC standard), without using exceptions as control flow:
+each valid UTC time format is matched using a regular expression derived from its `strptime` format, the format which
+last matched a given source field being tried first. Whole columns of UTC time strings can also be converted at once
+using NumPy `datetime64` arrays.
+"""
+
+from datetime import datetime
+import re
+
+import numpy as np
+
+UTC_TIME_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y-%m-%dT%H:%M:%SZ',
+]
+"""Valid source UTC time formats."""
+
+FORMAT_DIRECTIVES = {
+    'Y': r'(?P<Y>\d{4})',
+    'm': r'(?P<m>\d{1,2})',
+    'd': r'(?P<d>\d{1,2})',
+    'H': r'(?P<H>\d{1,2})',
+    'M': r'(?P<M>\d{1,2})',
+    'S': r'(?P<S>\d{1,2})',
+    'f': r'(?P<f>\d{1,6})',
+}
+"""Regular expressions of supported `strptime` format directives."""
+
+TIMESPEC_UNITS = {
+    'seconds': 's',
+    'milliseconds': 'ms',
+    'microseconds': 'us',
+}
+"""NumPy datetime units of `datetime.isoformat` timespecs supported by batch conversions."""
+
+
+def compile_utc_time_format(utc_time_format: str) -> re.Pattern:
+    """Returns the regular expression matching UTC time strings of a given `strptime` format."""
+    pattern = ''
+    tokens = re.split(r'(%.)', utc_time_format)
+    for token in tokens:
+        if token.startswith('%'):
+            if token[1] not in FORMAT_DIRECTIVES.keys():
+                raise Exception(f'Unsupported `{token}` UTC time format directive.')
+            pattern += FORMAT_DIRECTIVES[token[1]]
+        else:
+            pattern += re.escape(token)
+    return re.compile(pattern + r'\Z')
+
+
+def to_datetime(match: re.Match) -> datetime:
+    """Returns the datetime of a matched UTC time string, or None if invalid (eg: month 13)."""
+    fields = match.groupdict()
+    microsecond = int(fields['f'].ljust(6, '0')) if fields.get('f') else 0
+    year, month, day = int(fields['Y']), int(fields['m']), int(fields['d'])
+    hour, minute, second = int(fields['H']), int(fields['M']), int(fields['S'])
+    if not (year >= 1 and 1 <= month <= 12 and 1 <= day <= 31 and hour < 24 and minute < 60 and second < 60):
+        return None
+    if day > 28 and day > days_in_month(year, month):
+        return None
+    return datetime(year, month, day, hour, minute, second, microsecond)
+
+
+def days_in_month(year, month) -> int:
+    """Returns the number of days of a given month."""
+    if month == 2:
+        return 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
+    return 30 if month in (4, 6, 9, 11) else 31
+
+
+def is_iso_utc_time(utc_time) -> bool:
+    """Returns True if a UTC time string is in a `YYYY-MM-DDTHH:MM:SS[.ffffff][Z]` form, not checking digits."""
+    if not isinstance(utc_time, str) or len(utc_time) < 19 or utc_time[10] != 'T' or utc_time.startswith('0000'):
+        return False
+    fraction = utc_time[19:-1] if utc_time.endswith('Z') else utc_time[19:]
+    return fraction == '' or (fraction[0] == '.' and 2 <= len(fraction) <= 7 and fraction[1:].isdigit())
+
+
+def utc_times_to_iso(utc_times: list, timespec='milliseconds') -> list:
+    """Convert a list of UTC time strings to ISO format strings at once, using a NumPy `datetime64` array.
+
+    Returned ISO format strings are None for UTC time strings that are not in a `YYYY-MM-DDTHH:MM:SS[.ffffff][Z]` form,
+    or if the whole column could not be converted at once. Supported timespecs are 'seconds', 'milliseconds' and
+    'microseconds'.
+    """
+    unit = TIMESPEC_UNITS[timespec]
+    valid = [is_iso_utc_time(utc_time) for utc_time in utc_times]
+    valid_utc_times = [utc_time[:-1] if utc_time.endswith('Z') else utc_time
+                       for utc_time, is_valid in zip(utc_times, valid) if is_valid]
+    try:
+        iso_times = iter(np.datetime_as_string(np.array(valid_utc_times, dtype='datetime64[us]'), unit=unit).tolist())
+    except ValueError:
+        return [None] * len(utc_times)
+    return [next(iso_times) if is_valid else None for is_valid in valid]
+
+
+class UTCTimeNormaliser:
+    """Source UTC time strings normaliser, remembering the format which last matched each source field.
+
+    ISO format strings of whole columns of UTC time strings can be computed at once using :meth:`convert`, and then
+    retrieved one by one using :meth:`to_iso`.
+    """
+    def __init__(self, utc_time_formats=UTC_TIME_FORMATS, timespec='milliseconds'):
+        self.utc_time_formats = list(utc_time_formats)
+        self.patterns = [compile_utc_time_format(utc_time_format) for utc_time_format in self.utc_time_formats]
+        self.timespec = timespec
+        self.field_format_idx = {}  # index of the last matching format, by source field
+        self.iso_times = {}  # ISO format strings, by UTC time string, from the last conversion
+
+    def parse(self, utc_time: str, field='') -> datetime:
+        """Returns the datetime of a UTC time string of a given source field, or None if not in a valid format."""
+        if not isinstance(utc_time, str):
+            return None
+        format_idx = self.field_format_idx.get(field, 0)
+        match = self.patterns[format_idx].match(utc_time)
+        if not match:
+            for format_idx, pattern in enumerate(self.patterns):
+                match = pattern.match(utc_time)
+                if match:
+                    self.field_format_idx[field] = format_idx
+                    break
+            else:
+                return None
+        return to_datetime(match)
+
+    def to_iso(self, utc_time: str, field='') -> str:
+        """Returns the ISO format string of a UTC time string of a given source field, or None if not valid."""
+        iso_time = self.iso_times.get(utc_time)
+        if iso_time is None:
+            parsed_time = self.parse(utc_time, field=field)
+            iso_time = parsed_time.isoformat(timespec=self.timespec) if parsed_time else None
+        return iso_time
+
+    def convert(self, utc_times: list) -> list:
+        """Convert a column of UTC time strings to ISO format strings at once, and keep them for :meth:`to_iso`,
+        replacing those of the previous conversion.
+        """
+        unique_utc_times = list(dict.fromkeys(utc_times))
+        if self.timespec in TIMESPEC_UNITS.keys():
+            iso_times = utc_times_to_iso(unique_utc_times, timespec=self.timespec)
+        else:
+            iso_times = [None] * len(unique_utc_times)
+        self.iso_times = {utc_time: iso_time for utc_time, iso_time in zip(unique_utc_times, iso_times) if iso_time}
+        return [self.to_iso(utc_time) for utc_time in utc_times]
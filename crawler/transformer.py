@@ -7,34 +7,112 @@ from typing import Dict, List, Union, Optional
 import crawler.schemas as schemas
 from .extractor import Extractor
 from .datastore import SourceCollectionModel
+from .ledger import ProductLedger, hash_dict, needs_transform
+from .config import TRANSFORM_JOBS, TRANSFORM_BATCH_SIZE, TRANSFORM_STREAMING, TRANSFORM_VALIDATION_SAMPLING
+from .stac import STACCatalogManager, STACCollectionWriter
 
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import multiprocessing
 
+import shapely
 import shapely.wkt
 from datetime import datetime
 
 import pystac
+from pystac.utils import datetime_to_str
 
-from pymarsseason import PyMarsSeason, Hemisphere
-from astropy.time import Time
+from .seasons import MarsSeasons, Hemisphere
+from .timestamps import UTCTimeNormaliser
 
 
-def utc_to_iso(utc_time, timespec='auto'):
+utc_time_normaliser = UTCTimeNormaliser()
+"""Default source UTC time strings normaliser."""
+
+def utc_to_iso(utc_time, timespec='auto', field=''):
     """Convert UTC time string to ISO format string (STAC standard).
+
+    The optional source `field` of the UTC time string is used to first try the format which last matched this field.
+    """
+    parsed_time = utc_time_normaliser.parse(utc_time, field=field)
+    return parsed_time.isoformat(timespec=timespec) if parsed_time else None
+
+def parse_footprints(footprint_wkts: list[str]) -> dict:
+    """Parse a list of footprint WKT strings, and returns their GeoJSON geometry mapping and bounding box by WKT string.
+
+    With Shapely 2, all footprints are parsed at once, and their bounds computed, using vectorised array operations.
+    Invalid WKT strings are not included in returned dictionary.
+    """
+    footprint_wkts = list(dict.fromkeys(footprint_wkts))
+    if hasattr(shapely, 'from_wkt'):
+        footprint_shapes = shapely.from_wkt(footprint_wkts, on_invalid='ignore')
+        footprint_bboxes = shapely.bounds(footprint_shapes).tolist()
+    else:
+        footprint_shapes = []
+        for footprint_wkt in footprint_wkts:
+            try:
+                footprint_shapes.append(shapely.wkt.loads(footprint_wkt))
+            except Exception:
+                footprint_shapes.append(None)
+        footprint_bboxes = [list(footprint_shape.bounds) if footprint_shape else None for footprint_shape in footprint_shapes]
+
+    footprints = {}
+    for footprint_wkt, footprint_shape, footprint_bbox in zip(footprint_wkts, footprint_shapes, footprint_bboxes):
+        if footprint_shape is not None:
+            footprints[footprint_wkt] = (shapely.geometry.mapping(footprint_shape), footprint_bbox)
+    return footprints
+
+def iter_batches(iterable, batch_size):
+    """Generator yielding lists of up to `batch_size` elements of an iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+worker_transformer = None
+"""Transformer object of a transform worker process (see `init_transform_worker`)."""
+
+def get_transform_mp_context():
+    """Returns the multiprocessing context of transform worker processes.
+
+    Worker processes are started from a fork server, or spawned, as forking the parent process is unsafe while the
+    extractor reads source products in a background thread (see `PDSODE_Extractor.iter_products`).
+    """
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(start_method)
+
+def init_transform_worker(collection: SourceCollectionModel, destination_schema):
+    """Create the transformer object of a transform worker process, from the source collection model."""
+    global worker_transformer
+    worker_transformer = Transformer(collection, destination_schema=destination_schema)
+
+def create_stac_item_dicts(source_products, stac_collection_id, stac_extensions=[],
+                           validation_sampling=TRANSFORM_VALIDATION_SAMPLING) -> list[tuple]:
+    """Transform a list of source products metadata into STAC item dictionaries, using the transformer object of the
+    transform worker process.
+
+    Module-level function submitted to transform worker processes (see `AbstractTransformer.iter_stac_items`).
     """
-    # set valid datatime formats
-    valid_formats = [
-        '%Y-%m-%dT%H:%M:%S',
-        '%Y-%m-%dT%H:%M:%S.%f',
-        '%Y-%m-%dT%H:%M:%S.%fZ',
-        '%Y-%m-%dT%H:%M:%SZ',
-    ]
-    for valid_format in valid_formats:
-        try:
-            return datetime.strptime(utc_time, valid_format).isoformat(timespec=timespec)
-        except:
-            continue
-    return None
+    return worker_transformer.create_stac_item_dicts(source_products, stac_collection_id,
+                                                     stac_extensions=stac_extensions,
+                                                     validation_sampling=validation_sampling)
+
+def get_stac_asset_dict(asset: schemas.PDSSP_STAC_Asset) -> dict:
+    """Returns the STAC asset dictionary of a PDSSP STAC asset object, as serialised by PySTAC."""
+    stac_asset_dict = {'href': asset.href}
+    if asset.type is not None:
+        stac_asset_dict['type'] = asset.type
+    if asset.title is not None:
+        stac_asset_dict['title'] = asset.title
+    if asset.description is not None:
+        stac_asset_dict['description'] = asset.description
+    if asset.roles is not None:
+        stac_asset_dict['roles'] = asset.roles
+    return stac_asset_dict
 
 def Transformer(collection: SourceCollectionModel = None, source_schema=None, destination_schema='PDSSP_STAC'):
     """Transformer function serving as Transformer objects factory.
@@ -233,6 +311,12 @@ class AbstractTransformer:
         """Returns RESTO-specific STAC Items keywords."""
         return {}
 
+    def prepare_source_products(self, source_products: list[BaseModel]) -> None:
+        """Prepare the transformation of a batch of source products metadata, for example to compute derived values of
+        all products at once, before their transformation one by one.
+        """
+        pass
+
     def get_stac_collection_dict(self, source_metadata, stac_extensions=[]) -> dict:
         if not stac_extensions:
             stac_extensions = self.get_stac_extensions(source_metadata)  # from collection metadata, retrieved from collection service `extra_params` JSON attribute.
@@ -298,10 +382,20 @@ class AbstractTransformer:
 
         return stac_metadata
 
-    def transform(self, source_collection_file_path='', output_dir_path='', stac_extensions=[], overwrite=False) -> None:
+    def transform(self, source_collection_file_path='', output_dir_path='', stac_extensions=[], overwrite=False,
+                  ledger: ProductLedger = None, n_jobs=TRANSFORM_JOBS, streaming=TRANSFORM_STREAMING) -> None:
         """Transform (extracted) source collection files into PDSSP STAC catalog.
 
         Destination STAC catalog may contain one or several collections, related to only one reference target.
+
+        If a products ledger is given, products which source metadata did not change since their last successful
+        transformation are not transformed again, their previously written STAC item being reused. Products which
+        transformation fails are recorded as failed in the ledger, and skipped.
+
+        Source products metadata are transformed by a pool of `n_jobs` worker processes if `n_jobs` is greater than 1.
+
+        If `streaming` is True, each STAC item file is written as soon as created, instead of holding the whole STAC
+        collection in memory until saving the catalog.
         """
         # TODO: Some methods currently require a source collection model object.
         #   - properly implement this,
@@ -312,32 +406,26 @@ class AbstractTransformer:
             output_dir_path = self.stac_dir
         stac_catalog_dirpath = Path(output_dir_path, self.collection.target.lower())
 
-        # set destination STAC catalog file
-        stac_catalog_filepath = Path(stac_catalog_dirpath, 'catalog.json')
-
-        # if destination STAC catalog file exists, create catalog STAC object from file.
-        if Path.is_file(stac_catalog_filepath):
-            stac_catalog = pystac.Catalog.from_file(str(stac_catalog_filepath))
-        else:
+        # if destination STAC catalog file exists, read and index catalog file only.
+        stac_catalog = STACCatalogManager(stac_catalog_dirpath)
+        if not stac_catalog.exists:
             # else create STAC catalog from scratch.
-            stac_catalog = pystac.Catalog(
+            stac_catalog.create(pystac.Catalog(
                 id=f'pdssp-{self.collection.target.lower()}-catalog',
                 title=f'{self.collection.target.title()} STAC Catalog holding one or several PDSSP-compliant data products collections.',
                 description=f'This catalog was generated by the PDSSSP Crawler on {datetime.utcnow()}.',
                 stac_extensions=['ssys'],
                 extra_fields={'ssys:targets': [self.collection.target.lower()]}
-            )
+            ))
 
         # check that input source collection haven't been transformed and exists in destination STAC catalog.
-        stac_catalog_collections = stac_catalog.get_all_collections()
-        for stac_catalog_collection in stac_catalog_collections:
-            if stac_catalog_collection.id == self.collection.collection_id:
-                if overwrite:
-                    # remove destination STAC catalog collection
-                    print(f'removing child: {self.collection.collection_id}')
-                    stac_catalog.remove_child(self.collection.collection_id)
-                else:
-                    raise Exception(f'{stac_catalog.id} destination STAC catalog already hold a collection with the {self.collection.collection_id} collection ID.')
+        if stac_catalog.has_collection(self.collection.collection_id):
+            if overwrite:
+                # remove destination STAC catalog collection
+                print(f'removing child: {self.collection.collection_id}')
+                stac_catalog.remove_collection(self.collection.collection_id)
+            else:
+                raise Exception(f'{stac_catalog.id} destination STAC catalog already hold a collection with the {self.collection.collection_id} collection ID.')
 
 
         # set extractor
@@ -380,70 +468,241 @@ class AbstractTransformer:
         # read and transform source collection products metadata, into destination `PDSSP_STAC_Item` metadata, then
         # create and add the corresponding PySTAC Item object to the PySTAC Collection.
         #
-        while extractor.file_idx < extractor.n_extracted_files:  # TODO: improve mechanism to loop over all products.
-            source_product_metadata = extractor.read_product_metadata()
-            if source_product_metadata:
-                stac_item_metadata = self.transform_source_metadata(source_product_metadata, object_type='item', stac_extensions=stac_extensions)
+        # If a products ledger is given, previously transformed STAC items of products which source metadata did not
+        # change are reused (see `reuse_stac_item`). Products found several times, re-created since a previous
+        # extraction, are recorded in the ledger from their last occurrence only.
+        transform_states = ledger.get_transform_states(stac_collection_id) if ledger else {}
+        source_hashes = {}  # by source product metadata object `id()`, until yielded by `iter_stac_items`
+        reused_products = set()
+        seen_product_ids = set()
+        ledger_records = {}  # by product ID
+        n_reused_items = 0
+
+        def iter_source_products():
+            for source_product_metadata in extractor.iter_products():
+                if source_product_metadata:
+                    yield source_product_metadata
+                else:
+                    print(f'WARNING: Could not transform product metadata in `{self.collection.collection_id}` source collection.')
+
+        def reuse_stac_item(source_product_metadata):
+            product_id = self.get_id(source_product_metadata, object_type='item')
+            source_hash = hash_dict(source_product_metadata.dict())
+            source_hashes[id(source_product_metadata)] = source_hash
+            if product_id in seen_product_ids:
+                # STAC item file may be overwritten by a previous occurrence of the product
+                return None
+            seen_product_ids.add(product_id)
+            stac_item_filepath = Path(stac_catalog_dirpath, stac_collection_id, product_id, f'{product_id}.json')
+            if not needs_transform(transform_states.get(product_id), source_hash) and stac_item_filepath.is_file():
+                stac_item_dict = pystac.StacIO.default().read_json(str(stac_item_filepath))
+                stac_item_dict['links'] = []
+                reused_products.add(id(source_product_metadata))
+                return stac_item_dict
+            return None
+
+        # if streaming, STAC item files are written as soon as created, the collection and catalog files being written
+        # once all items are written.
+        stac_collection_writer = None
+        if streaming:
+            print(f'Writing STAC JSON files in {stac_catalog_dirpath} directory...')
+            stac_collection_writer = STACCollectionWriter(stac_collection, stac_catalog_dirpath, stac_catalog.title)
+
+        stac_item_ids = set()
+        for source_product_metadata, stac_item_dict, error in self.iter_stac_items(
+                iter_source_products(), stac_collection_id, stac_extensions=stac_extensions, n_jobs=n_jobs,
+                reuse_stac_item=reuse_stac_item if ledger else None):
+            if ledger:
+                product_id = self.get_id(source_product_metadata, object_type='item')
+                source_hash = source_hashes.pop(id(source_product_metadata))
+                ledger_records.pop(product_id, None)
+                if error:
+                    print(f'WARNING: Could not transform `{product_id}` product metadata: {error}')
+                    ledger_records[product_id] = (product_id, source_hash, None, error)
+                    continue
+                if id(source_product_metadata) in reused_products:
+                    reused_products.discard(id(source_product_metadata))
+                    n_reused_items += 1
+                else:
+                    stac_hash = hash_dict({key: value for key, value in stac_item_dict.items() if key != 'links'})
+                    ledger_records[product_id] = (product_id, source_hash, stac_hash, None)
+            elif error:
+                raise Exception(error)
+
+            # add item to STAC collection, replacing any previous item with the same ID, as products re-created since
+            # a previous extraction are also found in later extracted files (see `PDSODE_Extractor.extract_delta`).
+            if streaming:
+                stac_collection_writer.add_item(stac_item_dict)
             else:
-                print(f'WARNING: Could not transform product metadata in `{self.collection.collection_id}` source collection.')
-                continue
-
-            # create PySTAC Item
-            stac_item = pystac.Item(
-                id=stac_item_metadata.id,
-                stac_extensions=stac_extensions,
-                geometry=stac_item_metadata.geometry,
-                bbox=stac_item_metadata.bbox,
-                datetime=datetime.fromisoformat(stac_item_metadata.properties['datetime']),
-                properties=stac_item_metadata.properties,
-                extra_fields=stac_item_metadata.extra_fields,  # eg: {'ssys:targets': stac_item_metadata.ssys_targets},
-                collection=stac_collection_id
-            )
+                stac_item = pystac.Item.from_dict(stac_item_dict, migrate=False, preserve_dict=False)
+                if stac_item.id in stac_item_ids:
+                    stac_collection.remove_item(stac_item.id)
+                stac_item_ids.add(stac_item.id)
+                stac_collection.add_item(stac_item)
 
-            # add assets to pySTAC item
-            for key in stac_item_metadata.assets:
-                asset_metadata = stac_item_metadata.assets[key]
-                stac_item.add_asset(
-                    key=key,
-                    asset=pystac.Asset(
-                        href=asset_metadata.href,
-                        title=asset_metadata.title,
-                        description=asset_metadata.description,
-                        media_type=asset_metadata.type,
-                        roles=asset_metadata.roles
-                    )
-                )
-            # add item to PySTAC Collection
-            stac_collection.add_item(stac_item)
+        if ledger and n_reused_items:
+            print(f'{n_reused_items} unchanged STAC items reused.')
 
         # Return if no STAC items in collection
-        n_items = 0
-        for link in stac_collection.links:
-            if link.rel == 'item':
-                n_items += 1
+        if streaming:
+            n_items = stac_collection_writer.n_items
+        else:
+            n_items = 0
+            for link in stac_collection.links:
+                if link.rel == 'item':
+                    n_items += 1
         if n_items == 0:
             print(f'WARNING: No valid STAC Items in {stac_collection_id} collection.')
+            if ledger:
+                ledger.record_transforms(stac_collection_id, list(ledger_records.values()))
             return
 
-        # update collection extent from items
-        stac_collection.update_extent_from_items()
+        if streaming:
+            # write collection file
+            stac_dir = stac_collection_writer.close().parent
+        else:
+            # update collection extent from items
+            stac_collection.update_extent_from_items()
+
+            # save STAC collection files, as a child of the output STAC catalog
+            print(f'Writing STAC JSON files in {stac_catalog_dirpath} directory...')
+            stac_dir = stac_catalog.get_collection_dirpath(stac_collection_id)
+            stac_catalog.get_root_catalog().add_child(stac_collection)
+            stac_collection.normalize_hrefs(str(stac_dir))
+            stac_collection.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
 
-        # add collection to the output STAC catalog
-        stac_catalog.add_child(stac_collection)
+        # add collection to the output STAC catalog, only writing the catalog file.
+        stac_catalog.add_collection(stac_collection_id, title=stac_collection.title)
+        stac_catalog.save()
 
-        # save STAC catalog files
-        print(f'Writing STAC JSON files in {stac_catalog_dirpath} directory...')
-        Path.mkdir(stac_catalog_dirpath, parents=True, exist_ok=True) # exist_ok=overwrite ?
-        stac_catalog.normalize_hrefs(str(stac_catalog_dirpath))
-        stac_catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+        # record transformed products, once written
+        if ledger:
+            ledger.record_transforms(stac_collection_id, list(ledger_records.values()))
 
         # set transformer status attributes
-        for link in stac_collection.links:
-            if link.rel == 'self':
-                stac_dir = Path(link.target).parent
         self.transformed = True
         self.stac_dir = stac_dir
 
+    def iter_stac_items(self, source_products, stac_collection_id, stac_extensions=[], n_jobs=1,
+                        batch_size=TRANSFORM_BATCH_SIZE, reuse_stac_item=None,
+                        validation_sampling=TRANSFORM_VALIDATION_SAMPLING):
+        """Generator yielding (source_product_metadata, stac_item_dict, error) tuples for each input source product
+        metadata, in input order. `stac_item_dict` is None, and `error` set, if the source product metadata could not be
+        transformed.
+
+        If `n_jobs` is greater than 1, batches of `batch_size` source products metadata are transformed by a pool of
+        `n_jobs` worker processes. The optional `reuse_stac_item` function returns a previously created STAC item
+        dictionary for a given source product metadata, or None if it has to be transformed.
+
+        See `create_stac_item_dicts` for `validation_sampling`.
+        """
+        if n_jobs <= 1:
+            for batch in iter_batches(source_products, batch_size):
+                stac_item_dicts = [reuse_stac_item(product) if reuse_stac_item else None for product in batch]
+                stac_item_results = iter(self.create_stac_item_dicts(
+                    [product for product, stac_item_dict in zip(batch, stac_item_dicts) if not stac_item_dict],
+                    stac_collection_id, stac_extensions=stac_extensions, validation_sampling=validation_sampling))
+                for source_product_metadata, stac_item_dict in zip(batch, stac_item_dicts):
+                    error = None
+                    if not stac_item_dict:
+                        stac_item_dict, error = next(stac_item_results)
+                    yield source_product_metadata, stac_item_dict, error
+            return
+
+        def iter_batch_results(batch, future):
+            stac_item_results = iter(future.result())
+            for source_product_metadata, stac_item_dict in batch:
+                error = None
+                if not stac_item_dict:
+                    stac_item_dict, error = next(stac_item_results)
+                yield source_product_metadata, stac_item_dict, error
+
+        # create worker processes pool before reading source products, each worker process creating its own
+        # transformer object from the source collection model, without its extracted files list.
+        executor = ProcessPoolExecutor(
+            max_workers=n_jobs, mp_context=get_transform_mp_context(), initializer=init_transform_worker,
+            initargs=(self.collection.copy(update={'extracted_files': []}), self.destination_schema)
+        )
+
+        # submit batches of source products to transform, holding up to two batches per worker process.
+        with executor:
+            pending_batches = deque()
+            for products in iter_batches(source_products, batch_size):
+                batch = [(product, reuse_stac_item(product) if reuse_stac_item else None) for product in products]
+                products_to_transform = [product for product, stac_item_dict in batch if not stac_item_dict]
+                future = executor.submit(create_stac_item_dicts, products_to_transform, stac_collection_id,
+                                         stac_extensions, validation_sampling)
+                pending_batches.append((batch, future))
+                while len(pending_batches) >= 2 * n_jobs:
+                    yield from iter_batch_results(*pending_batches.popleft())
+
+            while pending_batches:
+                yield from iter_batch_results(*pending_batches.popleft())
+
+    def create_stac_item_dicts(self, source_products, stac_collection_id, stac_extensions=[],
+                               validation_sampling=TRANSFORM_VALIDATION_SAMPLING) -> list[tuple]:
+        """Transform a list of source products metadata into a list of (stac_item_dict, error) tuples.
+
+        One in every `validation_sampling` STAC items, starting with the first one, is validated against the destination
+        STAC item schema (all if 1, none if 0).
+        """
+        self.prepare_source_products(source_products)
+        results = []
+        for i, source_product_metadata in enumerate(source_products):
+            validate = validation_sampling > 0 and i % validation_sampling == 0
+            try:
+                stac_item_dict = self.create_stac_item_dict(source_product_metadata, stac_collection_id,
+                                                            stac_extensions=stac_extensions, validate=validate)
+                results.append((stac_item_dict, None))
+            except Exception as e:
+                results.append((None, str(e)))
+        return results
+
+    def create_stac_item_dict(self, source_product_metadata: BaseModel, stac_collection_id, stac_extensions=[],
+                              validate=False) -> dict:
+        """Transform source product metadata into the STAC item dictionary of a given STAC collection, as serialised
+        by PySTAC, without links.
+
+        The STAC item dictionary is built directly from the `get_stac_item_dict` intermediate dictionary, which is only
+        validated against the destination STAC item schema if `validate` is True.
+        """
+        if validate:
+            stac_item_metadata = self.transform_source_metadata(source_product_metadata, object_type='item', stac_extensions=stac_extensions)
+            stac_item_fields = dict(stac_item_metadata)
+        else:
+            stac_item_fields = self.get_stac_item_dict(source_product_metadata, stac_extensions=stac_extensions)
+
+        properties = stac_item_fields['properties']
+        properties['datetime'] = datetime_to_str(datetime.fromisoformat(properties['datetime']))
+        stac_item_dict = {
+            'type': 'Feature',
+            'stac_version': pystac.get_stac_version(),
+            'stac_extensions': stac_extensions if stac_extensions else [],
+            'id': stac_item_fields['id'],
+            'geometry': stac_item_fields['geometry'],
+            'bbox': list(stac_item_fields['bbox']) if stac_item_fields['bbox'] is not None else [],
+            'properties': properties,
+            'links': [],
+            'assets': {key: get_stac_asset_dict(asset) for key, asset in stac_item_fields['assets'].items()}
+        }
+        if stac_collection_id:
+            stac_item_dict['collection'] = stac_collection_id
+        if stac_item_fields['extra_fields']:
+            stac_item_dict.update(stac_item_fields['extra_fields'])  # eg: {'ssys:targets': ['mars']}
+
+        # bbox is prohibited if there's no geometry
+        if not stac_item_dict['geometry']:
+            stac_item_dict.pop('bbox')
+
+        return stac_item_dict
+
+    def create_stac_item(self, source_product_metadata: BaseModel, stac_collection_id, stac_extensions=[]) -> pystac.Item:
+        """Transform source product metadata into a PySTAC Item object of a given STAC collection.
+        """
+        stac_item_dict = self.create_stac_item_dict(source_product_metadata, stac_collection_id,
+                                                    stac_extensions=stac_extensions, validate=True)
+        return pystac.Item.from_dict(stac_item_dict, migrate=False, preserve_dict=False)
+
     def _geometry_from_wkt(self, wkt):
         pass
 
@@ -451,6 +710,43 @@ class AbstractTransformer:
 class PDSODE_STAC(AbstractTransformer):
     def __init__(self, collection=None, source_schema=None, destination_schema='PDSSP_STAC'):
         super().__init__(collection=collection, source_schema=source_schema, destination_schema=destination_schema)
+        self.mars_seasons = MarsSeasons()
+        self.footprints = {}
+        self.utc_times = UTCTimeNormaliser(timespec='milliseconds')
+
+    def prepare_source_products(self, source_products: list[BaseModel]) -> None:
+        # parse footprints of all products at once
+        self.footprints = parse_footprints([source_product_metadata.Footprint_C0_geometry
+                                            for source_product_metadata in source_products
+                                            if source_product_metadata.Footprint_C0_geometry])
+
+        # convert UTC times of all products at once
+        start_times = [source_product_metadata.UTC_start_time for source_product_metadata in source_products]
+        self.utc_times.convert(
+            start_times +
+            [source_product_metadata.UTC_stop_time for source_product_metadata in source_products] +
+            [source_product_metadata.Product_creation_time for source_product_metadata in source_products]
+        )
+
+        # compute Mars solar longitude and seasons of all Mars products at once
+        utc_times = []
+        for source_product_metadata, start_time in zip(source_products, start_times):
+            if source_product_metadata.Target_name.lower() == 'mars':
+                utc_time = self.utc_times.to_iso(start_time, field='UTC_start_time')
+                if utc_time:
+                    utc_times.append(utc_time)
+        if utc_times:
+            self.mars_seasons.compute(utc_times)
+
+    def get_footprint(self, footprint_wkt: str) -> tuple:
+        """Returns the GeoJSON geometry mapping and bounding box of a footprint WKT string, parsed once per batch of
+        source products (see `prepare_source_products`)."""
+        footprint = self.footprints.get(footprint_wkt)
+        if footprint is None:
+            footprint_shape = shapely.wkt.loads(footprint_wkt)
+            footprint = (shapely.geometry.mapping(footprint_shape), list(footprint_shape.bounds))
+            self.footprints[footprint_wkt] = footprint
+        return footprint
 
     def get_id(self, source_metadata: BaseModel, object_type='item') -> str:
         if object_type == 'item':
@@ -530,9 +826,7 @@ class PDSODE_STAC(AbstractTransformer):
         footprint_wkt = source_metadata.Footprint_C0_geometry
         if not footprint_wkt:
             return None
-        footprint_shape = shapely.wkt.loads(footprint_wkt)
-        footprint_bbox = list(footprint_shape.bounds)
-        footprint_geometry = shapely.geometry.mapping(footprint_shape)
+        footprint_geometry, footprint_bbox = self.get_footprint(footprint_wkt)
         return footprint_geometry
 
     def get_extent(self, source_metadata: BaseModel) -> schemas.PDSSP_STAC_Extent:
@@ -546,8 +840,7 @@ class PDSODE_STAC(AbstractTransformer):
         footprint_wkt = source_metadata.Footprint_C0_geometry
         if not footprint_wkt:
             return None
-        footprint_shape = shapely.wkt.loads(footprint_wkt)
-        footprint_bbox = list(footprint_shape.bounds)
+        footprint_geometry, footprint_bbox = self.get_footprint(footprint_wkt)
         return footprint_bbox
 
     def get_providers(self, source_metadata: BaseModel) -> list[BaseModel]:
@@ -563,10 +856,10 @@ class PDSODE_STAC(AbstractTransformer):
 
     def get_properties(self, source_metadata: BaseModel, stac_extensions=['ssys']) -> dict:
         properties = schemas.PDSSP_STAC_Properties(
-            datetime=utc_to_iso(source_metadata.UTC_start_time, timespec='milliseconds'),
-            created=utc_to_iso(source_metadata.Product_creation_time, timespec='milliseconds'),
-            start_datetime=utc_to_iso(source_metadata.UTC_start_time, timespec='milliseconds'),
-            end_datetime=utc_to_iso(source_metadata.UTC_stop_time, timespec='milliseconds'),
+            datetime=self.utc_times.to_iso(source_metadata.UTC_start_time, field='UTC_start_time'),
+            created=self.utc_times.to_iso(source_metadata.Product_creation_time, field='Product_creation_time'),
+            start_datetime=self.utc_times.to_iso(source_metadata.UTC_start_time, field='UTC_start_time'),
+            end_datetime=self.utc_times.to_iso(source_metadata.UTC_stop_time, field='UTC_stop_time'),
             platform=source_metadata.ihid,
             instruments=[source_metadata.iid],
             gsd=source_metadata.Map_scale
@@ -602,9 +895,8 @@ class PDSODE_STAC(AbstractTransformer):
                     solar_longitude = float(source_metadata.Solar_longitude)
             if not solar_longitude:
                 # derive solar longitude from UTC start time
-                utc_time = utc_to_iso(source_metadata.UTC_start_time, timespec='milliseconds')
-                season = PyMarsSeason().compute_season_from_time(Time(utc_time, format='isot', scale='utc'))
-                solar_longitude = season['ls']
+                utc_time = self.utc_times.to_iso(source_metadata.UTC_start_time, field='UTC_start_time')
+                solar_longitude = self.mars_seasons.get(utc_time)['ls']
 
             ssys_properties = schemas.PDSSP_STAC_SSYS_Properties(
                 **{
@@ -698,8 +990,8 @@ class PDSODE_STAC(AbstractTransformer):
         season_keyword = {'id': '', 'title': '', 'type': 'season'}
 
         # compute season
-        utc_time = utc_to_iso(source_metadata.UTC_start_time, timespec='milliseconds')
-        season = PyMarsSeason().compute_season_from_time(Time(utc_time, format='isot', scale='utc'))
+        utc_time = self.utc_times.to_iso(source_metadata.UTC_start_time, field='UTC_start_time')
+        season = self.mars_seasons.get(utc_time)
         season_str = season[Hemisphere.NORTH].value  # spring, summer, autumn, winter
         season_keyword['id'] = f'season:{season_str}'
         season_keyword['title'] = season_str.title()  # or 'Northern Hemisphere ' +
@@ -17,8 +17,14 @@ setup(
         'pyyaml',
         'geojson',
         'shapely',
-        'pyMarsSeason @ git+https://github.com/pole-surfaces-planetaires/pymarsseason.git'
+        'numpy',
+        'pyerfa'
     ],
+    extras_require={
+        'streaming': ['ijson>=3.1'],
+        'zstd': ['zstandard'],
+        'columnar': ['pyarrow']
+    },
     entry_points='''
         [console_scripts]
         crawler=crawler.cli:cli
@@ -0,0 +1,51 @@
+from unittest import mock
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from crawler.client import HttpClient, is_connect_error
+
+URL = 'https://resto.example.org/collections/MRO_HIRISE_RDRV11/items'
+
+
+def create_http_client(errors):
+    """Returns an HTTP client which session raises the given errors, then returns a successful response."""
+    http_client = HttpClient(max_retries=2, backoff_factor=0.0, rate_limit=None)
+    response = requests.Response()
+    response.status_code = 200
+    http_client.session.request = mock.Mock(side_effect=list(errors) + [response])
+    return http_client
+
+
+def create_connection_error():
+    reason = NewConnectionError(None, 'Failed to establish a new connection: [Errno 111] Connection refused')
+    return requests.ConnectionError(MaxRetryError(None, URL, reason=reason))
+
+
+def test_is_connect_error():
+    assert is_connect_error(requests.ConnectTimeout())
+    assert is_connect_error(create_connection_error())
+    assert not is_connect_error(requests.ReadTimeout())
+    assert not is_connect_error(requests.ConnectionError('Connection aborted.'))
+
+
+@pytest.mark.parametrize('error', [requests.ReadTimeout(), requests.ConnectionError('Connection aborted.')])
+def test_post_not_retried_once_sent(error):
+    http_client = create_http_client([error])
+    with pytest.raises(type(error)):
+        http_client.post(URL, json={})
+    assert http_client.session.request.call_count == 1
+
+
+@pytest.mark.parametrize('error', [requests.ConnectTimeout(), create_connection_error()])
+def test_post_retried_before_sent(error):
+    http_client = create_http_client([error, error])
+    assert http_client.post(URL, json={}).ok
+    assert http_client.session.request.call_count == 3
+
+
+def test_get_retried():
+    http_client = create_http_client([requests.ReadTimeout(), requests.ConnectionError('Connection aborted.')])
+    assert http_client.get(URL).ok
+    assert http_client.session.request.call_count == 3
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from crawler.datastore import DataStore, SQLiteDataStore, SourceCollectionModel, create_datastore
+from crawler.registry import ExternalService, ExternalServiceType
+
+
+def create_collections(n_collections=4):
+    service = ExternalService(title='PDS ODE', description='PDS ODE REST API', providers=[],
+                              type=ExternalServiceType.PDSODE, url='https://oderest.rsl.wustl.edu/live2/')
+    return [
+        SourceCollectionModel(collection_id=f'MRO_HIRISE_RDRV{i:02}', service=service, source_schema='PDSODE',
+                              target='mars', stac_extensions=['ssys'], n_products=100 * i)
+        for i in range(n_collections)
+    ]
+
+
+def get_collection_dicts(datastore):
+    return {collection.collection_id: collection.dict() for collection in datastore.source_collections}
+
+
+def test_journal_replay(tmp_path):
+    datastore = DataStore(source_data_dir=tmp_path, collections=create_collections())
+    collection = datastore.get_source_collection('MRO_HIRISE_RDRV01')
+    collection.extracted = True
+    collection.extracted_files = ['MRO_HIRISE_RDRV01.json']
+    datastore.update_source_collections([collection])
+    datastore.delete_source_collections([datastore.get_source_collection('MRO_HIRISE_RDRV02')])
+    expected_collection_dicts = get_collection_dicts(datastore)
+
+    # simulated crash while appending a journal record
+    journal_size = datastore.collections_journal_file.stat().st_size
+    with open(datastore.collections_journal_file, 'ab') as f:
+        f.write(b'{"op": "update", "collection_id": "MRO_HIRISE_RDRV03", "fields": {"extr')
+
+    datastore = DataStore(source_data_dir=tmp_path)
+    assert get_collection_dicts(datastore) == expected_collection_dicts
+    assert datastore.collections_journal_file.stat().st_size == journal_size  # truncated record removed
+
+    # simulated crash while compacting, after replacing the collections index file
+    records = list(datastore.persisted_records.values())
+    datastore.write_collections_records(records, datastore.collections_index_file,
+                                        service_records=datastore.service_records)
+    assert datastore.collections_journal_file.is_file()
+    assert get_collection_dicts(DataStore(source_data_dir=tmp_path)) == expected_collection_dicts
+
+
+def test_compaction(tmp_path):
+    datastore = DataStore(source_data_dir=tmp_path, collections=create_collections())
+    for collection in datastore.source_collections[:3]:
+        collection.transformed = True
+        collection.stac_dir = f'stac/{collection.collection_id}'
+        datastore.update_source_collections([collection])
+    datastore.delete_source_collections([datastore.get_source_collection('MRO_HIRISE_RDRV00')])
+    journaled_collection_dicts = get_collection_dicts(DataStore(source_data_dir=tmp_path))
+
+    datastore.compact()
+    assert not datastore.collections_journal_file.is_file()
+    with open(datastore.collections_index_file, 'r') as f:
+        assert len(json.load(f)['collections']) == 3
+    assert get_collection_dicts(datastore) == journaled_collection_dicts
+    assert get_collection_dicts(DataStore(source_data_dir=tmp_path)) == journaled_collection_dicts
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_merge_writers(tmp_path, backend):
+    create_datastore(source_data_dir=tmp_path, collections=create_collections(), backend=backend)
+    datastores = [create_datastore(source_data_dir=tmp_path, backend=backend) for writer in range(2)]
+    collections = [datastore.get_source_collection('MRO_HIRISE_RDRV01') for datastore in datastores]
+
+    # both writers update the same collection, from the same loaded state
+    collections[0].extracted = True
+    collections[0].extracted_time = '2023-06-01T00:00:00'
+    collections[1].transformed = True
+    collections[1].stac_dir = 'stac/mars'
+    for datastore, collection in zip(datastores, collections):
+        datastore.update_source_collections([collection])
+
+    assert collections[1].extracted and collections[1].extracted_time == '2023-06-01T00:00:00'
+    collection = create_datastore(source_data_dir=tmp_path, backend=backend).get_source_collection('MRO_HIRISE_RDRV01')
+    assert collection.extracted and collection.extracted_time == '2023-06-01T00:00:00'
+    assert collection.transformed and collection.stac_dir == 'stac/mars'
+
+
+def test_backends_parity(tmp_path):
+    datastores = {}
+    for backend in ['json', 'sqlite']:
+        source_data_dir = tmp_path / backend
+        source_data_dir.mkdir()
+        datastore = create_datastore(source_data_dir=source_data_dir, collections=create_collections(), backend=backend)
+        collection = datastore.get_source_collection('MRO_HIRISE_RDRV01')
+        collection.extracted = True
+        collection.dirty = True
+        datastore.update_source_collections([collection])
+        datastore.sync_source_collections(create_collections(n_collections=3))  # deletes MRO_HIRISE_RDRV03
+        datastores[backend] = create_datastore(source_data_dir=source_data_dir, backend=backend)
+
+    assert get_collection_dicts(datastores['json']) == get_collection_dicts(datastores['sqlite'])
+    for filters in [{}, {'extracted': True}, {'dirty': False}, {'collection_id': 'rdrv0'}, {'target': 'MARS'},
+                    {'service_type': 'PDSODE'}, {'transformed': True}]:
+        collection_ids = [
+            sorted(collection.collection_id for collection in datastore.get_source_collections(**filters))
+            for datastore in datastores.values()
+        ]
+        assert collection_ids[0] == collection_ids[1]
+
+
+def test_sqlite_migration_resumed(tmp_path, monkeypatch):
+    DataStore(source_data_dir=tmp_path, collections=create_collections())
+    expected_collection_dicts = get_collection_dicts(DataStore(source_data_dir=tmp_path))
+
+    # migration from the JSON collections index, interrupted while writing collections
+    def write_collections(datastore, collections):
+        raise Exception('Interrupted migration.')
+
+    with monkeypatch.context() as m:
+        m.setattr(SQLiteDataStore, 'write_collections', write_collections)
+        with pytest.raises(Exception, match='Interrupted migration.'):
+            SQLiteDataStore(source_data_dir=tmp_path)
+    assert (tmp_path / 'collections_index.db').is_file()
+
+    datastore = SQLiteDataStore(source_data_dir=tmp_path)
+    assert get_collection_dicts(datastore) == expected_collection_dicts
+
+    # migrated only once
+    collection = datastore.get_source_collection('MRO_HIRISE_RDRV01')
+    collection.extracted = True
+    datastore.update_source_collections([collection])
+    assert SQLiteDataStore(source_data_dir=tmp_path).get_source_collection('MRO_HIRISE_RDRV01').extracted
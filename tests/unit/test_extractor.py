@@ -1,2 +1,265 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from crawler.client import ResponseCache
+from crawler.extractor import AdaptivePager, PDSODE_Extractor
+from crawler.registry import ExternalService, ExternalServiceType
+
+COLLECTION_ID = 'MRO_HIRISE_RDRV11'
+
+IIPTSET = {
+    'ODEMetaDB': 'Mars', 'IHID': 'MRO', 'IHName': 'Mars Reconnaissance Orbiter', 'IID': 'HIRISE',
+    'IName': 'High Resolution Imaging Science Experiment', 'PT': 'RDRV11', 'PTName': 'RDR',
+    'DataSetId': 'MRO-M-HIRISE-3-RDR-V1.1', 'ValidTargets': {'ValidTarget': 'Mars'}, 'NumberProducts': 100
+}
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {}
+        self.content = json.dumps(data).encode('utf-8')
+
+    def json(self):
+        return self.data
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i+chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeHttpClient:
+    """PDS ODE REST API service double, serving `n_products` products.
+
+    Queries at the offsets of `failing_offsets` fail, unless their limit is at most the associated maximum limit.
+    """
+    def __init__(self, n_products=100, failing_offsets=None, delta_products=None):
+        self.products = [{'pdsid': f'P{i:06}'} for i in range(n_products)]
+        self.failing_offsets = failing_offsets or {}
+        self.delta_products = delta_products or {}
+        self.queries = []
+
+    def set_rate_limit(self, url, rate, burst=None):
+        pass
+
+    def get(self, url, params=None, **kwargs):
+        params = params or {}
+        if params.get('query') == 'iipy':
+            iiptset = dict(IIPTSET, NumberProducts=len(self.products))
+            return FakeResponse({'ODEResults': {'IIPTSets': {'IIPTSet': [iiptset]}, 'Status': 'Success'}})
+
+        offset, limit = params['offset'], params['limit']
+        self.queries.append((offset, limit))
+        if offset in self.failing_offsets and limit > self.failing_offsets[offset]:
+            return FakeResponse({'ODEResults': {'Status': 'ERROR', 'Error': 'Query timeout'}}, status_code=500)
+        products = self.products
+        for time_param, delta_products in self.delta_products.items():
+            if time_param in params:
+                products = delta_products
+        page = products[offset:offset+limit]
+        return FakeResponse({'ODEResults': {'Products': {'Product': page}, 'Count': len(page), 'Status': 'Success'}})
+
+
+def create_extractor(tmp_path, http_client, page_size=20):
+    service = ExternalService(
+        title='PDS ODE', description='PDS ODE REST API', providers=[], type=ExternalServiceType.PDSODE,
+        url='https://oderest.rsl.wustl.edu/live2/',
+        extra_params={'source_schema': 'PDSODE', 'stac_extensions': ['ssys'], 'max_page_size': 40}
+    )
+    extractor = PDSODE_Extractor(service=service, http_client=http_client)
+    extractor.response_cache = ResponseCache(cache_dir=tmp_path / '.cache', http_client=http_client)
+    extractor.write_page_size(page_size, output_dir_path=tmp_path)
+    return extractor
+
+
+def read_product_ids(file_path):
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+    return [product['pdsid'] for product in data['ODEResults']['Products']['Product']]
+
+
+def assert_contiguous_pages(extracted_files, n_products):
+    """Check that extracted page files are listed in offset order, and hold all products once."""
+    assert extracted_files == sorted(extracted_files)
+    product_ids = []
+    for file_path in extracted_files:
+        product_ids += read_product_ids(file_path)
+    assert product_ids == [f'P{i:06}' for i in range(n_products)]
+
+
 def test_extractor():
     assert True
+
+
+def test_pager_windows_cover_products():
+    pager = AdaptivePager(100, page_size=30, min_page_size=10, max_page_size=40)
+    windows = []
+    window = pager.next_window()
+    while window:
+        windows.append(window)
+        window = pager.next_window()
+    assert windows == [(0, 30), (30, 30), (60, 30), (90, 10)]
+
+
+def test_pager_skips_extracted_windows():
+    pager = AdaptivePager(100, page_size=40, min_page_size=10, max_page_size=40, extracted_windows={20: 20, 60: 40})
+    assert pager.next_window() == (0, 20)
+    assert pager.next_window() == (40, 20)
+    assert pager.next_window() is None
+
+
+def test_pager_adapts_page_size():
+    pager = AdaptivePager(1000, page_size=40, min_page_size=10, max_page_size=80, target_latency=10.0)
+    pager.report_success(40, 1.0, 1000)
+    assert pager.page_size == 80
+    pager.report_success(80, 1.0, 1000)
+    assert pager.page_size == 80  # maximum page size
+    pager.report_success(80, 30.0, 1000)
+    assert pager.page_size == 40
+    pager.report_success(10, 30.0, 1000)  # truncated window
+    assert pager.page_size == 40
+    pager.report_error()
+    pager.report_error()
+    pager.report_error()
+    assert pager.page_size == 10  # minimum page size
+
+
+@pytest.mark.parametrize('n_jobs', [1, 4])
+def test_extract_split_failed_window(tmp_path, n_jobs):
+    http_client = FakeHttpClient(n_products=100, failing_offsets={20: 10})
+    extractor = create_extractor(tmp_path, http_client)
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, n_jobs=n_jobs)
+
+    assert extractor.extracted
+    assert (20, 10) in http_client.queries
+    assert extractor.n_extracted_files == len(extractor.extracted_files)
+    assert_contiguous_pages(extractor.extracted_files[1:], 100)
+    assert not list((tmp_path / COLLECTION_ID).glob('*.tmp'))
+    assert not extractor.get_checkpoint_file_path(COLLECTION_ID, output_dir_path=tmp_path).is_file()
+
+
+def test_extract_stops_on_failure(tmp_path):
+    class SlowHttpClient(FakeHttpClient):
+        def get(self, url, params=None, **kwargs):
+            if params and 'offset' in params:
+                time.sleep(0.01)
+            return super().get(url, params=params, **kwargs)
+
+    # window at offset 0 failing at minimum page size, out of 50 windows
+    http_client = SlowHttpClient(n_products=1000, failing_offsets={0: 0})
+    extractor = create_extractor(tmp_path, http_client)
+    with pytest.raises(Exception):
+        extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, n_jobs=4)
+
+    # other workers stopped after their current page
+    assert len(http_client.queries) < 20
+    assert not list((tmp_path / COLLECTION_ID).glob('*.tmp'))
+
+
+def test_extract_overwrite(tmp_path):
+    http_client = FakeHttpClient(n_products=100)
+    extractor = create_extractor(tmp_path, http_client)
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, n_jobs=1)
+    http_client.delta_products = {'minobtime': [], 'mincreationtime': [{'pdsid': 'P000010'}]}
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, incremental=True)
+    (tmp_path / COLLECTION_ID / f'{COLLECTION_ID}.parquet').touch()
+
+    # new extraction, with another page size and codec
+    http_client.delta_products = {}
+    extractor = create_extractor(tmp_path, http_client, page_size=30)
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, overwrite=True, n_jobs=1, codec='gzip')
+
+    collection_file_names = sorted(path.name for path in (tmp_path / COLLECTION_ID).iterdir())
+    assert collection_file_names == sorted(Path(extracted_file).name for extracted_file in extractor.extracted_files)
+    assert all(name.endswith('.json.gz') for name in collection_file_names)
+
+
+def test_extract_resume(tmp_path):
+    # first extraction, interrupted by a window failing at minimum page size
+    http_client = FakeHttpClient(n_products=100, failing_offsets={60: 0})
+    extractor = create_extractor(tmp_path, http_client)
+    with pytest.raises(Exception):
+        extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, n_jobs=1)
+    checkpoint_file_path = extractor.get_checkpoint_file_path(COLLECTION_ID, output_dir_path=tmp_path)
+    assert checkpoint_file_path.is_file()
+    extracted_offsets = [window['offset'] for window in json.load(open(checkpoint_file_path))['windows'].values()]
+
+    # resumed extraction, only retrieving missing windows
+    http_client = FakeHttpClient(n_products=100)
+    extractor = create_extractor(tmp_path, http_client)
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, n_jobs=1)
+
+    assert not set(extracted_offsets) & {offset for offset, limit in http_client.queries}
+    assert_contiguous_pages(extractor.extracted_files[1:], 100)
+    assert not checkpoint_file_path.is_file()
+
+
+def test_extract_delta_appends_pages(tmp_path):
+    http_client = FakeHttpClient(n_products=100)
+    extractor = create_extractor(tmp_path, http_client)
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, n_jobs=1)
+    extracted_files = list(extractor.extracted_files)
+
+    # two incremental extractions, with re-created products
+    for delta in range(2):
+        http_client.delta_products = {'minobtime': [], 'mincreationtime': [{'pdsid': 'P000010'}, {'pdsid': 'P000090'}]}
+        extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, incremental=True)
+
+    delta_files = extractor.extracted_files[len(extracted_files):]
+    assert extractor.extracted_files[:len(extracted_files)] == extracted_files
+    assert len(delta_files) == len(set(delta_files)) == 2
+    assert_contiguous_pages(extracted_files[1:], 100)
+    for delta_file in delta_files:
+        assert read_product_ids(delta_file) == ['P000010', 'P000090']
+
+
+def test_extract_delta_resume(tmp_path):
+    http_client = FakeHttpClient(n_products=100)
+    extractor = create_extractor(tmp_path, http_client, page_size=40)
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, n_jobs=1)
+    n_extracted_files = extractor.n_extracted_files
+    collection_file_path = extractor.extracted_files[0]
+
+    # incremental extraction, interrupted at its second page
+    http_client.delta_products = {'minobtime': http_client.products[50:], 'mincreationtime': []}
+    http_client.failing_offsets = {40: 0}
+    with pytest.raises(Exception):
+        extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, incremental=True)
+    assert extractor.get_checkpoint_file_path(COLLECTION_ID, output_dir_path=tmp_path).is_file()
+    assert extractor.read_collection_metadata(collection_file_path)
+    assert not list((tmp_path / COLLECTION_ID).glob('*.tmp'))
+
+    # resumed incremental extraction, from the extracted files recorded before the interruption
+    extractor.extracted_files = extractor.extracted_files[:n_extracted_files]
+    extractor.n_extracted_files = n_extracted_files
+    http_client.failing_offsets = {}
+    http_client.queries = []
+    extractor.extract(COLLECTION_ID, output_dir_path=tmp_path, incremental=True)
+
+    assert http_client.queries == [(40, 40), (0, 40)]  # minobtime second page, and mincreationtime first page
+    delta_files = extractor.extracted_files[n_extracted_files:]
+    assert len(delta_files) == len(set(delta_files)) == 2
+    product_ids = read_product_ids(delta_files[0]) + read_product_ids(delta_files[1])
+    assert product_ids == [f'P{i:06}' for i in range(50, 100)]
+    assert not extractor.get_checkpoint_file_path(COLLECTION_ID, output_dir_path=tmp_path).is_file()
+
+
+def test_extract_page_rejects_error_response(tmp_path):
+    class ErrorHttpClient(FakeHttpClient):
+        def get(self, url, params=None, **kwargs):
+            return FakeResponse({'ODEResults': {'Status': 'ERROR', 'Error': 'Invalid query'}})
+
+    extractor = create_extractor(tmp_path, ErrorHttpClient())
+    extracted_file_path = tmp_path / 'page.json'
+    for validate in [False, True]:
+        with pytest.raises(Exception, match='Invalid query'):
+            extractor.extract_page({'limit': 10}, 0, extracted_file_path, validate=validate)
+        assert not list(tmp_path.glob('page.json*'))
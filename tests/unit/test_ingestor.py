@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pystac
+
+from crawler.ingestor import Ingestor
+from crawler.ledger import ProductLedger
+
+STAC_API_URL = 'https://resto.example.org'
+
+COLLECTION_ID = 'urn:pdssp:ode:collection:mro_hirise_rdrv11'
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.data = data or {}
+
+    def json(self):
+        return self.data
+
+
+class FakeRestoClient:
+    """RESTO STAC API service double, storing posted features.
+
+    Features posted while `fail_posts` is True are stored, but a 500 error is returned.
+    """
+    def __init__(self):
+        self.features = {}
+        self.fail_posts = False
+        self.requests = []
+
+    def set_rate_limit(self, url, rate, burst=None):
+        pass
+
+    def post(self, url, json=None, **kwargs):
+        self.requests.append(('POST', url))
+        if not url.endswith('/items'):
+            return FakeResponse(200)
+        if json['id'] in self.features:
+            return FakeResponse(409, {'ErrorMessage': 'Feature already exists'})
+        self.features[json['id']] = json
+        return FakeResponse(500 if self.fail_posts else 200)
+
+    def put(self, url, json=None, **kwargs):
+        self.requests.append(('PUT', url))
+        self.features[json['id']] = json
+        return FakeResponse(200)
+
+
+def create_stac_collection(tmp_path, item_ids):
+    stac_collection = pystac.Collection(
+        id=COLLECTION_ID, description='HiRISE RDR products', extra_fields={'ssys:targets': ['mars']},
+        extent=pystac.Extent(pystac.SpatialExtent([[0, 0, 1, 1]]), pystac.TemporalExtent([[datetime(2010, 1, 1), None]]))
+    )
+    for item_id in item_ids:
+        stac_collection.add_item(pystac.Item(id=item_id, geometry=None, bbox=None, datetime=datetime(2010, 1, 1),
+                                             properties={}))
+    stac_collection.normalize_hrefs(str(tmp_path / 'stac'))
+    stac_collection.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    return str(tmp_path / 'stac' / 'collection.json')
+
+
+def test_ingest_failed_items(tmp_path):
+    item_ids = ['ESP_011386_2065_RED.v2', 'ESP_011387_2065_RED']
+    stac_file = create_stac_collection(tmp_path, item_ids)
+    ledger = ProductLedger(tmp_path / 'ledger.db')
+    ledger.record_transforms(COLLECTION_ID, [(item_id, 'source_hash', 'stac_hash', None) for item_id in item_ids])
+    resto_client = FakeRestoClient()
+
+    # items posted to the server, which returns an error
+    resto_client.fail_posts = True
+    ingestor = Ingestor(stac_api_parent_url=STAC_API_URL, auth_token='token', http_client=resto_client, ledger=ledger)
+    ingestor.ingest(stac_file=stac_file, ingest_strategy='both')
+    assert [product['ingest_status'] for product in ledger.get_products(COLLECTION_ID)] == ['failed', 'failed']
+
+    # failed items updated
+    resto_client.fail_posts = False
+    ingestor = Ingestor(stac_api_parent_url=STAC_API_URL, auth_token='token', http_client=resto_client, ledger=ledger)
+    ingestor.ingest(stac_file=stac_file, ingest_strategy='both')
+    assert [product['product_id'] for product in ledger.get_products(COLLECTION_ID)] == sorted(item_ids)
+    assert [product['ingest_status'] for product in ledger.get_products(COLLECTION_ID)] == ['ingested', 'ingested']
+
+    # ingested items skipped
+    resto_client.requests = []
+    ingestor = Ingestor(stac_api_parent_url=STAC_API_URL, auth_token='token', http_client=resto_client, ledger=ledger)
+    ingestor.ingest(stac_file=stac_file, ingest_strategy='both')
+    assert [method for method, url in resto_client.requests] == ['POST']  # collection only
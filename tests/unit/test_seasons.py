@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from crawler.seasons import (
+    Hemisphere, MarsSeasons, Season, mars_seasons, mars_solar_longitude, tt_minus_utc, to_datetime64
+)
+
+
+def test_mars24_reference():
+    # Mars24 algorithm worked example: 2000-01-06 00:00:00 UTC, Ls = 277.18758 deg
+    assert mars_solar_longitude(['2000-01-06T00:00:00'])[0] == pytest.approx(277.18758, abs=1e-4)
+    utc_times = np.array(['2000-01-06T00:00:00'], dtype='datetime64[ms]')
+    assert mars_solar_longitude(utc_times)[0] == pytest.approx(277.18758, abs=1e-4)
+
+
+def test_leap_seconds():
+    utc_times = to_datetime64(['2016-12-31T23:59:59.999', '2017-01-01T00:00:00', '1999-01-01T00:00:00Z'])
+    assert tt_minus_utc(utc_times).tolist() == pytest.approx([68.184, 69.184, 64.184])
+
+
+@pytest.mark.parametrize('mars_year_start', ['2000-05-31', '2017-05-05', '2019-03-23', '2021-02-07'])
+def test_solar_longitude_wrap_around(mars_year_start):
+    # hourly solar longitudes over the days around the start of a Mars year (Ls = 0)
+    start_time = np.datetime64(f'{mars_year_start}T00:00', 'ms')
+    utc_times = start_time + np.arange(-48, 72) * np.timedelta64(1, 'h')
+    solar_longitudes = mars_solar_longitude(utc_times)
+
+    assert np.all((solar_longitudes >= 0.0) & (solar_longitudes < 360.0))
+    wrap_indices = np.flatnonzero(np.diff(solar_longitudes) < 0)
+    assert len(wrap_indices) == 1
+    wrap_index = wrap_indices[0]
+    assert utc_times[wrap_index].astype('datetime64[D]') == np.datetime64(mars_year_start)
+    assert solar_longitudes[wrap_index] > 359.9 and solar_longitudes[wrap_index + 1] < 0.1
+
+    seasons = MarsSeasons().compute([str(utc_time) for utc_time in utc_times[wrap_index:wrap_index + 2]])
+    assert [season[Hemisphere.NORTH] for season in seasons] == [Season.WINTER, Season.SPRING]
+    assert [season[Hemisphere.SOUTH] for season in seasons] == [Season.SUMMER, Season.AUTUMN]
+
+
+def test_seasons_quadrants():
+    solar_longitudes = np.array([0.0, 89.999, 90.0, 179.999, 180.0, 269.999, 270.0, 359.999, 360.0])
+    assert mars_seasons(solar_longitudes, hemisphere=Hemisphere.NORTH) == [
+        Season.SPRING, Season.SPRING, Season.SUMMER, Season.SUMMER, Season.AUTUMN, Season.AUTUMN,
+        Season.WINTER, Season.WINTER, Season.SPRING
+    ]
+    assert mars_seasons(solar_longitudes, hemisphere=Hemisphere.SOUTH) == [
+        Season.AUTUMN, Season.AUTUMN, Season.WINTER, Season.WINTER, Season.SPRING, Season.SPRING,
+        Season.SUMMER, Season.SUMMER, Season.AUTUMN
+    ]
+
+
+def test_memoised_seasons():
+    mars_seasons_calculator = MarsSeasons(memo_max_size=2)
+    utc_times = ['2000-01-06T00:00:00', '2000-05-31T18:00:00', '2021-02-07T11:00:00']
+    expected_solar_longitudes = mars_solar_longitude(utc_times).tolist()
+    assert [season['ls'] for season in mars_seasons_calculator.compute(utc_times)] == expected_solar_longitudes
+    assert mars_seasons_calculator.get(utc_times[0])['ls'] == expected_solar_longitudes[0]
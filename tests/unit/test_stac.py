@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+
+import pystac
+import pytest
+
+from crawler.stac import STACCollectionWriter
+
+
+def create_stac_collection():
+    return pystac.Collection(
+        id='mro_hirise_rdrv11', title='HiRISE RDR products', description='HiRISE RDR products',
+        extent=pystac.Extent(pystac.SpatialExtent(bboxes=[[-180.0, -90.0, 180.0, 90.0]]),
+                             pystac.TemporalExtent(intervals=[[datetime(2006, 1, 1), None]]))
+    )
+
+
+def create_stac_item_dict(item_id, bbox=None, item_datetime='2010-05-01T10:00:00Z'):
+    stac_item_dict = pystac.Item(id=item_id, geometry=None, bbox=None, datetime=datetime(2010, 5, 1),
+                                 properties={}).to_dict(include_self_link=False, transform_hrefs=False)
+    stac_item_dict['properties']['datetime'] = item_datetime
+    if bbox:
+        stac_item_dict['geometry'] = {'type': 'Point', 'coordinates': bbox[:2]}
+        stac_item_dict['bbox'] = bbox
+    return stac_item_dict
+
+
+def read_collection_extent(collection_filepath):
+    with open(collection_filepath, 'r') as f:
+        collection_dict = json.load(f, parse_constant=lambda constant: pytest.fail(f'Invalid JSON {constant} value.'))
+    return collection_dict['extent']
+
+
+def test_collection_extent(tmp_path):
+    writer = STACCollectionWriter(create_stac_collection(), tmp_path)
+    writer.add_item(create_stac_item_dict('P000001', bbox=[10.0, 20.0, 10.5, 20.5]))
+    writer.add_item(create_stac_item_dict('P000002', item_datetime='2011-01-01T00:00:00Z'))
+    writer.add_item(create_stac_item_dict('P000003', bbox=[-5.0, 25.0, -4.0, 26.0]))
+    extent = read_collection_extent(writer.close())
+    assert extent['spatial']['bbox'] == [[-5.0, 20.0, 10.5, 26.0]]
+    assert extent['temporal']['interval'] == [['2010-05-01T10:00:00Z', '2011-01-01T00:00:00Z']]
+
+
+@pytest.mark.parametrize('n_items', [0, 2])
+def test_collection_extent_without_bbox(tmp_path, n_items):
+    writer = STACCollectionWriter(create_stac_collection(), tmp_path)
+    for i in range(n_items):
+        writer.add_item(create_stac_item_dict(f'P{i:06}'))
+    extent = read_collection_extent(writer.close())
+    assert extent['spatial']['bbox'] == [[-180.0, -90.0, 180.0, 90.0]]
+    if n_items:
+        assert extent['temporal']['interval'] == [['2010-05-01T10:00:00Z', '2010-05-01T10:00:00Z']]
+    else:
+        assert extent['temporal']['interval'] == [['2006-01-01T00:00:00Z', None]]
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from crawler.timestamps import UTC_TIME_FORMATS, UTCTimeNormaliser, utc_times_to_iso
+
+UTC_TIMES = [
+    # fractional seconds
+    '2010-05-01T10:00:00', '2010-05-01T10:00:00.1', '2010-05-01T10:00:00.12', '2010-05-01T10:00:00.123',
+    '2010-05-01T10:00:00.1234', '2010-05-01T10:00:00.123456', '2010-05-01T10:00:00.999999',
+    '2010-05-01T10:00:00.1234567',
+    # Z suffix
+    '2010-05-01T10:00:00Z', '2010-05-01T10:00:00.5Z', '2010-05-01T10:00:00.000001Z', '2010-05-01T10:00:00.Z',
+    # around leap seconds
+    '2016-12-31T23:59:59', '2016-12-31T23:59:59.999Z', '2016-12-31T23:59:60', '2017-01-01T00:00:00.000',
+    '2015-06-30T23:59:60.5Z', '2015-07-01T00:00:00Z',
+    # calendar limits
+    '2020-02-29T12:00:00', '2019-02-29T12:00:00', '2010-04-31T00:00:00', '2010-13-01T00:00:00',
+    '2010-5-1T1:2:3', '0001-01-01T00:00:00',
+    # not UTC times
+    '2010-05-01 10:00:00', '2010-05-01', '', 'N/A',
+]
+
+
+def strptime(utc_time) -> datetime:
+    """Reference UTC time parser, trying each valid UTC time format with `datetime.strptime`."""
+    for utc_time_format in UTC_TIME_FORMATS:
+        try:
+            return datetime.strptime(utc_time, utc_time_format)
+        except ValueError:
+            pass
+    return None
+
+
+@pytest.mark.parametrize('utc_time', UTC_TIMES)
+def test_parse(utc_time):
+    normaliser = UTCTimeNormaliser()
+    assert normaliser.parse(utc_time) == strptime(utc_time)
+    assert normaliser.parse(utc_time, field='UTC_start_time') == strptime(utc_time)
+
+
+def test_parse_memoised_format():
+    normaliser = UTCTimeNormaliser()
+    for utc_time in UTC_TIMES + list(reversed(UTC_TIMES)):
+        assert normaliser.parse(utc_time, field='UTC_start_time') == strptime(utc_time)
+
+
+@pytest.mark.parametrize('timespec', ['seconds', 'milliseconds', 'microseconds'])
+def test_convert(timespec):
+    expected_iso_times = [strptime(utc_time).isoformat(timespec=timespec) if strptime(utc_time) else None
+                          for utc_time in UTC_TIMES]
+    assert UTCTimeNormaliser(timespec=timespec).convert(UTC_TIMES) == expected_iso_times
+
+    # whole column conversion, of UTC time strings in a `YYYY-MM-DDTHH:MM:SS[.ffffff][Z]` form
+    valid_utc_times = [utc_time for utc_time in UTC_TIMES if strptime(utc_time) and len(utc_time) >= 19]
+    assert utc_times_to_iso(valid_utc_times, timespec=timespec) == [
+        strptime(utc_time).isoformat(timespec=timespec) for utc_time in valid_utc_times
+    ]
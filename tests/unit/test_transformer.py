@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+
+from crawler.datastore import SourceCollectionModel
+from crawler.ledger import ProductLedger, needs_ingest
+from crawler.registry import ExternalService, ExternalServiceType
+from crawler.transformer import Transformer
+
+COLLECTION_ID = 'MRO_HIRISE_RDRV11'
+
+IIPTSET = {
+    'ODEMetaDB': 'Mars', 'IHID': 'MRO', 'IHName': 'Mars Reconnaissance Orbiter', 'IID': 'HIRISE',
+    'IName': 'High Resolution Imaging Science Experiment', 'PT': 'RDRV11', 'PTName': 'RDR',
+    'DataSetId': 'MRO-M-HIRISE-3-RDR-V1.1', 'ValidTargets': {'ValidTarget': 'Mars'}, 'NumberProducts': 10
+}
+
+
+def create_product(i, creation_time='2012-01-01T00:00:00'):
+    lon, lat = 10.0 + i, 20.0
+    return {
+        'ode_id': str(i), 'pdsid': f'P{i:06}', 'ihid': 'MRO', 'iid': 'HIRISE', 'pt': 'RDRV11',
+        'Data_Set_Id': 'MRO-M-HIRISE-3-RDR-V1.1', 'PDSVolume_Id': 'MROHR_0001', 'RelativePathtoVol': 'RDR/',
+        'LabelFileName': f'P{i:06}.LBL', 'Product_creation_time': creation_time, 'Target_name': 'MARS',
+        'UTC_start_time': f'2010-05-{i + 1:02}T10:00:00.123', 'UTC_stop_time': f'2010-05-{i + 1:02}T10:00:01.123',
+        'Emission_angle': 5.0, 'Map_scale': 0.25, 'Solar_distance': 2.1e8,
+        'Footprint_C0_geometry': f'POLYGON (({lon} {lat}, {lon + 0.1} {lat}, {lon + 0.1} {lat + 0.1}, {lon} {lat}))',
+        'Product_files': {'Product_file': [
+            {'Description': 'PRODUCT LABEL FILE', 'FileName': f'P{i:06}.LBL', 'KBytes': '7', 'Type': 'Product',
+             'URL': f'https://hirise-pds.lpl.arizona.edu/P{i:06}.LBL'}
+        ]}
+    }
+
+
+def create_collection(tmp_path):
+    """Returns a source collection model of extracted files holding a re-created product, found twice."""
+    extracted_files = [str(tmp_path / f'{COLLECTION_ID}.json')]
+    with open(extracted_files[0], 'w') as f:
+        json.dump({'iiptset': IIPTSET, 'stac_extensions': ['ssys']}, f)
+    pages = [
+        [create_product(i) for i in range(10)],
+        [create_product(3, creation_time='2013-01-01T00:00:00')]  # incremental extraction page
+    ]
+    for page_index, products in enumerate(pages):
+        extracted_files.append(str(tmp_path / f'{COLLECTION_ID}_{page_index:09}.json'))
+        with open(extracted_files[-1], 'w') as f:
+            json.dump({'ODEResults': {'Count': str(len(products)), 'Products': {'Product': products}}}, f)
+
+    service = ExternalService(title='PDS ODE', description='PDS ODE REST API', providers=[],
+                              type=ExternalServiceType.PDSODE, url='https://oderest.rsl.wustl.edu/live2/')
+    return SourceCollectionModel(collection_id=COLLECTION_ID, source_schema='PDSODE', service=service, target='mars',
+                                 stac_extensions=['ssys'], n_products=10, extracted=True,
+                                 extracted_files=extracted_files, stac_dir=str(tmp_path / 'stac'))
+
+
+def test_transform_duplicate_products(tmp_path):
+    collection = create_collection(tmp_path)
+    ledger = ProductLedger(tmp_path / 'ledger.db')
+    for run in range(2):
+        transformer = Transformer(collection)
+        transformer.transform(overwrite=True, ledger=ledger, n_jobs=1)
+        stac_collection_id = Path(transformer.stac_dir).name
+        ingest_states = ledger.get_ingest_states(stac_collection_id)
+        assert len(ingest_states) == 10
+        if run == 0:
+            ledger.record_ingestions(stac_collection_id, [(product_id, None) for product_id in ingest_states])
+        else:
+            assert not [product_id for product_id, ingest_state in ingest_states.items() if needs_ingest(ingest_state)]
+
+    # STAC item and ledger record of the re-created product are those of its last occurrence
+    product = ledger.get_product(stac_collection_id, 'P000003')
+    stac_item_filepath = tmp_path / 'stac' / 'mars' / stac_collection_id / 'P000003' / 'P000003.json'
+    with open(stac_item_filepath, 'r') as f:
+        stac_item_dict = json.load(f)
+    assert product['transform_status'] == 'transformed'
+    assert '2013-01-01' in json.dumps(stac_item_dict['properties'])
+
+
+def test_transform_worker_processes(tmp_path):
+    collection = create_collection(tmp_path)
+    stac_items = []
+    for n_jobs in [1, 2]:
+        transformer = Transformer(collection)
+        transformer.transform(output_dir_path=tmp_path / f'stac_{n_jobs}', overwrite=True, n_jobs=n_jobs)
+        stac_items.append({
+            stac_item_filepath.name: json.loads(stac_item_filepath.read_text())
+            for stac_item_filepath in Path(transformer.stac_dir).glob('*/*.json')
+        })
+    assert len(stac_items[0]) == 10
+    assert stac_items[1] == stac_items[0]